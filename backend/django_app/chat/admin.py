@@ -35,5 +35,6 @@ class ChatTemplateAdmin(admin.ModelAdmin):
 
 @admin.register(ChatExport)
 class ChatExportAdmin(admin.ModelAdmin):
-    list_display = ['session', 'format', 'status', 'created_at']
+    list_display = ['session', 'format', 'status', 'message_count', 'created_at', 'completed_at']
     list_filter = ['format', 'status', 'created_at']
+    list_select_related = ['session']
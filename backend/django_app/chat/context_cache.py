@@ -0,0 +1,141 @@
+"""
+Per-session chat context cache.
+
+Sending a message needs the session's owner and document, the document
+text and the last CHAT_CONTEXT_WINDOW messages. They are kept in the
+default cache (Redis in production, locmem in development) under two
+keys:
+
+- chat:context:<session id>: owner, document, content row id and the
+  rolling window of recent messages, updated as messages are created;
+- chat:content:<content id>: the document text as stored in
+  DocumentContent (compressed, and encrypted when enabled), shared by
+  every session on that content.
+
+Appending to the window is a read-modify-write, so two messages saved
+at once, or a reload racing a new message, could leave a window that
+misses a message. Each session therefore has a version counter,
+chat:context:<session id>:version, bumped atomically with incr for
+every new message. A cached window records the version it reflects and
+is only used while that is still the current one; an appender only
+writes the window it read if no other message came in between.
+Anything else falls back to reading the window from the database.
+
+Reprocessing a document invalidates both. With locmem each process has
+its own cache, so a worker's invalidation only reaches other processes
+once CHAT_CONTEXT_CACHE_TTL expires.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def context_key(session_id):
+    return f'chat:context:{session_id}'
+
+
+def content_key(content_id):
+    return f'chat:content:{content_id}'
+
+
+def version_key(session_id):
+    return f'chat:context:{session_id}:version'
+
+
+def load_context(user, session_id):
+    """Context of the user's session, read from the database on a miss; None when there is no such session"""
+    key, versions = context_key(session_id), version_key(session_id)
+    cached = cache.get_many([key, versions])
+    context = cached.get(key)
+    if context is not None and context['version'] == cached.get(versions):
+        return context if context['user_id'] == user.id else None
+
+    from .models import ChatSession
+
+    # Read before the messages: one created meanwhile bumps it, marking this window stale
+    cache.add(versions, 0, settings.CHAT_CONTEXT_CACHE_TTL)
+    version = cache.get(versions)
+
+    session = ChatSession.objects.filter(id=session_id, user=user).select_related('document').first()
+    if session is None:
+        return None
+
+    recent_messages = session.messages.order_by('-created_at').values('role', 'content')[:settings.CHAT_CONTEXT_WINDOW]
+    context = {
+        'session_id': str(session.id),
+        'user_id': user.id,
+        'document_id': str(session.document_id),
+        'content_id': session.document.content_id,
+        'messages': [message_item(message['role'], message['content']) for message in reversed(recent_messages)],
+        'version': version,
+    }
+    if version is not None:
+        cache.set(key, context, settings.CHAT_CONTEXT_CACHE_TTL)
+        cache.touch(versions, settings.CHAT_CONTEXT_CACHE_TTL)
+    return context
+
+
+def load_document_texts(context):
+    """Extracted text and summary of the session's document"""
+    from documents.models import DocumentContent
+
+    if context['content_id'] is None:
+        return '', ''
+
+    stored = cache.get(content_key(context['content_id']))
+    if stored is None:
+        content = DocumentContent.objects.filter(id=context['content_id']).values(
+            'encrypted', 'extracted_text_data', 'summary_data'
+        ).first()
+        if content is None:
+            return '', ''
+        stored = {key: bytes(value) if key != 'encrypted' else value for key, value in content.items()}
+        cache.set(content_key(context['content_id']), stored, settings.CHAT_CONTEXT_CACHE_TTL)
+
+    decoder = DocumentContent(encrypted=stored['encrypted'])
+    return decoder.decode_text(stored['extracted_text_data']), decoder.decode_text(stored['summary_data'])
+
+
+def message_item(role, content):
+    return {'role': role.lower(), 'content': content}
+
+
+def append_message(message):
+    """Write a new message through to its session's cached window, once committed"""
+    transaction.on_commit(lambda: _append_message(message))
+
+
+def _append_message(message):
+    key, versions = context_key(message.session_id), version_key(message.session_id)
+    try:
+        version = cache.incr(versions)
+    except ValueError:
+        # Never loaded, or expired: the next send loads the window from the database
+        cache.delete(key)
+        return
+    context = cache.get(key)
+    if context is None or context['version'] != version - 1:
+        # Not cached, or another message got in first: the cached window no longer
+        # matches the version and the next send reloads it
+        return
+    window = context['messages'] + [message_item(message.role, message.content)]
+    context['messages'] = window[-settings.CHAT_CONTEXT_WINDOW:]
+    context['version'] = version
+    cache.set(key, context, settings.CHAT_CONTEXT_CACHE_TTL)
+    cache.touch(versions, settings.CHAT_CONTEXT_CACHE_TTL)
+
+
+def invalidate_session(session_id):
+    cache.delete(context_key(session_id))
+
+
+def invalidate_document(document):
+    """Drop cached context of every session on a document whose text changed or is going away"""
+    from .models import ChatSession
+
+    session_ids = ChatSession.objects.filter(document_id=document.pk).values_list('id', flat=True)
+    keys = [context_key(session_id) for session_id in session_ids]
+    if document.content_id:
+        # Content rows are updated in place when not shared
+        keys.append(content_key(document.content_id))
+    cache.delete_many(keys)
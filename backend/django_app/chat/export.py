@@ -0,0 +1,353 @@
+"""
+Chat session export to TXT, DOCX and PDF.
+
+Messages are read with .iterator() in CHAT_EXPORT_CHUNK_SIZE rows and
+handed one at a time to a writer that appends to a binary file, so
+memory does not grow with the length of the session:
+
+- TXT is written line by line;
+- DOCX is a minimal WordprocessingML package whose document.xml is
+  streamed into the ZIP entry (python-docx would build the whole
+  document tree in memory first);
+- PDF is written object by object with the standard Helvetica fonts;
+  only the current page is buffered, and the page tree and xref table
+  are written at the end from the recorded offsets.
+
+build_export() spools the output to a temporary file on disk and saves
+it to the export's FileField, which streams it to local storage or S3.
+"""
+import json
+import re
+import tempfile
+import unicodedata
+import zipfile
+import zlib
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+ROLE_LABELS = {
+    'USER': 'Usuário',
+    'ASSISTANT': 'Assistente',
+    'SYSTEM': 'Sistema',
+}
+
+# Not allowed in XML 1.0, and meaningless in the other formats
+CONTROL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+
+def clean_text(text):
+    return CONTROL_CHARACTERS.sub('', text.replace('\r\n', '\n').replace('\r', '\n'))
+
+
+def format_time(value):
+    return timezone.localtime(value).strftime('%d/%m/%Y %H:%M')
+
+
+def message_heading(message):
+    return f"{ROLE_LABELS.get(message.role, message.role)} - {format_time(message.created_at)}"
+
+
+def metadata_lines(message):
+    lines = [f'Tokens: {message.tokens_used}']
+    if message.metadata:
+        lines.append(f"Metadata: {json.dumps(message.metadata, ensure_ascii=False, sort_keys=True)}")
+    return lines
+
+
+def header_lines(session, exported_at):
+    lines = [f'Documento: {session.document.title}']
+    lines.append(f'Criada em: {format_time(session.created_at)}')
+    lines.append(f'Exportada em: {format_time(exported_at)}')
+    return lines
+
+
+class TextExportWriter:
+    extension = 'txt'
+
+    def __init__(self, out, include_metadata=False):
+        self.out = out
+        self.include_metadata = include_metadata
+
+    def _write(self, text):
+        self.out.write(text.encode('utf-8'))
+
+    def begin(self, session, exported_at):
+        title = clean_text(session.title)
+        self._write(f"{title}\n{'=' * len(title)}\n")
+        self._write('\n'.join(header_lines(session, exported_at)) + '\n\n')
+
+    def message(self, message):
+        self._write(f'[{message_heading(message)}]\n')
+        self._write(clean_text(message.content) + '\n')
+        if self.include_metadata:
+            self._write('\n'.join(clean_text(line) for line in metadata_lines(message)) + '\n')
+        self._write('\n')
+
+    def finish(self):
+        pass
+
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+DOCX_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+DOCX_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+DOCX_DOCUMENT_END = (
+    # A4 with 2 cm margins
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+    '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134" '
+    'w:header="709" w:footer="709" w:gutter="0"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+
+
+class DocxExportWriter:
+    extension = 'docx'
+
+    def __init__(self, out, include_metadata=False):
+        self.include_metadata = include_metadata
+        self.package = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+        self.package.writestr('[Content_Types].xml', DOCX_CONTENT_TYPES)
+        self.package.writestr('_rels/.rels', DOCX_RELATIONSHIPS)
+        self.document = self.package.open('word/document.xml', 'w', force_zip64=True)
+        self._write(DOCX_DOCUMENT_START)
+
+    def _write(self, xml):
+        self.document.write(xml.encode('utf-8'))
+
+    def _paragraph(self, text, bold=False, size=None, color=None, space_after=None):
+        properties = ''
+        if bold:
+            properties += '<w:b/>'
+        if color:
+            properties += f'<w:color w:val="{color}"/>'
+        if size:
+            properties += f'<w:sz w:val="{size * 2}"/>'
+        run_properties = f'<w:rPr>{properties}</w:rPr>' if properties else ''
+        paragraph_properties = f'<w:pPr><w:spacing w:after="{space_after}"/></w:pPr>' if space_after is not None else ''
+        lines = clean_text(text).split('\n')
+        content = '<w:br/>'.join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in lines)
+        self._write(f'<w:p>{paragraph_properties}<w:r>{run_properties}{content}</w:r></w:p>')
+
+    def begin(self, session, exported_at):
+        self._paragraph(session.title, bold=True, size=16)
+        self._paragraph('\n'.join(header_lines(session, exported_at)), color='666666', space_after=240)
+
+    def message(self, message):
+        self._paragraph(message_heading(message), bold=True, space_after=0)
+        self._paragraph(message.content)
+        if self.include_metadata:
+            self._paragraph('\n'.join(metadata_lines(message)), color='666666', size=9)
+
+    def finish(self):
+        self._write(DOCX_DOCUMENT_END)
+        self.document.close()
+        self.package.close()
+
+
+class HelveticaWidths(dict):
+    """Advance widths of Helvetica in 1/1000 of the font size; accented letters take their base letter's"""
+
+    def __missing__(self, character):
+        width = self.get(unicodedata.normalize('NFD', character)[:1], 556)
+        if ord(character) < 0x250:
+            # Only Latin letters are remembered, so odd input cannot grow the table
+            self[character] = width
+        return width
+
+
+HELVETICA_WIDTHS = HelveticaWidths(zip(
+    (chr(code) for code in range(32, 127)),
+    (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    )
+))
+
+
+@lru_cache(maxsize=8192)
+def text_width(text):
+    return sum(map(HELVETICA_WIDTHS.__getitem__, text))
+
+
+class PdfExportWriter:
+    extension = 'pdf'
+
+    page_width = 595  # A4, in points
+    page_height = 842
+    margin = 56
+    font_size = 10
+    leading = 14
+
+    # Objects 1 to 4 are known upfront; pages get numbers as they are written
+    CATALOG, PAGES, REGULAR_FONT, BOLD_FONT = 1, 2, 3, 4
+
+    def __init__(self, out, include_metadata=False):
+        self.out = out
+        self.include_metadata = include_metadata
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 5
+        self.operations = []
+        self.y = self.page_height - self.margin
+
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for number, name in ((self.REGULAR_FONT, 'Helvetica'), (self.BOLD_FONT, 'Helvetica-Bold')):
+            self._object(number, f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'.encode())
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    def _allocate(self):
+        number = self.next_id
+        self.next_id += 1
+        return number
+
+    def _flush_page(self):
+        content = zlib.compress('\n'.join(self.operations).encode('latin-1'))
+        content_id, page_id = self._allocate(), self._allocate()
+        self._object(content_id, f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode() + content + b'\nendstream')
+        self._object(page_id, (
+            f'<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {self.page_width} {self.page_height}] '
+            f'/Resources << /Font << /F1 {self.REGULAR_FONT} 0 R /F2 {self.BOLD_FONT} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>'
+        ).encode())
+        self.page_ids.append(page_id)
+        self.operations = []
+        self.y = self.page_height - self.margin
+
+    def _wrap(self, text, size):
+        """Split text into lines that fit between the margins"""
+        limit = (self.page_width - 2 * self.margin) * 1000 / size
+        for paragraph in clean_text(text).split('\n'):
+            line, width = [], 0
+            for word in re.findall(r'\S+\s*', paragraph):
+                visible = word.rstrip()
+                if line and width + text_width(visible) > limit:
+                    yield ''.join(line).rstrip()
+                    line, width = [], 0
+                while text_width(visible) > limit:
+                    # A single word wider than the line is cut
+                    cut, cut_width = 0, 0
+                    while cut_width + HELVETICA_WIDTHS[visible[cut]] <= limit:
+                        cut_width += HELVETICA_WIDTHS[visible[cut]]
+                        cut += 1
+                    yield visible[:cut]
+                    word, visible = word[cut:], visible[cut:]
+                line.append(word)
+                width += text_width(word)
+            yield ''.join(line).rstrip()
+
+    def _text(self, text, bold=False, size=None, gray=False):
+        size = size or self.font_size
+        leading = self.leading * size / self.font_size
+        for line in self._wrap(text, size):
+            if self.y - leading < self.margin:
+                self._flush_page()
+            self.y -= leading
+            encoded = line.encode('cp1252', errors='replace').decode('latin-1')
+            encoded = encoded.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            color = '0.4 g ' if gray else ''
+            self.operations.append(
+                f"BT {color}/{'F2' if bold else 'F1'} {size:g} Tf {self.margin} {self.y:.2f} Td ({encoded}) Tj ET"
+            )
+
+    def _space(self):
+        self.y -= self.leading / 2
+
+    def begin(self, session, exported_at):
+        self._text(session.title, bold=True, size=16)
+        self._space()
+        self._text('\n'.join(header_lines(session, exported_at)), gray=True)
+        self._space()
+
+    def message(self, message):
+        self._space()
+        self._text(message_heading(message), bold=True)
+        self._text(message.content)
+        if self.include_metadata:
+            self._text('\n'.join(metadata_lines(message)), size=8, gray=True)
+
+    def finish(self):
+        if self.operations or not self.page_ids:
+            self._flush_page()
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_ids)
+        self._object(self.PAGES, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>'.encode())
+        self._object(self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode())
+
+        xref_position = self.position
+        count = self.next_id
+        entries = ['0000000000 65535 f \n'] + [f'{self.offsets[number]:010d} 00000 n \n' for number in range(1, count)]
+        self._write(f'xref\n0 {count}\n{"".join(entries)}'.encode())
+        self._write(f'trailer\n<< /Size {count} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n'.encode())
+
+
+WRITERS = {
+    'TXT': TextExportWriter,
+    'DOCX': DocxExportWriter,
+    'PDF': PdfExportWriter,
+}
+
+
+def session_messages(session):
+    """Messages in order, fetched in chunks"""
+    return (
+        session.messages.order_by('created_at', 'id')
+        .only('session', 'role', 'content', 'tokens_used', 'metadata', 'created_at')
+        .iterator(chunk_size=settings.CHAT_EXPORT_CHUNK_SIZE)
+    )
+
+
+def write_export(session, export_format, out, include_metadata=False):
+    """Write a session to a binary file object; returns the number of messages written"""
+    writer = WRITERS[export_format](out, include_metadata)
+    writer.begin(session, timezone.now())
+    count = 0
+    for message in session_messages(session):
+        writer.message(message)
+        count += 1
+    writer.finish()
+    return count
+
+
+def export_file_name(export):
+    return f"{export.session_id}-{timezone.now():%Y%m%d%H%M%S}.{WRITERS[export.format].extension}"
+
+
+def build_export(export):
+    """Write the export's file to storage; returns the number of messages exported"""
+    with tempfile.TemporaryFile() as spool:
+        count = write_export(export.session, export.format, spool, export.include_metadata)
+        spool.seek(0)
+        export.file.save(export_file_name(export), File(spool), save=False)
+    return count
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from chat.models import ChatMessage, ChatSession, message_preview
+
+
+class Command(BaseCommand):
+    help = 'Recompute message_count and last message fields of chat sessions from their messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        messages = ChatMessage.objects.filter(session=OuterRef('pk'))
+        last_message = messages.order_by('-created_at', '-id')
+        sessions = ChatSession.objects.annotate(
+            counted=Subquery(messages.order_by().values('session').annotate(total=Count('id')).values('total')),
+            last_at=Subquery(last_message.values('created_at')[:1]),
+            last_role=Subquery(last_message.values('role')[:1]),
+            last_content=Subquery(last_message.values('content')[:1]),
+        ).only('id')
+
+        updated = 0
+        batch_size = options['batch_size']
+        ids = list(ChatSession.objects.order_by('pk').values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = []
+            for session in sessions.filter(id__in=ids[start:start + batch_size]):
+                session.message_count = session.counted or 0
+                session.last_message_at = session.last_at
+                session.last_message_role = session.last_role or ''
+                session.last_message_preview = message_preview(session.last_content or '')
+                batch.append(session)
+            with transaction.atomic():
+                ChatSession.objects.bulk_update(
+                    batch, ['message_count', 'last_message_at', 'last_message_role', 'last_message_preview']
+                )
+            updated += len(batch)
+            self.stdout.write(f'{updated} sessions updated...')
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} chat sessions'))
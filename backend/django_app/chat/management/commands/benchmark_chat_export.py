@@ -0,0 +1,115 @@
+import time
+import tracemalloc
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.export import WRITERS, build_export
+from chat.models import ChatExport, ChatMessage, ChatSession
+from documents.models import Document
+
+BENCH_EMAIL = 'benchmark-chat-export@jurchat.local'
+
+
+class Command(BaseCommand):
+    help = (
+        'Export a long chat session to every format and report the time and peak Python memory '
+        'of each, next to loading the whole session at once'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000, help='Messages in the benchmark session')
+        parser.add_argument('--message-size', type=int, default=1200, help='Characters per message')
+        parser.add_argument('--max-peak-mb', type=float, default=16,
+                            help='Fail when an export peaks above this many MB')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark user and its session')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email=BENCH_EMAIL).delete()
+            self.stdout.write(f'Deleted {deleted} rows')
+            return
+
+        user, _ = User.objects.get_or_create(
+            email=BENCH_EMAIL,
+            defaults={'username': 'benchmark-chat-export', 'plan': 'PREMIUM'}
+        )
+        session = self.seed(user, options['messages'], options['message_size'])
+        total = session.messages.count()
+        self.stdout.write(f'Session with {total} messages of {options["message_size"]} characters')
+
+        peak, elapsed = self.measure(lambda: [message.content for message in session.messages.all()])
+        self.stdout.write(f'{"load all":8} {elapsed:7.2f}s   peak {peak / 2 ** 20:7.1f} MB')
+
+        failures = []
+        for export_format in WRITERS:
+            export = ChatExport.objects.create(session=session, format=export_format, include_metadata=True)
+            try:
+                peak, elapsed = self.measure(lambda: build_export(export))
+                size = export.file.size
+                self.check_file(export)
+            finally:
+                if export.file:
+                    export.file.delete(save=False)
+                export.delete()
+            self.stdout.write(
+                f'{export_format:8} {elapsed:7.2f}s   peak {peak / 2 ** 20:7.1f} MB   file {size / 2 ** 20:7.1f} MB'
+            )
+            if peak > options['max_peak_mb'] * 2 ** 20:
+                failures.append(f'{export_format} peaked at {peak / 2 ** 20:.1f} MB')
+
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'Every export stayed under {options["max_peak_mb"]:g} MB'))
+
+    def seed(self, user, messages, message_size):
+        document = Document.objects.filter(user=user).first() or Document.objects.create(
+            user=user, title='Contrato de prestação de serviços', document_type='CONTRACT',
+            file='documents/benchmark.pdf', file_size=1000, mime_type='application/pdf', status='PROCESSED'
+        )
+        session = ChatSession.objects.filter(user=user).first() or ChatSession.objects.create(
+            user=user, document=document, title='Sessão de benchmark'
+        )
+
+        missing = messages - session.messages.count()
+        sentence = 'Cláusula (3ª) prevê multa de 10% sobre o valor do contrato, além de juros. '
+        content = (sentence * (message_size // len(sentence) + 1))[:message_size]
+        batch = []
+        for number in range(max(missing, 0)):
+            role = 'USER' if number % 2 == 0 else 'ASSISTANT'
+            batch.append(ChatMessage(
+                session=session, role=role, content=f'{number}\n{content}',
+                tokens_used=0 if role == 'USER' else 250, metadata={'model': 'benchmark'} if role == 'ASSISTANT' else {}
+            ))
+            if len(batch) == 1000:
+                ChatMessage.objects.bulk_create(batch)
+                batch = []
+        ChatMessage.objects.bulk_create(batch)
+        return session
+
+    def measure(self, func):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            func()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, elapsed
+
+    def check_file(self, export):
+        with export.file.open('rb') as f:
+            if export.format == 'DOCX':
+                with zipfile.ZipFile(f) as package:
+                    if package.testzip() is not None:
+                        raise CommandError('DOCX export is not a valid ZIP file')
+                return
+            head = f.read(5)
+            if export.format == 'PDF':
+                f.seek(-6, 2)
+                if head != b'%PDF-' or f.read().strip() != b'%%EOF':
+                    raise CommandError('PDF export is truncated')
@@ -0,0 +1,60 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chat.models import ChatMessage, ChatSession
+from chat.views import ChatSessionListCreateView
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that listing chat sessions runs the same number of queries for 1 and N sessions. '
+        'Data is created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=20, help='Sessions on the larger page')
+        parser.add_argument('--messages', type=int, default=5, help='Messages per session')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = {}
+            for sessions in (1, options['sessions']):
+                user = self.seed(sessions, options['messages'])
+                counts[sessions] = self.list_queries(user)
+                self.stdout.write(f'{sessions:4} sessions: {counts[sessions]} queries')
+            transaction.set_rollback(True)
+
+        if len(set(counts.values())) != 1:
+            raise CommandError('Chat session list query count grows with the number of sessions')
+        self.stdout.write(self.style.SUCCESS('Chat session list runs a constant number of queries'))
+
+    def seed(self, sessions, messages):
+        suffix = uuid.uuid4().hex[:12]
+        user = get_user_model().objects.create(
+            email=f'chat-queries-{suffix}@jurchat.local', username=f'chat-queries-{suffix}'
+        )
+        for number in range(sessions):
+            document = Document.objects.create(
+                user=user, title=f'Document {number}', document_type='CONTRACT',
+                file='documents/check.pdf', file_size=1000, mime_type='application/pdf', status='PROCESSED'
+            )
+            session = ChatSession.objects.create(user=user, document=document, title=f'Chat {number}')
+            for message in range(messages):
+                ChatMessage.objects.create(session=session, role='USER', content=f'Pergunta {message} ' * 20)
+        return user
+
+    def list_queries(self, user):
+        request = APIRequestFactory().get('/api/chat/sessions/')
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as captured:
+            response = ChatSessionListCreateView.as_view()(request)
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f'Session list returned {response.status_code}')
+        return len(captured)
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat import services
+from chat.models import ChatSession
+from core import ai_client
+from core.asgi import application
+from documents.models import Document, DocumentContent
+
+LOAD_EMAIL_DOMAIN = 'load-test-chat.jurchat.local'
+
+
+class FakeAIService:
+    """Keep-alive HTTP server answering /ai/chat after a fixed delay, counting concurrent requests"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.port = None
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self.ready.wait()
+        return f'http://127.0.0.1:{self.port}'
+
+    def reset(self):
+        self.in_flight = self.peak_in_flight = 0
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=4096)
+        )
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.split(b'\r\n'):
+                    name, _, value = line.partition(b':')
+                    if name.strip().lower() == b'content-length':
+                        length = int(value)
+                await reader.readexactly(length)
+
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    await asyncio.sleep(self.latency)
+                finally:
+                    self.in_flight -= 1
+
+                body = json.dumps({'response': 'Resposta de teste.', 'tokens_used': 10, 'metadata': {}}).encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def legacy_send_message(request, session_id):
+    """The send path before the async view: blocks its worker for the whole AI call"""
+    exchange = services.start_exchange(request.user, session_id, request.data['message'])
+    try:
+        exchange.result = ai_client.get_ai_client().chat(exchange.payload)
+    except ai_client.AIServiceError:
+        pass
+    return Response(services.finish_exchange(exchange), status=status.HTTP_200_OK)
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent in-flight chats per process: sync workers vs the async send_message view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='Chats sent at the same time')
+        parser.add_argument('--latency', type=float, default=2.0, help='Seconds the fake AI service takes to answer')
+        parser.add_argument('--sync-workers', type=int, default=4,
+                            help='Sync workers (gunicorn sync workers or threads) for the baseline')
+        parser.add_argument('--only', choices=['sync', 'async'], help='Run a single mode')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the load test users and their data')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{LOAD_EMAIL_DOMAIN}').delete()
+            self.stdout.write(f'Deleted {deleted} rows')
+            return
+
+        sessions = self.seed(options['concurrency'])
+
+        fake_service = FakeAIService(options['latency'])
+        settings.FASTAPI_SERVICE_URL = fake_service.start()
+        settings.AI_SERVICE_ASYNC_POOL_SIZE = max(settings.AI_SERVICE_ASYNC_POOL_SIZE, options['concurrency'])
+        self.stdout.write(
+            f"{options['concurrency']} concurrent chats, AI service latency {options['latency']:.1f}s"
+        )
+
+        if options['only'] != 'async':
+            timings, errors, wall = self.run_sync(sessions, options['sync_workers'])
+            self.report(f"sync ({options['sync_workers']} workers)", timings, errors, wall, fake_service)
+
+        if options['only'] != 'sync':
+            fake_service.reset()
+            timings, errors, wall = asyncio.run(self.run_async(sessions))
+            self.report('async view', timings, errors, wall, fake_service)
+
+    def seed(self, count):
+        """One premium user, processed document and chat session per concurrent chat"""
+        User = get_user_model()
+        existing = list(
+            ChatSession.objects.filter(user__email__endswith=f'@{LOAD_EMAIL_DOMAIN}').select_related('user')[:count]
+        )
+        if len(existing) >= count:
+            return existing
+
+        content = DocumentContent()
+        content.set_texts('Cláusula de exemplo para o teste de carga. ' * 100, 'Resumo de teste.')
+        content.save()
+        users = User.objects.bulk_create([
+            User(email=f'chat-{uuid.uuid4().hex[:12]}@{LOAD_EMAIL_DOMAIN}',
+                 username=f'load-chat-{uuid.uuid4().hex[:12]}', plan='PREMIUM')
+            for _ in range(count - len(existing))
+        ])
+        documents = Document.objects.bulk_create([
+            Document(user=user, title='Load test document', document_type='CONTRACT',
+                     file='documents/load-test.pdf', file_size=1000, mime_type='application/pdf',
+                     status='PROCESSED', content=content)
+            for user in users
+        ])
+        created = ChatSession.objects.bulk_create([
+            ChatSession(user=document.user, document=document, title='Load test chat')
+            for document in documents
+        ])
+        return existing + created
+
+    def run_sync(self, sessions, workers):
+        factory = APIRequestFactory()
+
+        def send(session):
+            request = factory.post(f'/api/chat/{session.id}/send/', {'message': 'Qual o prazo?'}, format='json')
+            force_authenticate(request, user=session.user)
+            start = time.perf_counter()
+            try:
+                response = legacy_send_message(request, session_id=session.id)
+                return time.perf_counter() - start, response.status_code != 200 or 'error_message' in response.data
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(send, sessions))
+        return [timing for timing, _ in results], sum(error for _, error in results), time.perf_counter() - start
+
+    async def run_async(self, sessions):
+        tokens = [str(AccessToken.for_user(session.user)) for session in sessions]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            self.send_asgi(session, token) for session, token in zip(sessions, tokens)
+        ))
+        wall = time.perf_counter() - start
+        await ai_client.get_async_ai_client().client.aclose()
+        return [timing for timing, _ in results], sum(error for _, error in results), wall
+
+    async def send_asgi(self, session, token):
+        """POST through the ASGI application, as uvicorn would"""
+        body = json.dumps({'message': 'Qual o prazo?'}).encode()
+        path = f'/api/chat/{session.id}/send/'
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'authorization', f'Bearer {token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        response = {}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # No disconnect until the response is sent
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'] = response.get('body', b'') + message.get('body', b'')
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.get('status') != 200 or b'error_message' in response.get('body', b'')
+
+    def report(self, label, timings, errors, wall, fake_service):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        self.stdout.write(
+            f'{label:18} peak in flight {fake_service.peak_in_flight:4}   wall {wall:7.1f}s   '
+            f'{len(timings) / wall:6.1f} chats/s   p50 {statistics.median(timings):6.2f}s   '
+            f'p95 {p95:6.2f}s   errors {errors}'
+        )
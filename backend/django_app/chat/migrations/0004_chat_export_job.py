@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatexport',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='chatexport',
+            name='include_metadata',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='chatexport',
+            name='message_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -1,6 +1,16 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from django.conf import settings
+from django.utils import timezone
+
+from .context_cache import append_message
+
+PREVIEW_LENGTH = 100
+
+
+def message_preview(content):
+    return content[:PREVIEW_LENGTH] + '...' if len(content) > PREVIEW_LENGTH else content
 
 
 class ChatSession(models.Model):
@@ -11,6 +21,13 @@ class ChatSession(models.Model):
     document = models.ForeignKey('documents.Document', on_delete=models.CASCADE, related_name='chat_sessions')
     title = models.CharField(max_length=255, help_text='Chat session title')
     is_active = models.BooleanField(default=True)
+    
+    # Maintained by ChatMessage.save; `manage.py backfill_chat_session_stats` recomputes them
+    message_count = models.IntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_role = models.CharField(max_length=10, blank=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH + 3, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -24,7 +41,7 @@ class ChatSession(models.Model):
     
     def get_message_count(self):
         """Get total message count for this session"""
-        return self.messages.count()
+        return self.message_count
     
     def can_send_message(self):
         """Check if user can send more messages based on plan limits"""
@@ -57,9 +74,38 @@ class ChatMessage(models.Model):
     class Meta:
         db_table = 'chat_messages'
         ordering = ['created_at']
+        indexes = [
+            # Message history pages and incremental fetches (chat.pagination.MessageHistoryPagination)
+            models.Index(fields=['session', 'created_at', 'id'], name='chat_messages_session_idx'),
+        ]
     
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
+    
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                self.update_session_stats()
+        if created:
+            # Keep the session's cached message window current (chat/context_cache.py)
+            append_message(self)
+    
+    def update_session_stats(self):
+        """Count this message on its session in one UPDATE; an older message committing late does not become the last one"""
+        is_latest = Q(last_message_at__isnull=True) | Q(last_message_at__lte=self.created_at)
+        
+        def if_latest(value, field):
+            return Case(When(is_latest, then=Value(value)), default=F(field))
+        
+        ChatSession.objects.filter(id=self.session_id).update(
+            message_count=F('message_count') + 1,
+            updated_at=timezone.now(),
+            last_message_at=if_latest(self.created_at, 'last_message_at'),
+            last_message_role=if_latest(self.role, 'last_message_role'),
+            last_message_preview=if_latest(message_preview(self.content), 'last_message_preview'),
+        )
 
 
 class ChatFeedback(models.Model):
@@ -136,7 +182,10 @@ class ChatExport(models.Model):
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='exports')
     format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    include_metadata = models.BooleanField(default=False)
     file = models.FileField(upload_to='chat_exports/', null=True, blank=True)
+    message_count = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
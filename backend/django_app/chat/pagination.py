@@ -0,0 +1,64 @@
+"""Message history pagination for chat sessions"""
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.pagination import KeysetPagination
+
+
+class MessageHistoryPagination(KeysetPagination):
+    """
+    Newest messages first, paging back through history with `cursor`.
+
+    With `after=<message id>` it returns the messages created after that
+    one instead, oldest first, for clients catching up. `next` continues
+    from the last returned message and is null once they are up to date.
+    """
+
+    page_size = 50
+    after_query_param = 'after'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.after = request.query_params.get(self.after_query_param)
+        if not self.after:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        try:
+            pk = queryset.model._meta.pk.to_python(self.after)
+        except ValidationError:
+            raise NotFound('Message not found')
+        anchor = queryset.filter(pk=pk).values_list('created_at', flat=True).first()
+        if anchor is None:
+            raise NotFound('Message not found')
+
+        # Same index seek as the backwards pages, in the other direction
+        queryset = queryset.order_by('created_at', 'id').filter(created_at__gte=anchor).filter(
+            Q(created_at__gt=anchor) | Q(id__gt=pk)
+        )
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.after:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.after_query_param, str(self.page[-1].pk))
+
+    def get_paginated_response(self, data):
+        if not self.after:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
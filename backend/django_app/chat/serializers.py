@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ChatSession, ChatMessage, ChatFeedback, ChatTemplate
+from .models import ChatSession, ChatMessage, ChatFeedback, ChatTemplate, ChatExport
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -12,10 +12,9 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 
 
 class ChatSessionSerializer(serializers.ModelSerializer):
-    """Serializer for chat sessions"""
+    """Serializer for chat sessions; messages are fetched from the session's messages endpoint"""
     
-    messages = ChatMessageSerializer(many=True, read_only=True)
-    message_count = serializers.SerializerMethodField()
+    message_count = serializers.IntegerField(read_only=True)
     can_send_message = serializers.SerializerMethodField()
     document_title = serializers.CharField(source='document.title', read_only=True)
     
@@ -23,22 +22,27 @@ class ChatSessionSerializer(serializers.ModelSerializer):
         model = ChatSession
         fields = (
             'id', 'document', 'document_title', 'title', 'is_active',
-            'messages', 'message_count', 'can_send_message',
+            'message_count', 'can_send_message',
             'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
     
-    def get_message_count(self, obj):
-        return obj.get_message_count()
-    
     def get_can_send_message(self, obj):
         return obj.can_send_message()
 
 
+class ChatSessionWithMessagesSerializer(ChatSessionSerializer):
+    """Chat session with its whole history, for ?include_messages=true"""
+    
+    messages = ChatMessageSerializer(many=True, read_only=True)
+    
+    class Meta(ChatSessionSerializer.Meta):
+        fields = ChatSessionSerializer.Meta.fields + ('messages',)
+
+
 class ChatSessionListSerializer(serializers.ModelSerializer):
-    """Simplified serializer for chat session listing"""
+    """Simplified serializer for chat session listing, reading only the session's denormalized fields"""
     
-    message_count = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     document_title = serializers.CharField(source='document.title', read_only=True)
     
@@ -49,18 +53,14 @@ class ChatSessionListSerializer(serializers.ModelSerializer):
             'message_count', 'last_message', 'created_at', 'updated_at'
         )
     
-    def get_message_count(self, obj):
-        return obj.get_message_count()
-    
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
-        if last_message:
-            return {
-                'content': last_message.content[:100] + '...' if len(last_message.content) > 100 else last_message.content,
-                'role': last_message.role,
-                'created_at': last_message.created_at
-            }
-        return None
+        if obj.last_message_at is None:
+            return None
+        return {
+            'content': obj.last_message_preview,
+            'role': obj.last_message_role,
+            'created_at': obj.last_message_at
+        }
 
 
 class SendMessageSerializer(serializers.Serializer):
@@ -100,3 +100,23 @@ class ChatExportSerializer(serializers.Serializer):
     
     format = serializers.ChoiceField(choices=['PDF', 'DOCX', 'TXT'])
     include_metadata = serializers.BooleanField(default=False)
+
+
+class ChatExportStatusSerializer(serializers.ModelSerializer):
+    """Serializer for export jobs; file_url is set once the export is completed"""
+    
+    file_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ChatExport
+        fields = (
+            'id', 'session', 'format', 'status', 'include_metadata', 'message_count',
+            'file_url', 'error_message', 'created_at', 'completed_at'
+        )
+        read_only_fields = fields
+    
+    def get_file_url(self, obj):
+        request = self.context.get('request')
+        if obj.status == 'COMPLETED' and obj.file and request:
+            return request.build_absolute_uri(obj.file.url)
+        return None
@@ -0,0 +1,162 @@
+"""
+Database side of sending a chat message.
+
+The async send_message view calls start_exchange before and
+finish_exchange after the AI service call (through core.async_db), so
+no thread or connection is held while the answer is generated. Session,
+document text and recent messages come from chat.context_cache, so a
+steady-state turn reads nothing but the user from the database.
+
+The estimated tokens are reserved against the plan before the AI call
+(users.metering) and settled to the tokens actually used afterwards, so
+parallel messages cannot overrun the monthly limit.
+"""
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from django.conf import settings
+
+from users import metering
+from . import context_cache
+from .models import ChatMessage, ChatSession
+
+SERVICE_ERROR_MESSAGE = 'Desculpe, houve um erro temporário no serviço de IA. Tente novamente em alguns instantes.'
+
+
+class ExchangeRejected(Exception):
+    """The message cannot be sent (unknown session, plan limits)"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class Exchange:
+    session: ChatSession
+    user_message: ChatMessage
+    reservation: metering.Reservation
+    payload: Optional[dict] = None
+    error: Optional[Exception] = None
+    result: Optional[Any] = None
+
+
+def start_exchange(user, session_id, content):
+    """Check limits, store the user's message and build the AI request; raises ExchangeRejected"""
+    context = context_cache.load_context(user, session_id)
+    if context is None:
+        raise ExchangeRejected('Chat session not found', 404)
+
+    # The cached context stands in for the session row; only its id is written to
+    session = ChatSession(id=context['session_id'], user=user, document_id=context['document_id'])
+    if settings.PLAN_LIMITS[user.plan]['chat_messages_per_document'] != -1:
+        # Only limited plans need the current message count
+        session.refresh_from_db(fields=['message_count'])
+
+    if not session.can_send_message():
+        raise ExchangeRejected('Message limit reached for your plan', 403)
+
+    try:
+        reservation = metering.reserve(user, metering.AI_TOKENS, estimate_tokens(content))
+    except metering.QuotaExceeded as e:
+        raise ExchangeRejected(str(e), 403)
+
+    try:
+        user_message = create_user_message(session, content)
+    except Exception:
+        metering.release(reservation)
+        raise
+
+    exchange = Exchange(session=session, user_message=user_message, reservation=reservation)
+    try:
+        exchange.payload = build_chat_payload(context, content)
+    except Exception as e:
+        exchange.error = e
+    return exchange
+
+
+def estimate_tokens(content):
+    # Rough estimation
+    return len(content.split()) * 2
+
+
+def create_user_message(session, content):
+    return ChatMessage.objects.create(
+        session=session,
+        role='USER',
+        content=content
+    )
+
+
+def build_chat_payload(context, content):
+    """Request for the AI service: the message, the document and the last messages including this one"""
+    extracted_text, summary = context_cache.load_document_texts(context)
+    conversation_history = context['messages'] + [context_cache.message_item('USER', content)]
+    return {
+        'message': content,
+        'document_id': context['document_id'],
+        'document_content': extracted_text,
+        'document_summary': summary,
+        'conversation_history': conversation_history[-settings.CHAT_CONTEXT_WINDOW:]
+    }
+
+
+def store_reply(session, result):
+    """Save the assistant's answer; creating it bumps the session's updated_at"""
+    return ChatMessage.objects.create(
+        session=session,
+        role='ASSISTANT',
+        content=result['response'],
+        tokens_used=result.get('tokens_used', 0),
+        metadata=result.get('metadata', {})
+    )
+
+
+def store_system_message(session, content):
+    return ChatMessage.objects.create(
+        session=session,
+        role='SYSTEM',
+        content=content
+    )
+
+
+def exchange_response(user_message, reply=None, error_message=None):
+    """Response body of send_message"""
+    data = {
+        'user_message': {
+            'id': str(user_message.id),
+            'content': user_message.content,
+            'created_at': user_message.created_at
+        }
+    }
+    if reply is not None:
+        data['assistant_message'] = {
+            'id': str(reply.id),
+            'content': reply.content,
+            'tokens_used': reply.tokens_used,
+            'created_at': reply.created_at
+        }
+    else:
+        data['error_message'] = {
+            'id': str(error_message.id),
+            'content': error_message.content,
+            'created_at': error_message.created_at
+        }
+    return data
+
+
+def finish_exchange(exchange):
+    """Store the outcome of the AI call and build the response body"""
+    session, user_message = exchange.session, exchange.user_message
+    if exchange.result is not None:
+        reply = store_reply(session, exchange.result)
+        metering.settle(exchange.reservation, reply.tokens_used)
+        return exchange_response(user_message, reply=reply)
+    metering.release(exchange.reservation)
+    if exchange.error is not None:
+        return exchange_response(
+            user_message,
+            error_message=store_system_message(session, f'Erro interno: {exchange.error}')
+        )
+    # The service answered with an error status; the user message is kept
+    return exchange_response(user_message, error_message=store_system_message(session, SERVICE_ERROR_MESSAGE))
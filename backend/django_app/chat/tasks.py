@@ -0,0 +1,33 @@
+from django.utils import timezone
+
+from jobs.queue import task
+from .export import build_export
+from .models import ChatExport
+
+
+def mark_export_failed(payload, error):
+    """Dead letter handler: the export gave up after all retries"""
+    ChatExport.objects.filter(id=payload['export_id']).update(
+        status='FAILED',
+        error_message=str(error)
+    )
+
+
+@task('chat.export_session', max_attempts=3, on_dead_letter=mark_export_failed)
+def export_session(export_id):
+    """Write a chat session to a TXT, DOCX or PDF file in storage"""
+    export = ChatExport.objects.select_related('session__document').filter(id=export_id).first()
+    if export is None:
+        # Session deleted while waiting in the queue
+        return
+
+    export.status = 'PROCESSING'
+    export.save(update_fields=['status'])
+
+    if export.file:
+        # Left by an attempt that failed after saving it
+        export.file.delete(save=False)
+    export.message_count = build_export(export)
+    export.status = 'COMPLETED'
+    export.completed_at = timezone.now()
+    export.save(update_fields=['file', 'message_count', 'status', 'completed_at'])
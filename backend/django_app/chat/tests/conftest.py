@@ -0,0 +1,19 @@
+import pytest
+
+from chat.models import ChatSession
+from documents.models import Document, DocumentContent
+
+
+@pytest.fixture
+def make_chat_session():
+    """Chat session on a processed document of the given user"""
+    def make(user, title='Contrato de locação'):
+        content = DocumentContent()
+        content.set_texts('Cláusula primeira. O locatário pagará o aluguel até o dia 5. ' * 50, 'Resumo.')
+        content.save()
+        document = Document.objects.create(
+            user=user, title=title, document_type='CONTRACT', file='documents/contrato.pdf',
+            file_size=1000, mime_type='application/pdf', status='PROCESSED', content=content
+        )
+        return ChatSession.objects.create(user=user, document=document, title=f'Chat sobre {title}')
+    return make
@@ -0,0 +1,125 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+from chat import context_cache
+from chat.models import ChatMessage
+from documents import tasks
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def add_message(django_capture_on_commit_callbacks):
+    def add(session, content, role='USER'):
+        with django_capture_on_commit_callbacks(execute=True):
+            return ChatMessage.objects.create(session=session, role=role, content=content)
+    return add
+
+
+def window(context):
+    return [message['content'] for message in context['messages']]
+
+
+def test_context_is_served_from_the_cache(user, make_chat_session, add_message, django_assert_num_queries):
+    session = make_chat_session(user)
+    add_message(session, 'Qual o prazo?')
+    first = context_cache.load_context(user, session.id)
+    context_cache.load_document_texts(first)
+
+    with django_assert_num_queries(0):
+        assert context_cache.load_context(user, session.id) == first
+        text, summary = context_cache.load_document_texts(first)
+    assert text.startswith('Cláusula primeira') and summary == 'Resumo.'
+
+
+def test_cached_context_is_not_served_to_another_user(user, make_chat_session, django_user_model):
+    session = make_chat_session(user)
+    context_cache.load_context(user, session.id)
+    other = django_user_model.objects.create_user(email='bruno@example.com', username='bruno', password='x')
+
+    assert context_cache.load_context(other, session.id) is None
+
+
+def test_new_messages_are_appended_and_the_window_trimmed(
+    settings, user, make_chat_session, add_message, django_assert_num_queries
+):
+    settings.CHAT_CONTEXT_WINDOW = 3
+    session = make_chat_session(user)
+    add_message(session, 'Primeira')
+    context_cache.load_context(user, session.id)
+
+    for content in ('Segunda', 'Terceira', 'Quarta'):
+        add_message(session, content)
+
+    with django_assert_num_queries(0):
+        context = context_cache.load_context(user, session.id)
+    assert window(context) == ['Segunda', 'Terceira', 'Quarta']
+
+
+def test_window_overwritten_by_a_stale_writer_is_reloaded(user, make_chat_session, add_message):
+    session = make_chat_session(user)
+    context_cache.load_context(user, session.id)
+    stale = cache.get(context_cache.context_key(session.id))
+
+    add_message(session, 'Pergunta')
+    # A concurrent append or reload that read the window before this message finishes last
+    cache.set(context_cache.context_key(session.id), stale)
+
+    assert window(context_cache.load_context(user, session.id)) == ['Pergunta']
+
+
+def test_concurrent_appends_do_not_lose_messages(user, make_chat_session, monkeypatch):
+    session = make_chat_session(user)
+    context_cache.load_context(user, session.id)
+    question = ChatMessage.objects.create(session=session, role='USER', content='Pergunta')
+    answer = ChatMessage.objects.create(session=session, role='ASSISTANT', content='Resposta')
+
+    # Both read the window before either writes it back
+    read = cache.get(context_cache.context_key(session.id))
+    monkeypatch.setattr(context_cache.cache, 'get', lambda key, *args: copy.deepcopy(read))
+    context_cache._append_message(question)
+    context_cache._append_message(answer)
+    monkeypatch.undo()
+
+    assert window(context_cache.load_context(user, session.id)) == ['Pergunta', 'Resposta']
+
+
+def test_message_on_an_uncached_session_is_loaded_from_the_database(user, make_chat_session, add_message):
+    session = make_chat_session(user)
+    add_message(session, 'Pergunta')
+
+    assert cache.get(context_cache.context_key(session.id)) is None
+    assert window(context_cache.load_context(user, session.id)) == ['Pergunta']
+
+
+def test_reprocessing_the_document_invalidates_the_context(user, make_chat_session, monkeypatch):
+    session = make_chat_session(user)
+    document = session.document
+    document.file.save('contrato.txt', ContentFile(b'texto novo'), save=False)
+    document.content_hash = 'a' * 64
+    document.save()
+    text, _ = context_cache.load_document_texts(context_cache.load_context(user, session.id))
+    assert text.startswith('Cláusula primeira')
+
+    summarize = lambda **kwargs: {'extracted_text': 'Cláusula de foro em Curitiba.', 'summary': 'Novo.', 'tokens_used': 5}
+    monkeypatch.setattr(tasks, 'get_ai_client', lambda: SimpleNamespace(summarize=summarize))
+    tasks.process_document(document.id)
+
+    assert cache.get(context_cache.context_key(session.id)) is None
+    context = context_cache.load_context(user, session.id)
+    assert context_cache.load_document_texts(context) == ('Cláusula de foro em Curitiba.', 'Novo.')
+
+
+def test_deleting_the_document_invalidates_the_context(api_client, user, make_chat_session):
+    session = make_chat_session(user)
+    context_cache.load_context(user, session.id)
+
+    response = api_client.delete(f'/api/documents/{session.document_id}/')
+
+    assert response.status_code == 204
+    assert cache.get(context_cache.context_key(session.id)) is None
+    assert context_cache.load_context(user, session.id) is None
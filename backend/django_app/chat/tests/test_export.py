@@ -0,0 +1,69 @@
+import io
+import tracemalloc
+import zipfile
+
+import pytest
+
+from chat.export import WRITERS, build_export
+from chat.models import ChatExport, ChatMessage
+
+MESSAGES = 1500
+MESSAGE_SIZE = 1000
+SENTENCE = 'Cláusula (3ª) prevê multa de 10% sobre o valor do contrato, além de juros. '
+
+
+def add_messages(session, count, start=0):
+    content = (SENTENCE * (MESSAGE_SIZE // len(SENTENCE) + 1))[:MESSAGE_SIZE]
+    ChatMessage.objects.bulk_create([
+        ChatMessage(
+            session=session, role='USER' if number % 2 == 0 else 'ASSISTANT', content=f'Mensagem {number}\n{content}',
+            tokens_used=250, metadata={'model': 'test'}
+        )
+        for number in range(start, start + count)
+    ], batch_size=500)
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, result
+
+
+def export_peak(session, export_format):
+    """Peak Python memory of building one export, and its file contents"""
+    export = ChatExport.objects.create(session=session, format=export_format, include_metadata=True)
+    peak, count = peak_memory(lambda: build_export(export))
+    assert count == session.messages.count()
+    with export.file.open('rb') as f:
+        return peak, f.read()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('export_format', list(WRITERS))
+def test_export_memory_does_not_grow_with_the_session(settings, user, make_chat_session, export_format):
+    settings.CHAT_EXPORT_CHUNK_SIZE = 100
+    session = make_chat_session(user)
+    add_messages(session, MESSAGES)
+    peak, _ = export_peak(session, export_format)
+
+    add_messages(session, MESSAGES, start=MESSAGES)
+    doubled_peak, data = export_peak(session, export_format)
+
+    load_all_peak, _ = peak_memory(lambda: list(session.messages.all()))
+    # Twice the messages only add per-page bookkeeping, far less than the content they hold
+    assert doubled_peak - peak < MESSAGES * MESSAGE_SIZE / 8
+    assert doubled_peak < load_all_peak / 4
+
+    if export_format == 'TXT':
+        text = data.decode('utf-8')
+        assert 'Mensagem 0\n' in text and f'Mensagem {2 * MESSAGES - 1}\n' in text
+    elif export_format == 'DOCX':
+        assert data.startswith(b'PK')
+        with zipfile.ZipFile(io.BytesIO(data)) as package:
+            assert f'Mensagem {2 * MESSAGES - 1}' in package.read('word/document.xml').decode('utf-8')
+    else:
+        assert data.startswith(b'%PDF-') and data.rstrip().endswith(b'%%EOF')
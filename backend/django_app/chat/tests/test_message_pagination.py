@@ -0,0 +1,138 @@
+import base64
+import uuid
+from datetime import timedelta
+from urllib import parse
+
+import pytest
+from django.utils import timezone
+
+from chat.models import ChatMessage
+
+pytestmark = pytest.mark.django_db
+
+
+def add_messages(session, count, created_at=None, start=0):
+    """Messages with the given created_at, or one second apart; returned in creation order"""
+    base = created_at or timezone.now() - timedelta(days=1)
+    messages = []
+    for number in range(start, start + count):
+        message = ChatMessage.objects.create(session=session, role='USER', content=f'Mensagem {number}')
+        message.created_at = base if created_at else base + timedelta(seconds=number)
+        ChatMessage.objects.filter(pk=message.pk).update(created_at=message.created_at)
+        messages.append(message)
+    return messages
+
+
+def newest_first(messages):
+    return [str(m.id) for m in sorted(messages, key=lambda m: (m.created_at, m.id), reverse=True)]
+
+
+def get_page(api_client, url, **params):
+    response = api_client.get(url, params)
+    assert response.status_code == 200, response.data
+    return response.data
+
+
+def walk(api_client, url, **params):
+    """Ids of every page following `next`, and the number of pages"""
+    ids, pages = [], 0
+    data = get_page(api_client, url, **params)
+    while True:
+        ids += [message['id'] for message in data['results']]
+        pages += 1
+        if data['next'] is None:
+            return ids, pages
+        data = get_page(api_client, data['next'])
+
+
+def messages_url(session):
+    return f'/api/chat/sessions/{session.id}/messages/'
+
+
+def cursor(**values):
+    return base64.urlsafe_b64encode(parse.urlencode(values).encode()).decode()
+
+
+def test_pages_walk_back_through_history(api_client, user, make_chat_session):
+    session = make_chat_session(user)
+    messages = add_messages(session, 7)
+
+    ids, pages = walk(api_client, messages_url(session), page_size=3)
+
+    assert ids == newest_first(messages)
+    assert pages == 3
+
+
+def test_equal_timestamps_are_ordered_by_id(api_client, user, make_chat_session):
+    session = make_chat_session(user)
+    moment = timezone.now() - timedelta(days=2)
+    messages = add_messages(session, 6, created_at=moment) + add_messages(session, 2, start=6)
+
+    ids, _ = walk(api_client, messages_url(session), page_size=3)
+
+    assert ids == newest_first(messages)
+    assert len(set(ids)) == 8
+
+
+def test_cursor_is_stable_when_messages_arrive_between_pages(api_client, user, make_chat_session):
+    session = make_chat_session(user)
+    messages = add_messages(session, 6)
+    first = get_page(api_client, messages_url(session), page_size=3)
+
+    # New messages go on top of the history and must not shift the next page
+    add_messages(session, 2, start=100)
+    second = get_page(api_client, first['next'])
+
+    assert [m['id'] for m in first['results'] + second['results']] == newest_first(messages)
+    assert second['next'] is None
+
+
+def test_after_returns_newer_messages_oldest_first(api_client, user, make_chat_session):
+    session = make_chat_session(user)
+    moment = timezone.now() - timedelta(days=2)
+    tied = add_messages(session, 4, created_at=moment)
+    anchor = min(tied, key=lambda m: m.id)
+    newer = add_messages(session, 3, start=10)
+
+    ids, pages = walk(api_client, messages_url(session), after=str(anchor.id), page_size=2)
+
+    expected = list(reversed(newest_first(tied + newer)))
+    assert ids == expected[expected.index(str(anchor.id)) + 1:]
+    assert pages == 3
+
+
+@pytest.mark.parametrize('value', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    cursor(i=str(uuid.uuid4())),
+    cursor(t='yesterday', i=str(uuid.uuid4())),
+    cursor(t=timezone.now().isoformat(), i='not-a-uuid'),
+])
+def test_invalid_cursor_is_rejected(api_client, user, make_chat_session, value):
+    session = make_chat_session(user)
+    add_messages(session, 2)
+
+    response = api_client.get(messages_url(session), {'cursor': value})
+
+    assert response.status_code == 404
+    assert response.data['detail'] == 'Invalid cursor'
+
+
+def test_after_must_be_a_message_of_the_session(api_client, user, make_chat_session):
+    session = make_chat_session(user)
+    add_messages(session, 2)
+    [elsewhere] = add_messages(make_chat_session(user, title='Procuração'), 1)
+
+    for value in ('not-a-uuid', str(uuid.uuid4()), str(elsewhere.id)):
+        response = api_client.get(messages_url(session), {'after': value})
+        assert response.status_code == 404
+
+
+def test_another_users_history_is_not_found(api_client, make_chat_session, django_user_model):
+    other = django_user_model.objects.create_user(email='bruno@example.com', username='bruno', password='x')
+    session = make_chat_session(other)
+    add_messages(session, 2)
+
+    response = api_client.get(messages_url(session))
+
+    assert response.status_code == 404
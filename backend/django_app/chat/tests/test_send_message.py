@@ -0,0 +1,166 @@
+import asyncio
+import json
+import time
+
+import pytest
+from django.core.cache import cache
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.management.commands.load_test_chat import FakeAIService
+from chat.models import ChatMessage
+from chat.views import SEND_MESSAGE_SCOPE
+from core import ai_client, idempotency
+
+CONCURRENCY = 12
+LATENCY = 0.5
+
+
+@pytest.fixture
+def fake_ai_service(settings):
+    service = FakeAIService(LATENCY)
+    settings.FASTAPI_SERVICE_URL = service.start()
+    return service
+
+
+async def send_all(sessions):
+    client = AsyncClient()
+
+    async def send(session):
+        token = str(AccessToken.for_user(session.user))
+        return await client.post(
+            f'/api/chat/{session.id}/send/',
+            json.dumps({'message': 'Qual o prazo de pagamento?'}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    try:
+        return await asyncio.gather(*(send(session) for session in sessions))
+    finally:
+        await ai_client.get_async_ai_client().client.aclose()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_waiting_on_the_ai_service_does_not_hold_a_thread(settings, django_user_model, make_chat_session,
+                                                          fake_ai_service):
+    # Two database slots for twelve requests: sync workers would answer two at a time
+    settings.ASYNC_DB_CONCURRENCY = 2
+    sessions = []
+    for number in range(CONCURRENCY):
+        user = django_user_model.objects.create_user(
+            email=f'user{number}@example.com', username=f'user{number}', password='x', plan='PREMIUM'
+        )
+        sessions.append(make_chat_session(user))
+
+    started = time.perf_counter()
+    responses = asyncio.run(send_all(sessions))
+    elapsed = time.perf_counter() - started
+
+    assert [response.status_code for response in responses] == [200] * CONCURRENCY
+    assert all(response.json()['assistant_message']['content'] == 'Resposta de teste.' for response in responses)
+    assert fake_ai_service.peak_in_flight == CONCURRENCY
+    assert elapsed < LATENCY * 3
+    assert ChatMessage.objects.filter(session__in=sessions, role='ASSISTANT').count() == CONCURRENCY
+
+
+class ScriptedAIClient:
+    """Async AI client answering from a list of outcomes, exceptions raised"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def chat(self, payload):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {'response': outcome, 'tokens_used': 10, 'metadata': {}}
+
+
+@pytest.fixture
+def premium_session(django_user_model, make_chat_session):
+    user = django_user_model.objects.create_user(
+        email='ana@example.com', username='ana', password='x', plan='PREMIUM'
+    )
+    return make_chat_session(user)
+
+
+def use_ai_client(monkeypatch, client):
+    monkeypatch.setattr('chat.views.get_async_ai_client', lambda: client)
+    return client
+
+
+def send(session, message='Qual o prazo de pagamento?', key='retry-key-1'):
+    token = str(AccessToken.for_user(session.user))
+    return asyncio.run(AsyncClient().post(
+        f'/api/chat/{session.id}/send/',
+        json.dumps({'message': message}),
+        content_type='application/json',
+        headers={'Authorization': f'Bearer {token}', 'Idempotency-Key': key},
+    ))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retry_with_the_same_key_replays_the_answer(monkeypatch, premium_session):
+    client = use_ai_client(monkeypatch, ScriptedAIClient('O prazo é o dia 5.'))
+
+    first = send(premium_session)
+    retry = send(premium_session)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.content == first.content
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert client.calls == 1
+    assert ChatMessage.objects.filter(session=premium_session).count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_key_reused_for_another_message_is_rejected(monkeypatch, premium_session):
+    use_ai_client(monkeypatch, ScriptedAIClient('O prazo é o dia 5.'))
+    send(premium_session)
+
+    response = send(premium_session, message='E a multa?')
+
+    assert response.status_code == 422
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retry_while_the_first_request_runs_gets_a_conflict(settings, monkeypatch, premium_session):
+    settings.IDEMPOTENCY_LOCK_TIMEOUT = 1
+    client = use_ai_client(monkeypatch, ScriptedAIClient())
+    fingerprint = idempotency.fingerprint(premium_session.id, 'Qual o prazo de pagamento?')
+    # A first request still running, its claim outliving the retry's wait
+    cache.set(
+        idempotency.cache_key(SEND_MESSAGE_SCOPE, premium_session.user.pk, 'retry-key-1'),
+        {'fingerprint': fingerprint, 'response': None}, 60
+    )
+
+    response = send(premium_session)
+
+    assert response.status_code == 409
+    assert response['Retry-After'] == '1'
+    assert client.calls == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('failure', [
+    asyncio.TimeoutError(),
+    ai_client.AIServiceError('Service unavailable', status_code=503),
+])
+def test_failed_answer_is_not_replayed(monkeypatch, premium_session, failure):
+    client = use_ai_client(monkeypatch, ScriptedAIClient(failure, 'O prazo é o dia 5.'))
+
+    failed = send(premium_session)
+    assert failed.status_code == 200
+    assert 'error_message' in failed.json()
+
+    retry = send(premium_session)
+    assert retry.status_code == 200
+    assert 'Idempotent-Replayed' not in retry
+    assert retry.json()['assistant_message']['content'] == 'O prazo é o dia 5.'
+    assert client.calls == 2
+
+    assert send(premium_session).content == retry.content
+    assert client.calls == 2
@@ -0,0 +1,34 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from chat.models import ChatMessage
+
+SESSIONS = 15
+
+
+def add_sessions(make_chat_session, user, count, start=0):
+    for number in range(start, start + count):
+        session = make_chat_session(user, title=f'Contrato {number}')
+        for message in range(3):
+            ChatMessage.objects.create(session=session, role='USER', content=f'Pergunta {message}')
+
+
+@pytest.mark.django_db
+def test_session_list_query_count_does_not_grow_with_sessions(api_client, user, make_chat_session,
+                                                              django_assert_num_queries):
+    add_sessions(make_chat_session, user, 1)
+    with CaptureQueriesContext(connection) as one_session:
+        response = api_client.get('/api/chat/sessions/')
+    assert response.status_code == 200
+
+    add_sessions(make_chat_session, user, SESSIONS - 1, start=1)
+    with django_assert_num_queries(len(one_session)):
+        response = api_client.get('/api/chat/sessions/')
+
+    assert response.status_code == 200
+    sessions = response.json()['results']
+    assert len(sessions) == SESSIONS
+    assert {session['document_title'] for session in sessions} == {f'Contrato {n}' for n in range(SESSIONS)}
+    assert all(session['message_count'] == 3 for session in sessions)
+    assert all(session['last_message']['content'] == 'Pergunta 2' for session in sessions)
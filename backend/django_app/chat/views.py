@@ -1,19 +1,33 @@
-import requests
+import json
+import math
+
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
+from core.ai_client import AIServiceError, get_async_ai_client
+from core import idempotency
+from core.async_db import run_db
+from core.authentication import authenticate_jwt, throttle_wait
+from core.ratelimit import PlanRateThrottle, SendMessageRateThrottle
 from documents.models import Document
-from .models import ChatSession, ChatMessage, ChatFeedback, ChatTemplate
+from jobs.queue import enqueue
+from .context_cache import invalidate_session
+from . import services
+from .models import ChatSession, ChatMessage, ChatFeedback, ChatTemplate, ChatExport
+from .pagination import MessageHistoryPagination
 from .serializers import (
+    ChatMessageSerializer,
     ChatSessionSerializer,
+    ChatSessionWithMessagesSerializer,
     ChatSessionListSerializer,
     SendMessageSerializer,
     ChatFeedbackSerializer,
     ChatTemplateSerializer,
-    ChatExportSerializer
+    ChatExportSerializer,
+    ChatExportStatusSerializer
 )
 
 
@@ -28,7 +42,14 @@ class ChatSessionListCreateView(generics.ListCreateAPIView):
         return ChatSessionSerializer
     
     def get_queryset(self):
-        return ChatSession.objects.filter(user=self.request.user)
+        sessions = ChatSession.objects.filter(user=self.request.user)
+        if self.request.method == 'GET':
+            # Constant query count per page: counters are denormalized, the document title is joined
+            sessions = sessions.select_related('document').only(
+                'id', 'document_id', 'document__title', 'title', 'is_active', 'message_count',
+                'last_message_at', 'last_message_role', 'last_message_preview', 'created_at', 'updated_at'
+            )
+        return sessions
     
     def create(self, request, *args, **kwargs):
         document_id = request.data.get('document')
@@ -69,6 +90,8 @@ class ChatSessionListCreateView(generics.ListCreateAPIView):
             role='ASSISTANT',
             content=welcome_message
         )
+        # Message stats were updated in the database
+        session.refresh_from_db()
         
         return Response({
             'message': 'Chat session created successfully',
@@ -79,156 +102,148 @@ class ChatSessionListCreateView(generics.ListCreateAPIView):
 class ChatSessionDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Chat session detail, update, and delete"""
     
-    serializer_class = ChatSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_serializer_class(self):
+        # The full history is opt-in; clients page through ChatMessageListView instead
+        if self.request.method == 'GET' and self.request.query_params.get('include_messages') in ('1', 'true'):
+            return ChatSessionWithMessagesSerializer
+        return ChatSessionSerializer
+    
     def get_queryset(self):
-        return ChatSession.objects.filter(user=self.request.user)
+        return ChatSession.objects.filter(user=self.request.user).select_related('document')
+    
+    def perform_destroy(self, instance):
+        invalidate_session(instance.id)
+        instance.delete()
 
 
-@api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
-def send_message(request, session_id):
-    """Send a message in a chat session"""
-    
-    # Get chat session
-    try:
-        session = ChatSession.objects.get(id=session_id, user=request.user)
-    except ChatSession.DoesNotExist:
-        return Response({
-            'error': 'Chat session not found'
-        }, status=status.HTTP_404_NOT_FOUND)
+class ChatMessageListView(generics.ListAPIView):
+    """Message history of a session, newest first, or the messages after ?after=<message id>"""
     
-    # Check if user can send more messages
-    if not session.can_send_message():
-        return Response({
-            'error': 'Message limit reached for your plan'
-        }, status=status.HTTP_403_FORBIDDEN)
+    serializer_class = ChatMessageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MessageHistoryPagination
     
+    def get_queryset(self):
+        session = get_object_or_404(ChatSession.objects.only('id'), id=self.kwargs['pk'], user=self.request.user)
+        return ChatMessage.objects.filter(session=session)
+
+
+SEND_MESSAGE_SCOPE = 'chat.send_message'
+SEND_MESSAGE_THROTTLES = [PlanRateThrottle, SendMessageRateThrottle]
+
+
+async def send_message(request, session_id):
+    """
+    Send a message in a chat session.
+
+    Async so that waiting up to AI_SERVICE_CHAT_TIMEOUT for the answer does
+    not hold a worker thread or database connection under ASGI. DRF cannot
+    run async views, so authentication, throttling and validation are
+    applied by hand.
+
+    With an Idempotency-Key header, retries of the same message get the
+    first answer replayed (see core/idempotency.py). Attempts that got no
+    answer, rejected or failed in the AI service, are not replayed: the
+    retry sends the message again.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    user, wait = await run_db(_authenticate_and_throttle, request)
+    if user is None:
+        return JsonResponse({
+            'detail': 'Authentication credentials were not provided.'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    if wait is not None:
+        response = JsonResponse({
+            'detail': f'Request was throttled. Expected available in {math.ceil(wait)} seconds.'
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    try:
+        idempotency_key = idempotency.request_key(request)
+    except idempotency.InvalidIdempotencyKey as e:
+        return JsonResponse({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     # Validate message
-    serializer = SendMessageSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
-    
-    user_message_content = serializer.validated_data['message']
-    
-    # Estimate tokens needed
-    estimated_tokens = len(user_message_content.split()) * 2  # Rough estimation
-    
-    # Check AI tokens limit
-    if not request.user.can_use_ai_tokens(estimated_tokens):
-        return Response({
-            'error': 'AI token limit reached for your plan'
-        }, status=status.HTTP_403_FORBIDDEN)
-    
-    # Create user message
-    user_message = ChatMessage.objects.create(
-        session=session,
-        role='USER',
-        content=user_message_content
-    )
-    
     try:
-        # Send to FastAPI service for AI response
-        fastapi_url = f"{settings.FASTAPI_SERVICE_URL}/ai/chat"
-        
-        # Prepare conversation context
-        recent_messages = session.messages.order_by('-created_at')[:10]  # Last 10 messages
-        conversation_history = []
-        
-        for msg in reversed(recent_messages):
-            conversation_history.append({
-                'role': msg.role.lower(),
-                'content': msg.content
-            })
-        
-        payload = {
-            'message': user_message_content,
-            'document_id': str(session.document.id),
-            'document_content': session.document.extracted_text,
-            'document_summary': session.document.summary,
-            'conversation_history': conversation_history
-        }
-        
-        response = requests.post(
-            fastapi_url,
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # Create assistant message
-            assistant_message = ChatMessage.objects.create(
-                session=session,
-                role='ASSISTANT',
-                content=result['response'],
-                tokens_used=result.get('tokens_used', 0),
-                metadata=result.get('metadata', {})
-            )
-            
-            # Update user AI token usage
-            request.user.use_ai_tokens(result.get('tokens_used', 0))
-            
-            # Update session timestamp
-            session.updated_at = timezone.now()
-            session.save()
-            
-            return Response({
-                'user_message': {
-                    'id': str(user_message.id),
-                    'content': user_message.content,
-                    'created_at': user_message.created_at
-                },
-                'assistant_message': {
-                    'id': str(assistant_message.id),
-                    'content': assistant_message.content,
-                    'tokens_used': assistant_message.tokens_used,
-                    'created_at': assistant_message.created_at
-                }
-            }, status=status.HTTP_200_OK)
-        
-        else:
-            # If AI service fails, still keep the user message but add error response
-            error_message = ChatMessage.objects.create(
-                session=session,
-                role='SYSTEM',
-                content='Desculpe, houve um erro temporário no serviço de IA. Tente novamente em alguns instantes.'
-            )
-            
-            return Response({
-                'user_message': {
-                    'id': str(user_message.id),
-                    'content': user_message.content,
-                    'created_at': user_message.created_at
-                },
-                'error_message': {
-                    'id': str(error_message.id),
-                    'content': error_message.content,
-                    'created_at': error_message.created_at
-                }
-            }, status=status.HTTP_200_OK)
-            
-    except Exception as e:
-        # Create error message
-        error_message = ChatMessage.objects.create(
-            session=session,
-            role='SYSTEM',
-            content=f'Erro interno: {str(e)}'
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = SendMessageSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    message = serializer.validated_data['message']
+
+    if idempotency_key is None:
+        response, _ = await _send_message(user, session_id, message)
+        return response
+
+    # Retries with the same key get the first response instead of a second exchange
+    fingerprint = idempotency.fingerprint(session_id, message)
+    try:
+        replay = await idempotency.claim(SEND_MESSAGE_SCOPE, user.pk, idempotency_key, fingerprint)
+    except idempotency.IdempotencyKeyReused as e:
+        return JsonResponse({'detail': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    except idempotency.RequestInProgress as e:
+        response = JsonResponse({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        response['Retry-After'] = '1'
+        return response
+    if replay is not None:
+        status_code, content = replay
+        response = HttpResponse(content, status=status_code, content_type='application/json')
+        response[idempotency.REPLAYED_HEADER] = 'true'
+        return response
+
+    try:
+        response, answered = await _send_message(user, session_id, message)
+    except BaseException:
+        await idempotency.release(SEND_MESSAGE_SCOPE, user.pk, idempotency_key)
+        raise
+    if answered:
+        await idempotency.complete(
+            SEND_MESSAGE_SCOPE, user.pk, idempotency_key, fingerprint, response.status_code, response.content
         )
-        
-        return Response({
-            'user_message': {
-                'id': str(user_message.id),
-                'content': user_message.content,
-                'created_at': user_message.created_at
-            },
-            'error_message': {
-                'id': str(error_message.id),
-                'content': error_message.content,
-                'created_at': error_message.created_at
-            }
-        }, status=status.HTTP_200_OK)
+    else:
+        # Rejected, or the AI service failed or timed out: a retry sends the message again
+        await idempotency.release(SEND_MESSAGE_SCOPE, user.pk, idempotency_key)
+    return response
+
+
+async def _send_message(user, session_id, message):
+    """The response, and whether the AI service answered"""
+    try:
+        exchange = await run_db(services.start_exchange, user, session_id, message)
+    except services.ExchangeRejected as e:
+        return JsonResponse({'error': str(e)}, status=e.status_code), False
+
+    if exchange.payload is not None:
+        try:
+            exchange.result = await get_async_ai_client().chat(exchange.payload)
+        except AIServiceError as e:
+            if e.status_code is None:
+                exchange.error = e
+        except Exception as e:
+            exchange.error = e
+
+    data = await run_db(services.finish_exchange, exchange)
+    response = JsonResponse(data, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False}, status=status.HTTP_200_OK)
+    return response, exchange.result is not None
+
+
+# JWT only, no cookies; set by hand because csrf_exempt is not async-aware before Django 5.0
+send_message.csrf_exempt = True
+
+
+def _authenticate_and_throttle(request):
+    user = authenticate_jwt(request)
+    if user is None:
+        return None, None
+    request.user = user
+    return user, throttle_wait(request, SEND_MESSAGE_THROTTLES)
 
 
 class ChatFeedbackView(generics.CreateAPIView):
@@ -287,9 +302,26 @@ def export_chat(request, session_id):
     serializer = ChatExportSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     
-    # In a real implementation, this would be handled by a background task
-    # For now, just return a success message
+    export = ChatExport.objects.create(
+        session=session,
+        format=serializer.validated_data['format'],
+        include_metadata=serializer.validated_data['include_metadata']
+    )
+    
+    # Written by the background job workers; poll the export until it is completed
+    enqueue('chat.export_session', export_id=str(export.id))
+    
     return Response({
-        'message': 'Export request received. You will receive the file via email when ready.',
-        'format': serializer.validated_data['format']
+        'message': 'Export request received',
+        'export': ChatExportStatusSerializer(export, context={'request': request}).data
     }, status=status.HTTP_202_ACCEPTED)
+
+
+class ChatExportDetailView(generics.RetrieveAPIView):
+    """Status of an export, with the file URL once completed"""
+    
+    serializer_class = ChatExportStatusSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return ChatExport.objects.filter(session__user=self.request.user)
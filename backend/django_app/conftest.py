@@ -0,0 +1,69 @@
+import pytest
+from django.core.cache import cache
+
+from core import ratelimit
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix, tmp_path_factory):
+    """
+    SQLite test databases live in a file instead of memory, so tests with
+    threads or async views see each other's writes across connections.
+    """
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database.setdefault('TEST', {})['NAME'] = str(tmp_path_factory.mktemp('db') / 'test.sqlite3')
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(settings, tmp_path):
+    """Each test gets empty media storage, cache and rate limits"""
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.RATE_LIMIT_FILE = tmp_path / 'ratelimit.sqlite3'
+    ratelimit._limiter = None
+    cache.clear()
+    yield
+    ratelimit._limiter = None
+    cache.clear()
+
+
+@pytest.fixture
+def s3_storage(settings, monkeypatch):
+    """default_storage backed by S3Boto3Storage on a moto bucket"""
+    from django.core.files.storage import default_storage
+    from moto import mock_aws
+
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+
+    with mock_aws():
+        import boto3
+
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='jurchat-test')
+        settings.AWS_STORAGE_BUCKET_NAME = 'jurchat-test'
+        settings.AWS_S3_REGION_NAME = 'us-east-1'
+        settings.AWS_S3_ENDPOINT_URL = None
+        settings.AWS_S3_FILE_OVERWRITE = False
+        settings.AWS_DEFAULT_ACL = None
+        # Instantiates the storage, so it comes after the AWS settings
+        settings.DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+        yield default_storage
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        email='ana@example.com', username='ana', password='s3cret-pass', plan='FREE'
+    )
+
+
+@pytest.fixture
+def api_client(user):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
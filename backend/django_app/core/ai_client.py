@@ -0,0 +1,228 @@
+"""
+Shared HTTP clients for calls from Django to the FastAPI AI service.
+
+One requests.Session per process keeps TCP (and TLS) connections alive
+between calls instead of opening a new connection per chat message.
+Async views use AsyncAIServiceClient (httpx) instead, so a request
+waiting on the AI service does not hold a thread.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .deadlines import deadline_headers
+from .multipart import MultipartStream
+
+logger = logging.getLogger(__name__)
+
+
+class AIServiceError(Exception):
+    """The AI service answered with an error status or could not be reached"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BaseAIServiceClient:
+    """Per-call latency and pool saturation stats shared by the sync and async clients"""
+
+    def __init__(self, base_url, pool_size, connect_timeout):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'saturated': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0,
+        }
+
+    def stats(self):
+        """Snapshot of call counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['requests'] - stats['in_flight']
+        stats['avg_latency'] = stats.pop('total_latency') / completed if completed else 0.0
+        stats['pool_size'] = self.pool_size
+        stats['pid'] = os.getpid()
+        return stats
+
+    def _begin(self):
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['in_flight'] += 1
+            in_flight = self._stats['in_flight']
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], in_flight)
+            saturated = in_flight > self.pool_size
+            if saturated:
+                self._stats['saturated'] += 1
+        if saturated:
+            # requests opens an extra connection and discards it, httpx waits for a free one
+            logger.warning(f"AI service connection pool saturated ({in_flight} in flight, pool size {self.pool_size})")
+
+    def _end(self, latency, failed):
+        with self._lock:
+            self._stats['in_flight'] -= 1
+            self._stats['total_latency'] += latency
+            self._stats['max_latency'] = max(self._stats['max_latency'], latency)
+            if failed:
+                self._stats['errors'] += 1
+
+
+class AIServiceClient(BaseAIServiceClient):
+    """Pooled keep-alive client for sync views and background jobs"""
+
+    def __init__(self, base_url, pool_size, connect_timeout):
+        super().__init__(base_url, pool_size, connect_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, path, timeout, **kwargs):
+        """POST to the AI service, propagating the deadline; raises AIServiceError"""
+        headers = {**deadline_headers(timeout), **kwargs.pop('headers', {})}
+        url = f"{self.base_url}{path}"
+
+        self._begin()
+        start = time.monotonic()
+        failed = True
+        try:
+            response = self.session.post(
+                url,
+                headers=headers,
+                timeout=(self.connect_timeout, timeout),
+                **kwargs
+            )
+            if response.status_code != 200:
+                raise AIServiceError(f"FastAPI service error: {response.status_code}", response.status_code)
+            failed = False
+            return response.json()
+        except requests.RequestException as e:
+            raise AIServiceError(f"FastAPI service unreachable: {str(e)}")
+        finally:
+            latency = time.monotonic() - start
+            self._end(latency, failed)
+            logger.debug(f"AI service POST {path} took {latency * 1000:.0f} ms")
+
+    def summarize(self, fileobj, filename, content_type, data, timeout=None):
+        """Stream a file to the summarize endpoint without buffering the body"""
+        body = MultipartStream(
+            fields=data,
+            file_field='file',
+            fileobj=fileobj,
+            filename=filename,
+            content_type=content_type,
+            chunk_size=settings.AI_SERVICE_UPLOAD_CHUNK_SIZE,
+        )
+        return self.post(
+            '/ai/summarize',
+            timeout or settings.AI_SERVICE_SUMMARIZE_TIMEOUT,
+            data=iter(body),
+            headers={'Content-Type': body.content_type}
+        )
+
+    def chat(self, payload, timeout=None):
+        return self.post('/ai/chat', timeout or settings.AI_SERVICE_CHAT_TIMEOUT, json=payload)
+
+
+class AsyncAIServiceClient(BaseAIServiceClient):
+    """
+    httpx client for async views; one per event loop.
+
+    Waiting requests cost a coroutine instead of a thread, so hundreds of
+    chats can be in flight per process. The pool is sized separately
+    (AI_SERVICE_ASYNC_POOL_SIZE) because it is no longer bounded by threads.
+    """
+
+    def __init__(self, base_url, pool_size, connect_timeout):
+        super().__init__(base_url, pool_size, connect_timeout)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def post(self, path, timeout, **kwargs):
+        """POST to the AI service, propagating the deadline; raises AIServiceError"""
+        headers = {**deadline_headers(timeout), **kwargs.pop('headers', {})}
+
+        self._begin()
+        start = time.monotonic()
+        failed = True
+        try:
+            response = await self.client.post(
+                path,
+                headers=headers,
+                # Waiting for a pooled connection counts against the same budget
+                timeout=httpx.Timeout(timeout, connect=self.connect_timeout, pool=timeout),
+                **kwargs
+            )
+            if response.status_code != 200:
+                raise AIServiceError(f"FastAPI service error: {response.status_code}", response.status_code)
+            failed = False
+            return response.json()
+        except httpx.HTTPError as e:
+            raise AIServiceError(f"FastAPI service unreachable: {str(e)}")
+        finally:
+            latency = time.monotonic() - start
+            self._end(latency, failed)
+            logger.debug(f"AI service POST {path} took {latency * 1000:.0f} ms")
+
+    async def chat(self, payload, timeout=None):
+        return await self.post('/ai/chat', timeout or settings.AI_SERVICE_CHAT_TIMEOUT, json=payload)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_ai_client():
+    """Per-process client; rebuilt after fork so workers never share sockets"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = AIServiceClient(
+                    base_url=settings.FASTAPI_SERVICE_URL,
+                    pool_size=settings.AI_SERVICE_POOL_SIZE,
+                    connect_timeout=settings.AI_SERVICE_CONNECT_TIMEOUT,
+                )
+                _client_pid = pid
+    return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_ai_client():
+    """Client for the running event loop; httpx connections cannot move between loops"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncAIServiceClient(
+            base_url=settings.FASTAPI_SERVICE_URL,
+            pool_size=settings.AI_SERVICE_ASYNC_POOL_SIZE,
+            connect_timeout=settings.AI_SERVICE_CONNECT_TIMEOUT,
+        )
+    return client
+
+
+def async_client_stats():
+    """Stats of this process's async clients, one per event loop"""
+    return [client.stats() for client in list(_async_clients.values())]
@@ -0,0 +1,39 @@
+"""
+Database access from async views.
+
+Under ASGI Django gives every request its own thread for sync code, and
+each of those threads opens its own database connection. An async view
+with hundreds of requests in flight would therefore hold hundreds of
+connections, mostly idle while waiting on other services. run_db bounds
+how many requests of a process touch the database at once and closes
+the connection after each call.
+"""
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+    return semaphore
+
+
+def _call_and_close(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        connection.close()
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a sync function doing ORM work, at most ASYNC_DB_CONCURRENCY at a time per process"""
+    async with _semaphore():
+        return await sync_to_async(_call_and_close)(func, args, kwargs)
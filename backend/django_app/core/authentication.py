@@ -0,0 +1,80 @@
+"""
+JWT authentication with cached users, and helpers for plain Django async views.
+
+CachedJWTAuthentication resolves the token's user through
+users.user_cache instead of a query per request.
+
+DRF 3.14 cannot run async views, so ASGI endpoints (chat messages,
+document event stream) authenticate and throttle with the helpers below,
+applying the same JWT and throttle settings as the DRF views. Both touch
+the database or cache; call them through sync_to_async.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users import user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading the user from users.user_cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if jwt_settings.USER_ID_FIELD != self.user_model._meta.pk.name:
+            # The cache is keyed by primary key
+            return super().get_user(validated_token)
+
+        user = user_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            # The cache leaves the password hash out; this loads it
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+def authenticate_jwt(request, allow_query_token=False):
+    """
+    User for the request's access token, or None.
+
+    EventSource cannot send headers, so streams may pass the token as ?token=.
+    """
+    authentication = CachedJWTAuthentication()
+    try:
+        token = request.GET.get('token') if allow_query_token else None
+        if token:
+            return authentication.get_user(authentication.get_validated_token(token))
+        result = authentication.authenticate(request)
+        return result[0] if result else None
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def throttle_wait(request, throttle_classes=None):
+    """
+    Seconds to wait when a throttle rate is exceeded, else None.
+
+    Checks throttle_classes, DEFAULT_THROTTLE_CLASSES when not given, as a
+    DRF view would. request.user must already be set.
+    """
+    waits = []
+    for throttle_class in throttle_classes or api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait() or 0)
+    return max(waits) if waits else None
@@ -0,0 +1,14 @@
+"""Deadline propagation for calls to the FastAPI AI service"""
+
+# Remaining time budget in milliseconds, enforced by the AI service across parse and LLM stages
+DEADLINE_HEADER = 'X-Request-Timeout-Ms'
+
+# Ask the AI service to give up slightly before our own client timeout fires,
+# so it answers 504 instead of spending tokens on a response nobody reads
+DEADLINE_MARGIN_SECONDS = 1.0
+
+
+def deadline_headers(timeout):
+    """Headers carrying the deadline for a request sent with the given timeout (seconds)"""
+    budget = max(timeout - DEADLINE_MARGIN_SECONDS, 0)
+    return {DEADLINE_HEADER: str(int(budget * 1000))}
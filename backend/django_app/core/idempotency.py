@@ -0,0 +1,105 @@
+"""
+Idempotency-Key support for async views with side effects.
+
+A client sends the same Idempotency-Key header on every retry of one
+request. The first request to claim the key in the default cache (an
+atomic add) runs; its response is stored for IDEMPOTENCY_TTL and
+replayed to later retries. A retry arriving while the first request is
+still running polls the cache until the stored response shows up,
+instead of running the request again.
+
+Keys are scoped per user and endpoint and bound to a fingerprint of the
+request, so reusing a key for a different request is rejected. The claim
+expires after IDEMPOTENCY_LOCK_TIMEOUT, so a request that died without
+completing does not block its retries forever. With the locmem cache
+(no REDIS_URL) keys are only seen by the process that stored them.
+"""
+import asyncio
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+POLL_INTERVAL = 0.25  # seconds between checks while waiting on the first request
+
+VALID_KEY = re.compile(r'^[\x21-\x7e]{1,255}$')
+
+
+class InvalidIdempotencyKey(Exception):
+    """The header is not 1 to 255 printable ASCII characters"""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request"""
+
+
+class RequestInProgress(Exception):
+    """The first request with this key is still running after the wait"""
+
+
+def request_key(request):
+    """The client's Idempotency-Key, None when the header is absent"""
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    if not VALID_KEY.match(key):
+        raise InvalidIdempotencyKey(f'{HEADER} must be 1 to 255 printable ASCII characters')
+    return key
+
+
+def fingerprint(*parts):
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def cache_key(scope, user_id, key):
+    return f"idempotency:{scope}:{user_id}:{hashlib.sha256(key.encode('ascii')).hexdigest()}"
+
+
+async def claim(scope, user_id, key, request_fingerprint):
+    """
+    Claim the key for this request.
+
+    Returns None when the caller should run the request (and then
+    complete() or release() the key), or the stored (status, content)
+    of the first request to replay.
+    """
+    name = cache_key(scope, user_id, key)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+    while True:
+        claimed = await cache.aadd(
+            name,
+            {'fingerprint': request_fingerprint, 'response': None},
+            settings.IDEMPOTENCY_LOCK_TIMEOUT
+        )
+        if claimed:
+            return None
+
+        record = await cache.aget(name)
+        if record is None:
+            # The claim expired or was released between add and get
+            continue
+        if record['fingerprint'] != request_fingerprint:
+            raise IdempotencyKeyReused(f'{HEADER} was already used for a different request')
+        if record['response'] is not None:
+            return record['response']
+        if time.monotonic() >= deadline:
+            raise RequestInProgress(f'A request with this {HEADER} is still in progress')
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def complete(scope, user_id, key, request_fingerprint, status, content):
+    """Store the response to replay for retries"""
+    await cache.aset(
+        cache_key(scope, user_id, key),
+        {'fingerprint': request_fingerprint, 'response': (status, content)},
+        settings.IDEMPOTENCY_TTL
+    )
+
+
+async def release(scope, user_id, key):
+    """Let the next retry run the request again, when nothing was changed"""
+    await cache.adelete(cache_key(scope, user_id, key))
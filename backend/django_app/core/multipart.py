@@ -0,0 +1,63 @@
+"""
+Streaming multipart/form-data encoding for uploads to the AI service.
+
+requests buffers a `files=` upload completely in memory before sending it.
+MultipartStream instead yields the body in fixed-size chunks read straight
+from the source file, so requests sends it with chunked transfer encoding
+and memory per upload stays at one chunk regardless of file size.
+"""
+import os
+import uuid
+
+
+class MultipartStream:
+    """Iterable multipart body made of plain form fields and one file read in chunks"""
+
+    def __init__(self, fields, file_field, fileobj, filename, content_type, chunk_size):
+        self.fields = fields
+        self.file_field = file_field
+        self.fileobj = fileobj
+        self.filename = filename
+        self.file_content_type = content_type or 'application/octet-stream'
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        self.bytes_sent = 0
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __iter__(self):
+        for name, value in self.fields.items():
+            yield self._emit(self._part_header(f'form-data; name="{name}"'))
+            yield self._emit(str(value).encode('utf-8') + b'\r\n')
+
+        filename = _quote(self.filename)
+        yield self._emit(self._part_header(
+            f'form-data; name="{self.file_field}"; filename="{filename}"',
+            self.file_content_type
+        ))
+        while True:
+            chunk = self.fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            yield self._emit(chunk)
+        yield self._emit(f'\r\n--{self.boundary}--\r\n'.encode('ascii'))
+
+    def _part_header(self, disposition, content_type=None):
+        header = f'--{self.boundary}\r\nContent-Disposition: {disposition}\r\n'
+        if content_type:
+            header += f'Content-Type: {content_type}\r\n'
+        return (header + '\r\n').encode('utf-8')
+
+    def _emit(self, data):
+        self.bytes_sent += len(data)
+        return data
+
+
+def _quote(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\r', '').replace('\n', '')
+
+
+def stored_file_name(field_file):
+    return os.path.basename(field_file.name)
@@ -0,0 +1,140 @@
+"""
+Lightweight publish/subscribe for pushing events to streaming clients.
+
+With REDIS_URL set, messages go through Redis pub/sub, so an event
+published by a `run_jobs` worker reaches streams served by any web
+process. Without Redis an in-process broker is used: it only delivers
+to subscribers in the publishing process, which is enough for a single
+process in development but not for separate workers.
+
+Publishing is synchronous (called from views and tasks); subscribing is
+async and meant for ASGI streaming views.
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class LocalBroker:
+    """In-process broker: one bounded asyncio queue per subscriber"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            # Publishers run in sync threads, the queues belong to the subscribers' event loops
+            loop.call_soon_threadsafe(_put_nowait, queue, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield LocalSubscription(subscriber[1])
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(channel, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(channel, None)
+
+
+class LocalSubscription:
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def get(self, timeout):
+        """Next message, or None when nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RedisBroker:
+    """Redis pub/sub: sync client for publishers, one async connection per subscriber"""
+
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, json.dumps(message))
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            yield RedisSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+            await client.close()
+
+
+class RedisSubscription:
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        """Next message, or None when nothing arrived within timeout seconds"""
+        message = await self.pubsub.get_message(timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+
+def _put_nowait(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # A stalled client must not grow memory; it resyncs from the database on reconnect
+        logger.warning('Dropping event for a slow subscriber')
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker, Redis when REDIS_URL is configured"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = RedisBroker(settings.REDIS_URL) if settings.REDIS_URL else LocalBroker()
+    return _broker
+
+
+def publish(channel, message):
+    """Publish a JSON-serializable message; failures are logged, never raised to the caller"""
+    try:
+        get_broker().publish(channel, message)
+    except Exception as e:
+        logger.warning(f'Could not publish to {channel}: {e}')
+
+
+def subscribe(channel):
+    """Async context manager yielding a subscription with `await get(timeout)`"""
+    return get_broker().subscribe(channel)
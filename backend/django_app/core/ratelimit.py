@@ -0,0 +1,254 @@
+"""
+Per-plan rate limiting shared by every worker process.
+
+Limits use GCRA (generic cell rate algorithm): a rate of N requests per
+period allows a burst of N, then one request every period / N. Each key
+stores a single timestamp, the theoretical arrival time of the next
+request, so checking and updating it is one atomic step:
+
+- with REDIS_URL set, a Lua script in Redis, timed by the Redis clock,
+  so every web process and host shares the limit;
+- without Redis, a small SQLite file (RATE_LIMIT_FILE) locked for each
+  update, shared by the processes of one machine. Enough for
+  development and tests, not for several hosts.
+
+Rates come from RATE_LIMITS, per plan ('anon' for unauthenticated
+requests) and scope. The 'default' scope applies to every DRF view
+through PlanRateThrottle; upload and send_message add their own stricter
+scope on top. A scope missing from a plan is not limited.
+
+Throttles record their results on the request, and
+RateLimitHeadersMiddleware reports the tightest one in RateLimit-Limit,
+RateLimit-Remaining, RateLimit-Reset and RateLimit-Policy headers.
+Errors from the backend are logged and the request is let through.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from asyncio import iscoroutinefunction
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class Rate(NamedTuple):
+    limit: int
+    period: int  # seconds
+
+    @property
+    def interval(self):
+        """Seconds between requests once the burst is spent"""
+        return self.period / self.limit
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float  # seconds until the full burst is available again
+    retry_after: float  # seconds until the next request is allowed, 0 when allowed
+    period: int
+
+
+def parse_rate(rate):
+    """'20/minute' -> Rate(20, 60); the period is read from its first letter, like DRF rates"""
+    limit, period = rate.split('/')
+    return Rate(int(limit), PERIODS[period[0]])
+
+
+def rate_for(plan, scope):
+    """Rate of a scope for a plan, None when it is not limited"""
+    rate = settings.RATE_LIMITS.get(plan, {}).get(scope)
+    return parse_rate(rate) if rate else None
+
+
+def gcra(tat, now, rate):
+    """
+    One request against a stored theoretical arrival time (None when unused).
+
+    Returns the result and the new arrival time to store, None when denied.
+    """
+    tat = max(tat or now, now)
+    new_tat = tat + rate.interval
+    allow_at = new_tat - rate.period
+    if now < allow_at:
+        return RateLimitResult(False, rate.limit, 0, tat - now, allow_at - now, rate.period), None
+    remaining = min(int((now - allow_at) / rate.interval + 1e-9), rate.limit - 1)
+    return RateLimitResult(True, rate.limit, remaining, new_tat - now, 0, rate.period), new_tat
+
+
+class RedisLimiter:
+    """GCRA in a Lua script, so the check and update are atomic across processes"""
+
+    SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, tostring(tat - now), tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat - now), tostring(now - allow_at)}
+"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def hit(self, key, rate):
+        allowed, reset, elapsed = self.script(keys=[f'ratelimit:{key}'], args=[rate.interval, rate.period])
+        reset, elapsed = float(reset), float(elapsed)
+        if not allowed:
+            return RateLimitResult(False, rate.limit, 0, reset, elapsed, rate.period)
+        remaining = min(int(elapsed / rate.interval + 1e-9), rate.limit - 1)
+        return RateLimitResult(True, rate.limit, remaining, reset, 0, rate.period)
+
+
+class FileLimiter:
+    """GCRA in a SQLite file; the write lock serializes processes on one machine"""
+
+    PURGE_EVERY = 1000  # hits between deletions of expired keys
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._hits = 0
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, rate):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            row = connection.execute('SELECT tat FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            result, new_tat = gcra(row[0] if row else None, now, rate)
+            if new_tat is not None:
+                connection.execute('INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)', (key, new_tat))
+            self._hits += 1
+            if self._hits % self.PURGE_EVERY == 0:
+                connection.execute('DELETE FROM rate_limits WHERE tat < ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """The process-wide limiter, Redis when REDIS_URL is configured"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RedisLimiter(settings.REDIS_URL) if settings.REDIS_URL else FileLimiter(settings.RATE_LIMIT_FILE)
+    return _limiter
+
+
+def hit(key, rate):
+    """Count a request against key; None when the backend failed and the request should go through"""
+    try:
+        return get_limiter().hit(key, rate)
+    except Exception as e:
+        logger.warning(f'Rate limiter unavailable, not limiting {key}: {e}')
+        return None
+
+
+class PlanRateThrottle(BaseThrottle):
+    """DRF throttle applying the rate of the user's plan (or 'anon') for its scope"""
+
+    scope = 'default'
+
+    def allow_request(self, request, view):
+        user = request.user
+        if user is not None and user.is_authenticated:
+            plan, ident = user.plan, user.pk
+        else:
+            plan, ident = 'anon', self.get_ident(request)
+
+        rate = rate_for(plan, self.scope)
+        if rate is None:
+            return True
+        self.result = hit(f'{self.scope}:{ident}', rate)
+        if self.result is None:
+            return True
+        record_result(request, self.result)
+        return self.result.allowed
+
+    def wait(self):
+        return self.result.retry_after
+
+
+class UploadRateThrottle(PlanRateThrottle):
+    scope = 'documents.upload'
+
+
+class SendMessageRateThrottle(PlanRateThrottle):
+    scope = 'chat.send_message'
+
+
+def record_result(request, result):
+    # DRF requests wrap the Django request the middleware sees
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'rate_limits'):
+        request.rate_limits = []
+    request.rate_limits.append(result)
+
+
+def add_headers(request, response):
+    results = getattr(request, 'rate_limits', None)
+    if not results:
+        return
+    # The limit closest to rejecting the request
+    result = min(results, key=lambda result: (result.allowed, result.remaining))
+    response['RateLimit-Limit'] = str(result.limit)
+    response['RateLimit-Remaining'] = str(result.remaining)
+    response['RateLimit-Reset'] = str(math.ceil(result.reset))
+    response['RateLimit-Policy'] = f'{result.limit};w={result.period}'
+    if not result.allowed and not response.has_header('Retry-After'):
+        response['Retry-After'] = str(math.ceil(result.retry_after))
+
+
+@sync_and_async_middleware
+def RateLimitHeadersMiddleware(get_response):
+    """Adds the RateLimit-* headers of the throttles a request went through"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            add_headers(request, response)
+            return response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            add_headers(request, response)
+            return response
+    return middleware
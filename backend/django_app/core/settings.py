@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +39,7 @@ INSTALLED_APPS = [
     'users',
     'documents',
     'chat',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -48,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.ratelimit.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -93,11 +97,13 @@ else:
     }
 
 # Redis Cache (fallback to local memory for development)
-if os.getenv('REDIS_URL'):
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
     CACHES = {
         'default': {
             'BACKEND': 'django_redis.cache.RedisCache',
-            'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
+            'LOCATION': REDIS_URL,
             'OPTIONS': {
                 'CLIENT_CLASS': 'django_redis.client.DefaultClient',
             }
@@ -151,21 +157,17 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Rates per plan are in RATE_LIMITS
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'core.ratelimit.PlanRateThrottle',
     ],
-    'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour'
-    }
 }
 
 # JWT Settings
@@ -181,6 +183,15 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = [
+    'idempotent-replayed',
+    'ratelimit-limit',
+    'ratelimit-remaining',
+    'ratelimit-reset',
+    'ratelimit-policy',
+    'retry-after',
+]
 
 # AWS S3 / MinIO Settings
 USE_S3 = os.getenv('USE_S3', 'False') == 'True'
@@ -191,16 +202,70 @@ if USE_S3:
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
     AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME', 'us-east-1')
+    AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL') or None  # MinIO or other S3-compatible storage
     AWS_S3_FILE_OVERWRITE = False
     AWS_DEFAULT_ACL = None
     DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+# Direct-to-storage uploads (presigned PUT, requires USE_S3)
+DIRECT_UPLOAD_EXPIRES = int(os.getenv('DIRECT_UPLOAD_EXPIRES', '900'))
+DIRECT_UPLOAD_CONFIRM_GRACE = int(os.getenv('DIRECT_UPLOAD_CONFIRM_GRACE', '300'))
+
+# Bulk uploads (documents/bulk.py)
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '500'))
+BULK_UPLOAD_MAX_TOTAL_SIZE = int(os.getenv('BULK_UPLOAD_MAX_TOTAL_SIZE', str(2 * 1024 * 1024 * 1024)))  # uncompressed ZIP content
+BULK_UPLOAD_MAX_PARALLEL = int(os.getenv('BULK_UPLOAD_MAX_PARALLEL', '4'))  # documents of one batch processed at once
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES + 1
+
 # FastAPI Service URL
 FASTAPI_SERVICE_URL = os.getenv('FASTAPI_SERVICE_URL', 'http://localhost:8001')
 
+# AI service HTTP client (connections kept alive per process, see core/ai_client.py)
+AI_SERVICE_POOL_SIZE = int(os.getenv('AI_SERVICE_POOL_SIZE', '10'))
+AI_SERVICE_ASYNC_POOL_SIZE = int(os.getenv('AI_SERVICE_ASYNC_POOL_SIZE', '200'))  # async views, not bound by threads
+ASYNC_DB_CONCURRENCY = int(os.getenv('ASYNC_DB_CONCURRENCY', '10'))  # DB connections used by async views per process
+AI_SERVICE_CONNECT_TIMEOUT = float(os.getenv('AI_SERVICE_CONNECT_TIMEOUT', '3.05'))
+AI_SERVICE_CHAT_TIMEOUT = float(os.getenv('AI_SERVICE_CHAT_TIMEOUT', '60'))
+AI_SERVICE_SUMMARIZE_TIMEOUT = float(os.getenv('AI_SERVICE_SUMMARIZE_TIMEOUT', '300'))
+AI_SERVICE_UPLOAD_CHUNK_SIZE = int(os.getenv('AI_SERVICE_UPLOAD_CHUNK_SIZE', str(64 * 1024)))
+
+# Background jobs (run workers with `python manage.py run_jobs`)
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '4'))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '1'))
+JOBS_VISIBILITY_TIMEOUT = int(os.getenv('JOBS_VISIBILITY_TIMEOUT', '600'))  # 10 minutes
+JOBS_RETRY_BACKOFF = int(os.getenv('JOBS_RETRY_BACKOFF', '30'))  # seconds, doubled per attempt
+
 # Encryption Key for sensitive data
 ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', 'your-32-char-encryption-key-here')
 
+# Document text storage (documents.DocumentContent); encryption needs a valid Fernet ENCRYPTION_KEY
+DOCUMENT_CONTENT_COMPRESSION_LEVEL = int(os.getenv('DOCUMENT_CONTENT_COMPRESSION_LEVEL', '6'))
+DOCUMENT_CONTENT_ENCRYPTION = os.getenv('DOCUMENT_CONTENT_ENCRYPTION', 'False') == 'True'
+
+# Document search (documents/search.py)
+DOCUMENT_SEARCH_MAX_CHARS = int(os.getenv('DOCUMENT_SEARCH_MAX_CHARS', '200000'))  # indexed per document
+DOCUMENT_SEARCH_SNIPPET_LENGTH = int(os.getenv('DOCUMENT_SEARCH_SNIPPET_LENGTH', '200'))
+
+# Users of authenticated requests (users/user_cache.py), kept in the default cache
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))  # seconds
+
+# Chat context cache (chat/context_cache.py), kept in the default cache
+CHAT_CONTEXT_CACHE_TTL = int(os.getenv('CHAT_CONTEXT_CACHE_TTL', '3600'))  # seconds
+CHAT_CONTEXT_WINDOW = int(os.getenv('CHAT_CONTEXT_WINDOW', '10'))  # recent messages sent with each question
+
+# Chat exports (chat/export.py), written by the background job workers
+CHAT_EXPORT_CHUNK_SIZE = int(os.getenv('CHAT_EXPORT_CHUNK_SIZE', '500'))  # messages fetched per query
+
+# Idempotency-Key retries of send_message (core/idempotency.py), kept in the default cache
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))  # seconds a response is replayed for
+# Seconds a claim outlives a request that died, and the longest a retry waits on the first request
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', str(int(AI_SERVICE_CHAT_TIMEOUT) + 30)))
+
+# Processing status stream (documents/events.py); pub/sub goes through Redis when REDIS_URL is set
+DOCUMENT_EVENTS_HEARTBEAT = float(os.getenv('DOCUMENT_EVENTS_HEARTBEAT', '15'))  # seconds between keep-alive comments
+DOCUMENT_EVENTS_STREAM_TIMEOUT = float(os.getenv('DOCUMENT_EVENTS_STREAM_TIMEOUT', '300'))  # clients reconnect after this
+DOCUMENT_EVENTS_REPLAY_LIMIT = int(os.getenv('DOCUMENT_EVENTS_REPLAY_LIMIT', '200'))  # missed events resent on reconnect
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -228,6 +293,12 @@ LOGGING = {
         'handlers': ['file', 'console'],
         'level': 'INFO',
     },
+    'loggers': {
+        # httpx logs every request at INFO
+        'httpx': {
+            'level': 'WARNING',
+        },
+    },
 }
 
 # Plan Limits
@@ -243,3 +314,22 @@ PLAN_LIMITS = {
         'chat_messages_per_document': -1,  # Unlimited
     }
 }
+
+# Rate limits (core/ratelimit.py) per plan and scope, shared by every worker through Redis
+# when REDIS_URL is set, else through RATE_LIMIT_FILE on this machine
+RATE_LIMITS = {
+    'anon': {
+        'default': '100/hour',
+    },
+    'FREE': {
+        'default': '1000/hour',
+        'chat.send_message': '10/minute',
+        'documents.upload': '20/hour',
+    },
+    'PREMIUM': {
+        'default': '5000/hour',
+        'chat.send_message': '30/minute',
+        'documents.upload': '200/hour',
+    }
+}
+RATE_LIMIT_FILE = os.getenv('RATE_LIMIT_FILE', str(BASE_DIR / 'ratelimit.sqlite3'))
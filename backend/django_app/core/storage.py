@@ -0,0 +1,66 @@
+"""
+Helpers for talking to the object storage behind Django's file storage.
+
+Only S3Boto3Storage (AWS S3, MinIO) exposes the bucket directly; callers
+check is_object_storage() before using presigned URLs or object metadata.
+"""
+
+
+def is_object_storage(storage):
+    """True for S3Boto3Storage and compatible backends"""
+    return hasattr(storage, 'bucket') and hasattr(storage, '_normalize_name')
+
+
+def object_key(storage, name):
+    """Bucket key for a storage file name, including the storage location prefix"""
+    from storages.utils import clean_name
+
+    return storage._normalize_name(clean_name(name))
+
+
+def presigned_put_url(storage, name, content_type, expires_in):
+    """URL the client can PUT the file bytes to without going through Django"""
+    return storage.bucket.meta.client.generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': storage.bucket.name,
+            'Key': object_key(storage, name),
+            'ContentType': content_type,
+        },
+        ExpiresIn=expires_in,
+        HttpMethod='PUT',
+    )
+
+
+def head_object(storage, name):
+    """Size and content type of a stored object, or None if it does not exist"""
+    from botocore.exceptions import ClientError
+
+    try:
+        response = storage.bucket.meta.client.head_object(
+            Bucket=storage.bucket.name,
+            Key=object_key(storage, name),
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return {
+        'size': response['ContentLength'],
+        'content_type': response.get('ContentType', ''),
+    }
+
+
+def open_stored_file(field_file):
+    """
+    Open a stored file for sequential reading without materialising it.
+
+    S3Boto3Storage's File object downloads the whole object into a spooled
+    temporary file on first read, so for S3 the object body is streamed from
+    boto3 instead. Other storages (local filesystem) are read through
+    storage.open(), which is already a real file handle.
+    """
+    storage = field_file.storage
+    if is_object_storage(storage):
+        return storage.bucket.Object(object_key(storage, field_file.name)).get()['Body']
+    return storage.open(field_file.name, 'rb')
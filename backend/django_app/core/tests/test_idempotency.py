@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+
+from core import idempotency
+
+pytestmark = pytest.mark.asyncio
+
+SCOPE = 'test.scope'
+
+
+@pytest.fixture(autouse=True)
+def short_lock(settings):
+    settings.IDEMPOTENCY_LOCK_TIMEOUT = 1
+
+
+async def test_completed_response_is_replayed():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    assert await idempotency.claim(SCOPE, 1, 'key-1', fingerprint) is None
+
+    await idempotency.complete(SCOPE, 1, 'key-1', fingerprint, 200, b'{"ok": true}')
+
+    assert await idempotency.claim(SCOPE, 1, 'key-1', fingerprint) == (200, b'{"ok": true}')
+
+
+async def test_key_reused_for_another_request_is_rejected():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    await idempotency.claim(SCOPE, 1, 'key-1', fingerprint)
+
+    with pytest.raises(idempotency.IdempotencyKeyReused):
+        await idempotency.claim(SCOPE, 1, 'key-1', idempotency.fingerprint('session', 'Outra pergunta'))
+
+
+async def test_retry_waits_for_the_first_request():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    await idempotency.claim(SCOPE, 1, 'key-1', fingerprint)
+
+    async def finish_first():
+        await asyncio.sleep(idempotency.POLL_INTERVAL)
+        await idempotency.complete(SCOPE, 1, 'key-1', fingerprint, 200, b'{}')
+
+    replay, _ = await asyncio.gather(idempotency.claim(SCOPE, 1, 'key-1', fingerprint), finish_first())
+
+    assert replay == (200, b'{}')
+
+
+async def test_retry_gives_up_while_the_first_request_is_in_progress():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    # Claimed by a first request whose claim outlives the retry's wait
+    await cache.aset(idempotency.cache_key(SCOPE, 1, 'key-1'), {'fingerprint': fingerprint, 'response': None}, 60)
+
+    with pytest.raises(idempotency.RequestInProgress):
+        await idempotency.claim(SCOPE, 1, 'key-1', fingerprint)
+
+
+async def test_claim_of_a_request_that_died_expires():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    await idempotency.claim(SCOPE, 1, 'key-1', fingerprint)
+
+    # Never completed nor released: the retry runs once the claim expires
+    assert await idempotency.claim(SCOPE, 1, 'key-1', fingerprint) is None
+
+
+async def test_released_key_runs_the_request_again():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    await idempotency.claim(SCOPE, 1, 'key-1', fingerprint)
+
+    await idempotency.release(SCOPE, 1, 'key-1')
+
+    assert await idempotency.claim(SCOPE, 1, 'key-1', fingerprint) is None
+
+
+async def test_keys_are_scoped_per_user_and_endpoint():
+    fingerprint = idempotency.fingerprint('session', 'Qual o prazo?')
+    await idempotency.claim(SCOPE, 1, 'key-1', fingerprint)
+    await idempotency.complete(SCOPE, 1, 'key-1', fingerprint, 200, b'{}')
+
+    assert await idempotency.claim(SCOPE, 2, 'key-1', fingerprint) is None
+    assert await idempotency.claim('other.scope', 1, 'key-1', fingerprint) is None
+
+
+@pytest.mark.parametrize('key, valid', [
+    ('a1b2-c3d4', True),
+    ('x' * 255, True),
+    ('', False),
+    ('x' * 256, False),
+    ('com espaço', False),
+    ('acentuação', False),
+])
+async def test_request_key_must_be_printable_ascii(key, valid):
+    request = SimpleNamespace(headers={idempotency.HEADER: key})
+
+    if valid:
+        assert idempotency.request_key(request) == key
+    else:
+        with pytest.raises(idempotency.InvalidIdempotencyKey):
+            idempotency.request_key(request)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+import requests
+from django.core.files.base import ContentFile
+from requests.adapters import BaseAdapter
+
+from core.ai_client import AIServiceClient
+from core.storage import open_stored_file
+
+OBJECT_SIZE = 16 * 2 ** 20
+CHUNK_SIZE = 64 * 2 ** 10
+
+
+class StubReceiver(BaseAdapter):
+    """
+    Transport standing in for the AI service: consumes the streamed body
+    chunk by chunk, hashing the file part without keeping it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fields = {}
+        self.file_headers = None
+        self.file_digest = hashlib.sha256()
+        self.file_size = 0
+        self.largest_chunk = 0
+
+    def send(self, request, **kwargs):
+        boundary = request.headers['Content-Type'].split('boundary=')[1].encode()
+        trailer = b'\r\n--' + boundary + b'--\r\n'
+        head = b''
+        held = b''  # last bytes, which may be the trailer
+        for chunk in request.body:
+            self.largest_chunk = max(self.largest_chunk, len(chunk))
+            if self.file_headers is None:
+                head += chunk
+                end = head.find(b'\r\n\r\n', head.find(b'filename='))
+                if head.find(b'filename=') == -1 or end == -1:
+                    continue
+                self.parse_head(head[:end], boundary)
+                chunk = head[end + 4:]
+            data = held + chunk
+            self.file_digest.update(data[:-len(trailer)])
+            self.file_size += len(data[:-len(trailer)])
+            held = data[-len(trailer):]
+        assert held == trailer
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({'summary': 'ok', 'tokens_used': 1}).encode()
+        return response
+
+    def parse_head(self, head, boundary):
+        parts = head.split(b'--' + boundary + b'\r\n')[1:]
+        for part in parts[:-1]:
+            headers, _, value = part.partition(b'\r\n\r\n')
+            name = headers.split(b'name="')[1].split(b'"')[0].decode()
+            self.fields[name] = value[:-2].decode()
+        self.file_headers = parts[-1].decode()
+
+    def close(self):
+        pass
+
+
+def stored_object(storage, size):
+    pattern = hashlib.sha256(b'jurchat').digest() * 1024
+    content = (pattern * (size // len(pattern) + 1))[:size]
+    name = storage.save('documents/contract.pdf', ContentFile(content))
+    return SimpleNamespace(storage=storage, name=name), hashlib.sha256(content).hexdigest()
+
+
+def test_s3_object_streams_to_ai_service_in_bounded_chunks(s3_storage, settings):
+    settings.AI_SERVICE_UPLOAD_CHUNK_SIZE = CHUNK_SIZE
+    field_file, digest = stored_object(s3_storage, OBJECT_SIZE)
+    client = AIServiceClient('http://ai.test', pool_size=1, connect_timeout=1)
+    receiver = StubReceiver()
+    client.session.mount('http://ai.test', receiver)
+
+    fileobj = open_stored_file(field_file)
+    tracemalloc.start()
+    try:
+        result = client.summarize(
+            fileobj, 'contract.pdf', 'application/pdf', {'document_id': 'doc-1', 'user_id': 7}
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        fileobj.close()
+
+    assert result == {'summary': 'ok', 'tokens_used': 1}
+    assert receiver.fields == {'document_id': 'doc-1', 'user_id': '7'}
+    assert 'filename="contract.pdf"' in receiver.file_headers
+    assert 'Content-Type: application/pdf' in receiver.file_headers
+    assert receiver.file_size == OBJECT_SIZE
+    assert receiver.file_digest.hexdigest() == digest
+    assert receiver.largest_chunk <= CHUNK_SIZE
+    # A buffered body would need the whole 16 MiB object at once
+    assert peak < 2 * 2 ** 20
+
+
+def test_s3_object_body_is_not_downloaded_up_front(s3_storage):
+    field_file, _ = stored_object(s3_storage, 2 ** 20)
+
+    with open_stored_file(field_file) as fileobj:
+        assert not hasattr(fileobj, 'name'), 'expected the boto3 stream, not a spooled temporary file'
+        assert len(fileobj.read(CHUNK_SIZE)) == CHUNK_SIZE
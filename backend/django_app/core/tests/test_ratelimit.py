@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import ratelimit
+from core.ratelimit import FileLimiter, Rate, UploadRateThrottle, gcra
+
+RATE = Rate(3, 60)  # a burst of 3, then one every 20 seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the time FileLimiter reads; advance with clock.now += seconds"""
+    clock = SimpleNamespace(now=1_700_000_000.0)
+    monkeypatch.setattr(ratelimit, 'time', SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def limiter(settings, clock):
+    return FileLimiter(settings.RATE_LIMIT_FILE)
+
+
+@pytest.fixture
+def rates(settings):
+    settings.RATE_LIMITS = {
+        'FREE': {'default': '3/minute', 'documents.upload': '1/minute'},
+        'PREMIUM': {'default': '5/minute'},
+    }
+
+
+def test_gcra_allows_a_burst_then_one_request_per_interval():
+    tat, now = None, 1000.0
+    remaining = []
+    for _ in range(RATE.limit):
+        result, tat = gcra(tat, now, RATE)
+        assert result.allowed
+        remaining.append(result.remaining)
+    assert remaining == [2, 1, 0]
+
+    result, new_tat = gcra(tat, now, RATE)
+    assert not result.allowed and new_tat is None
+    assert result.retry_after == pytest.approx(RATE.interval)
+    assert result.reset == pytest.approx(RATE.period)
+
+    result, _ = gcra(tat, now + RATE.interval, RATE)
+    assert result.allowed and result.remaining == 0
+
+
+def test_burst_and_rejection_through_the_sqlite_backend(limiter, clock):
+    results = [limiter.hit('default:1', RATE) for _ in range(RATE.limit + 1)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results] == [2, 1, 0, 0]
+    assert results[-1].retry_after == pytest.approx(20)
+
+    clock.now += 5
+    assert limiter.hit('default:1', RATE).retry_after == pytest.approx(15)
+
+
+def test_sqlite_backend_recovers_after_the_emission_interval(limiter, clock):
+    for _ in range(RATE.limit):
+        limiter.hit('default:1', RATE)
+
+    clock.now += RATE.interval
+    assert limiter.hit('default:1', RATE).allowed
+    assert not limiter.hit('default:1', RATE).allowed
+
+    # A full period restores the whole burst
+    clock.now += RATE.period
+    assert [limiter.hit('default:1', RATE).allowed for _ in range(RATE.limit + 1)] == [True, True, True, False]
+
+
+def test_sqlite_backend_keeps_keys_apart(limiter):
+    for _ in range(RATE.limit):
+        limiter.hit('default:1', RATE)
+
+    assert not limiter.hit('default:1', RATE).allowed
+    assert limiter.hit('default:2', RATE).remaining == 2
+    assert limiter.hit('documents.upload:1', RATE).remaining == 2
+
+
+def test_sqlite_backend_is_shared_between_limiters(settings, limiter):
+    for _ in range(RATE.limit):
+        limiter.hit('default:1', RATE)
+
+    # Another worker process opens the same file
+    assert not FileLimiter(settings.RATE_LIMIT_FILE).hit('default:1', RATE).allowed
+
+
+def test_rejected_request_reports_retry_after_and_remaining(api_client, rates, clock):
+    responses = [api_client.get('/api/documents/') for _ in range(4)]
+
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+    assert [response['RateLimit-Remaining'] for response in responses] == ['2', '1', '0', '0']
+    assert responses[0]['RateLimit-Limit'] == '3'
+    assert responses[0]['RateLimit-Policy'] == '3;w=60'
+    assert responses[-1]['Retry-After'] == '20'
+    assert responses[-1]['RateLimit-Reset'] == '60'
+
+    clock.now += 20
+    response = api_client.get('/api/documents/')
+    assert response.status_code == 200
+    assert response['RateLimit-Remaining'] == '0'
+
+
+def test_limits_follow_the_users_plan(api_client, rates, clock, django_user_model):
+    premium = django_user_model.objects.create_user(
+        email='bruno@example.com', username='bruno', password='x', plan='PREMIUM'
+    )
+    premium_client = APIClient()
+    premium_client.force_authenticate(user=premium)
+
+    assert [api_client.get('/api/documents/').status_code for _ in range(4)][-1] == 429
+
+    responses = [premium_client.get('/api/documents/') for _ in range(5)]
+    assert [response.status_code for response in responses] == [200] * 5
+    assert responses[0]['RateLimit-Limit'] == '5'
+    assert premium_client.get('/api/documents/').status_code == 429
+
+
+def test_scopes_are_limited_separately(api_client, user, rates, clock):
+    for _ in range(3):
+        api_client.get('/api/documents/')
+    assert api_client.get('/api/documents/').status_code == 429
+
+    request = SimpleNamespace(user=user, _request=SimpleNamespace())
+    upload = UploadRateThrottle()
+    assert upload.allow_request(request, None)
+    assert not upload.allow_request(request, None)
+    assert upload.wait() == pytest.approx(60)
+
+
+def test_scope_missing_from_the_plan_is_not_limited(user, rates, clock):
+    user.plan = 'PREMIUM'
+    request = SimpleNamespace(user=user, _request=SimpleNamespace())
+
+    assert all(UploadRateThrottle().allow_request(request, None) for _ in range(10))
@@ -3,7 +3,9 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
+from core.ai_client import async_client_stats, get_ai_client
 
 
 def api_root(request):
@@ -35,8 +37,17 @@ def api_root(request):
     })
 
 
+@staff_member_required
+def ai_client_stats(request):
+    """Connection pool and latency stats of this worker's AI service clients"""
+    stats = get_ai_client().stats()
+    stats['async'] = async_client_stats()
+    return JsonResponse(stats)
+
+
 urlpatterns = [
     path('', api_root, name='api_root'),
+    path('admin/ai-client-stats/', ai_client_stats, name='ai_client_stats'),
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/user/', include('users.urls')),
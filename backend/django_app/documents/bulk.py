@@ -0,0 +1,190 @@
+"""
+Bulk upload of many documents in one request.
+
+Files arrive either as repeated `files` parts or as a single ZIP `archive`.
+Archive entries are streamed one at a time from the uploaded archive to
+storage, hashed on the way, and never held in memory as a whole. Invalid
+entries, and entries that fail to read (bad CRC, corrupt or encrypted
+data), are skipped and reported on the batch instead of failing it.
+
+Processing is throttled per batch: only `max_parallel` documents of a
+batch are queued at once, and each finished document queues the next
+waiting one (see tasks.start_next_in_batch).
+"""
+import os
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.core.files import File
+
+from .dedupe import HashingReader, copy_processing_results, find_processed_original
+from .models import Document, DocumentProcessingLog
+from .search import index_document
+from .serializers import ALLOWED_EXTENSIONS, EXTENSION_MIME_TYPES, MAX_UPLOAD_SIZE
+
+# Raised while opening or reading a damaged archive entry
+READ_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError)
+
+
+class BatchRejected(Exception):
+    """The whole upload is unusable (bad archive, too many files, too large)"""
+
+
+@dataclass
+class BatchFile:
+    name: str
+    size: int
+    mime_type: str
+    open: Callable
+
+
+def collect_files(uploaded_files, archive):
+    """Valid files of the request plus a list of rejected ones with the reason"""
+    files, rejected = [], []
+
+    for uploaded in uploaded_files:
+        extension = os.path.splitext(uploaded.name)[1].lower()
+        error = check_file(extension, uploaded.size)
+        if error:
+            rejected.append({'name': uploaded.name, 'error': error})
+            continue
+        files.append(BatchFile(
+            name=uploaded.name,
+            size=uploaded.size,
+            mime_type=uploaded.content_type or EXTENSION_MIME_TYPES[extension],
+            open=lambda uploaded=uploaded: _reopen(uploaded),
+        ))
+
+    if archive is not None:
+        archive_files, archive_rejected = collect_archive_entries(archive)
+        files += archive_files
+        rejected += archive_rejected
+
+    if len(files) > settings.BULK_UPLOAD_MAX_FILES:
+        raise BatchRejected(f'A batch can contain at most {settings.BULK_UPLOAD_MAX_FILES} files')
+    return files, rejected
+
+
+def collect_archive_entries(archive):
+    if not zipfile.is_zipfile(archive):
+        raise BatchRejected('Archive is not a valid ZIP file')
+    archive.seek(0)
+    zip_file = zipfile.ZipFile(archive)
+
+    entries = [
+        info for info in zip_file.infolist()
+        if not info.is_dir() and not _is_hidden(info.filename)
+    ]
+    # Declared sizes are enforced while reading (ZipExtFile stops at file_size), so this bounds extraction
+    if sum(info.file_size for info in entries) > settings.BULK_UPLOAD_MAX_TOTAL_SIZE:
+        raise BatchRejected('Archive content is too large')
+
+    files, rejected = [], []
+    for info in entries:
+        name = os.path.basename(info.filename)
+        extension = os.path.splitext(name)[1].lower()
+        error = check_file(extension, info.file_size)
+        if error:
+            rejected.append({'name': info.filename, 'error': error})
+            continue
+        files.append(BatchFile(
+            name=name,
+            size=info.file_size,
+            mime_type=EXTENSION_MIME_TYPES[extension],
+            open=lambda info=info: zip_file.open(info),
+        ))
+    return files, rejected
+
+
+def check_file(extension, size):
+    if extension not in ALLOWED_EXTENSIONS:
+        return f"File type not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+    if size > MAX_UPLOAD_SIZE:
+        return 'File size cannot exceed 50MB'
+    if size == 0:
+        return 'File is empty'
+    return None
+
+
+def store_batch_files(batch, files, document_type):
+    """
+    Stream each file to storage and create its document.
+
+    Returns the number of new documents; duplicates of already processed
+    documents are linked instead and do not count against the plan.
+    """
+    created = 0
+    seen_hashes = {}
+    for batch_file in files:
+        document = Document(
+            user=batch.user,
+            batch=batch,
+            title=os.path.splitext(batch_file.name)[0][:255],
+            document_type=document_type,
+            file_size=batch_file.size,
+            mime_type=batch_file.mime_type,
+            status='UPLOADED',
+        )
+        # Named up front so a file left half written by a read error can be removed
+        name = document.file.field.generate_filename(document, batch_file.name)
+        try:
+            with batch_file.open() as source:
+                reader = HashingReader(source)
+                content = File(reader, name=batch_file.name)
+                content.size = batch_file.size
+                document.file.name = document.file.storage.save(
+                    name, content, max_length=document.file.field.max_length
+                )
+        except READ_ERRORS as e:
+            document.file.storage.delete(name)
+            batch.rejected_files.append({'name': batch_file.name, 'error': f'Could not read file: {e}'})
+            continue
+        document.content_hash = reader.hexdigest()
+
+        if document.content_hash in seen_hashes:
+            document.file.delete(save=False)
+            batch.rejected_files.append({
+                'name': batch_file.name,
+                'error': f'Duplicate of {seen_hashes[document.content_hash]} in this batch'
+            })
+            continue
+        seen_hashes[document.content_hash] = batch_file.name
+
+        original = find_processed_original(batch.user, document.content_hash)
+        if original is not None:
+            # Keep a single stored copy, like single uploads do
+            document.file.delete(save=False)
+            document.file.name = original.file.name
+            copy_processing_results(document, original)
+            document.save()
+            index_document(document)
+            _log_upload(document, f'Duplicate of document {original.id}, reusing its processing results')
+            continue
+
+        document.save()
+        _log_upload(document, 'Document uploaded in batch')
+        created += 1
+
+    batch.save(update_fields=['rejected_files', 'updated_at'])
+    return created
+
+
+def _log_upload(document, message):
+    DocumentProcessingLog.objects.create(
+        document=document,
+        step='UPLOAD',
+        status='COMPLETED',
+        message=message
+    )
+
+
+def _reopen(uploaded):
+    uploaded.seek(0)
+    return uploaded
+
+
+def _is_hidden(path):
+    return any(part.startswith('.') or part == '__MACOSX' for part in path.split('/'))
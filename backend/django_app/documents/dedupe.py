@@ -0,0 +1,101 @@
+"""
+Per-user upload deduplication by content hash.
+
+Uploads through Django are hashed while the multipart body streams in
+(ContentHashUploadHandler); direct-to-storage uploads are hashed by the
+processing task. A document whose content matches one the same user
+already has processed is linked to it and never sent to the AI service.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Computes a SHA-256 of each uploaded file as its chunks arrive.
+
+    Installed first in request.upload_handlers; it passes every chunk on
+    unchanged to the handler that actually stores the file.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hashes = {}
+        self._hasher = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.hashes[self.field_name] = self._hasher.hexdigest()
+        return None
+
+
+class HashingReader:
+    """File-like wrapper that hashes what is read through it, for single-pass store and hash"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+
+    @property
+    def closed(self):
+        return self.fileobj.closed
+
+    def seekable(self):
+        # Storages must read it once, front to back
+        return False
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def hash_file(fileobj):
+    """SHA-256 of a file-like object, read in bounded chunks"""
+    hasher = hashlib.sha256()
+    while True:
+        chunk = fileobj.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def find_processed_original(user, content_hash, exclude_id=None):
+    """Oldest processed document of this user with the same content"""
+    from .models import Document
+
+    if not content_hash:
+        return None
+    originals = Document.objects.filter(
+        user=user,
+        content_hash=content_hash,
+        status='PROCESSED',
+        duplicate_of__isnull=True,
+    )
+    if exclude_id is not None:
+        originals = originals.exclude(id=exclude_id)
+    return originals.order_by('created_at').first()
+
+
+def copy_processing_results(document, original):
+    """Reuse the original's extracted text and summary instead of processing again"""
+    document.duplicate_of = original
+    document.content_id = original.content_id
+    document.summary_tokens = 0
+    document.status = 'PROCESSED'
+    document.processed_at = timezone.now()
@@ -0,0 +1,165 @@
+"""
+Push channel for document processing updates.
+
+Every DocumentProcessingLog is published, together with the document's
+current status, on a per-user channel (core/pubsub.py). Status changes
+always come with a log, so clients following
+GET /api/documents/events/ (Server-Sent Events, ASGI only) no longer
+need to poll the document detail endpoint.
+
+Event ids are log ids: a reconnecting EventSource sends Last-Event-ID
+and gets the logs it missed from the database. A fresh connection, or
+one that missed too much, gets a snapshot of the documents still in
+flight instead.
+
+A stream opened with ?document=<id> only carries that document's events
+and ends with an `end` event once the document reaches a terminal
+status (PROCESSED or ERROR), so clients waiting on one upload need not
+keep the connection open.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from core.async_db import run_db
+from core.pubsub import publish, subscribe
+
+IN_FLIGHT_STATUSES = ('UPLOADED', 'PROCESSING')
+TERMINAL_STATUSES = ('PROCESSED', 'ERROR')
+
+
+def user_channel(user_id):
+    return f'documents:user:{user_id}'
+
+
+def log_event(log, document_status):
+    return {
+        'id': log.id,
+        'document_id': str(log.document_id),
+        'document_status': document_status,
+        'step': log.step,
+        'status': log.status,
+        'message': log.message,
+        'created_at': log.created_at.isoformat(),
+    }
+
+
+def publish_log(log):
+    """Publish a new processing log to its owner once the surrounding transaction commits"""
+    transaction.on_commit(lambda: _publish_log(log))
+
+
+def _publish_log(log):
+    from .models import Document
+
+    # Read after commit so the event carries the status the log describes
+    document = Document.objects.filter(id=log.document_id).values('user_id', 'status').first()
+    if document is None:
+        return
+    publish(user_channel(document['user_id']), log_event(log, document['status']))
+
+
+def missed_events(user_id, last_event_id, document_id=None):
+    """Logs after last_event_id, or None when more were missed than can be replayed"""
+    from .models import DocumentProcessingLog
+
+    limit = settings.DOCUMENT_EVENTS_REPLAY_LIMIT
+    logs = DocumentProcessingLog.objects.filter(document__user_id=user_id, id__gt=last_event_id)
+    if document_id is not None:
+        logs = logs.filter(document_id=document_id)
+    logs = list(
+        logs.select_related('document')
+        .only('id', 'document_id', 'step', 'status', 'message', 'created_at', 'document__status')
+        .order_by('id')[:limit + 1]
+    )
+    if len(logs) > limit:
+        return None
+    return [log_event(log, log.document.status) for log in logs]
+
+
+def processing_snapshot(user_id, document_id=None):
+    """
+    Documents still in flight, or the one document whatever its status, and
+    the newest log id as the client's resume point.
+    """
+    from .models import Document, DocumentProcessingLog
+
+    documents = Document.objects.filter(user_id=user_id)
+    if document_id is None:
+        documents = documents.filter(status__in=IN_FLIGHT_STATUSES)
+    else:
+        documents = documents.filter(id=document_id)
+    documents = documents.values('id', 'status', 'updated_at')
+    snapshot = {
+        'documents': [
+            {
+                'document_id': str(document['id']),
+                'document_status': document['status'],
+                'updated_at': document['updated_at'].isoformat(),
+            }
+            for document in documents
+        ]
+    }
+    cursor = DocumentProcessingLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return snapshot, cursor
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream_events(user_id, last_event_id=None, document_id=None):
+    """
+    Server-Sent Events for one user, ending after DOCUMENT_EVENTS_STREAM_TIMEOUT.
+
+    With document_id, only that document's events, ending once it reaches
+    a terminal status.
+    """
+    watched = str(document_id) if document_id is not None else None
+    # Subscribe before reading the database so nothing falls between replay and live events
+    async with subscribe(user_channel(user_id)) as subscription:
+        yield 'retry: 3000\n\n'
+
+        replayed = set()
+        events = None
+        if last_event_id is not None:
+            events = await run_db(missed_events, user_id, last_event_id, document_id)
+        if events is None:
+            snapshot, cursor = await run_db(processing_snapshot, user_id, document_id)
+            yield format_event('snapshot', snapshot, cursor)
+            if watched is not None and _finished(snapshot['documents']):
+                yield format_event('end', {'document_id': watched})
+                return
+        else:
+            for event in events:
+                replayed.add(event['id'])
+                yield format_event('processing', event, event['id'])
+            if watched is not None and events and events[-1]['document_status'] in TERMINAL_STATUSES:
+                yield format_event('end', {'document_id': watched})
+                return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.DOCUMENT_EVENTS_STREAM_TIMEOUT
+        while (remaining := deadline - loop.time()) > 0:
+            event = await subscription.get(min(settings.DOCUMENT_EVENTS_HEARTBEAT, remaining))
+            if event is None:
+                # Keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+            elif event['id'] in replayed or (watched is not None and event['document_id'] != watched):
+                continue
+            else:
+                yield format_event('processing', event, event['id'])
+                if watched is not None and event['document_status'] in TERMINAL_STATUSES:
+                    yield format_event('end', {'document_id': watched})
+                    return
+
+
+def _finished(documents):
+    # An unknown document (deleted meanwhile) has nothing more to report either
+    return not documents or documents[0]['document_status'] in TERMINAL_STATUSES
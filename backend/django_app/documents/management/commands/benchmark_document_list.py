@@ -0,0 +1,134 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import generics
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.pagination import KeysetPagination
+from documents.models import Document, DocumentContent
+from documents.serializers import DocumentListSerializer
+from documents.views import DocumentListView
+
+BENCH_EMAIL = 'benchmark-documents@jurchat.local'
+
+
+class LegacyDocumentListView(generics.ListAPIView):
+    """The listing before keyset pagination: every column, COUNT(*) and OFFSET"""
+
+    serializer_class = DocumentListSerializer
+    pagination_class = PageNumberPagination
+
+    def get_queryset(self):
+        return Document.objects.filter(user=self.request.user)
+
+
+class Command(BaseCommand):
+    help = 'Seed documents for a benchmark user and time the document list endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=100000, help='Documents to seed for the benchmark user')
+        parser.add_argument('--text-size', type=int, default=20000,
+                            help='Characters of extracted text per seeded document')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per measured page')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark user and its documents')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email=BENCH_EMAIL).delete()
+            self.stdout.write(f'Deleted {deleted} rows')
+            return
+
+        user, _ = User.objects.get_or_create(
+            email=BENCH_EMAIL,
+            defaults={'username': 'benchmark-documents', 'plan': 'PREMIUM'}
+        )
+        self.seed(user, options['documents'], options['text_size'])
+
+        total = Document.objects.filter(user=user).count()
+        page_size = KeysetPagination.page_size
+        self.stdout.write(f'{total} documents for {user.email} on {connection.vendor}, page size {page_size}')
+
+        depths = [('first page', 0), ('middle page', total // 2), ('last page', max(total - page_size, 0))]
+        for label, offset in depths:
+            legacy_query = {'page': offset // page_size + 1}
+            keyset_query = {}
+            if offset:
+                anchor = Document.objects.filter(user=user).order_by('-created_at', '-id').only(
+                    'id', 'created_at'
+                )[offset - 1]
+                keyset_query = {'cursor': KeysetPagination().encode_cursor(anchor)}
+
+            legacy = self.measure(LegacyDocumentListView.as_view(), user, legacy_query, options['repeat'])
+            lean = self.measure(DocumentListView.as_view(), user, keyset_query, options['repeat'])
+            self.stdout.write(
+                f'{label:12} legacy {legacy[0]:8.1f} ms ({legacy[1]} queries)   '
+                f'keyset {lean[0]:8.1f} ms ({lean[1]} queries)'
+            )
+
+    def seed(self, user, count, text_size):
+        existing = Document.objects.filter(user=user).count()
+        missing = count - existing
+        if missing <= 0:
+            return
+
+        self.stdout.write(f'Seeding {missing} documents...')
+        text = ('Cláusula contratual de exemplo para o benchmark. ' * (text_size // 50 + 1))[:text_size]
+        statuses = ['PROCESSED'] * 8 + ['ERROR', 'PROCESSING']
+        content = DocumentContent()
+        content.set_texts(text, text[:text_size // 10])
+        content.save()
+        start = timezone.now() - timedelta(minutes=count)
+
+        # Spread created_at like real uploads; auto_now_add would stamp every row with the same time
+        created_at = Document._meta.get_field('created_at')
+        created_at.auto_now_add = False
+        try:
+            batch = []
+            for number in range(existing, count):
+                batch.append(Document(
+                    id=uuid.uuid4(),
+                    user=user,
+                    title=f'Benchmark document {number}',
+                    document_type='CONTRACT',
+                    file=f'documents/benchmark/{number}.pdf',
+                    file_size=100000 + number,
+                    mime_type='application/pdf',
+                    status=statuses[number % len(statuses)],
+                    content=content,
+                    created_at=start + timedelta(minutes=number),
+                ))
+                if len(batch) == 2000:
+                    Document.objects.bulk_create(batch)
+                    batch = []
+            if batch:
+                Document.objects.bulk_create(batch)
+        finally:
+            created_at.auto_now_add = True
+
+    def measure(self, view, user, query, repeat):
+        """Median milliseconds and query count for one page of the list endpoint"""
+        factory = APIRequestFactory()
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            request = factory.get('/api/documents/', query)
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f'List endpoint returned {response.status_code}: {response.content[:200]}')
+            queries = len(captured)
+        return statistics.median(timings), queries
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import DocumentContent
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete document contents no document points at: left by deletions before contents were '
+        'removed with their last document, by concurrent deletions of duplicates, or replaced by reprocessing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per query')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the unused rows')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'{DocumentContent.unused().count()} unused document contents')
+            return
+
+        deleted = 0
+        while True:
+            batch = list(DocumentContent.unused().values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            # Checked again, in case a duplicate started using a row since it was listed
+            deleted += DocumentContent.unused().filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unused document contents'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from documents.models import Document
+from documents.search import index_document
+
+
+class Command(BaseCommand):
+    help = 'Index all processed documents for full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only index documents of this user (email)')
+
+    def handle(self, *args, **options):
+        documents = Document.objects.filter(status='PROCESSED').select_related('content')
+        if options['user']:
+            documents = documents.filter(user__email=options['user'])
+
+        indexed = 0
+        ids = list(documents.values_list('id', flat=True))
+        for start in range(0, len(ids), 500):
+            # One transaction per batch instead of one commit per document
+            with transaction.atomic():
+                for document in documents.filter(id__in=ids[start:start + 500]):
+                    index_document(document)
+                    indexed += 1
+            self.stdout.write(f'{indexed} documents indexed...')
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} documents'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='status',
+            field=models.CharField(choices=[('PENDING_UPLOAD', 'Awaiting Upload'), ('UPLOADED', 'Uploaded'), ('PROCESSING', 'Processing'), ('PROCESSED', 'Processed'), ('ERROR', 'Error')], default='UPLOADED', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_alter_document_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the file content', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Processed document with the same content this upload reuses', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='documents.document'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', 'content_hash'], name='documents_user_hash_idx'),
+        ),
+    ]
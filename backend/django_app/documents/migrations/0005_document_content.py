@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:28
+
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def compress(text):
+    return zlib.compress(text.encode('utf-8'), 6) if text else b''
+
+
+def move_text_to_content(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    DocumentContent = apps.get_model('documents', 'DocumentContent')
+
+    with_text = Document.objects.exclude(extracted_text='', summary='').only(
+        'id', 'extracted_text', 'summary', 'duplicate_of_id'
+    )
+    shared = {}
+    # Originals first so duplicates can share the original's row
+    for documents in (with_text.filter(duplicate_of__isnull=True), with_text.filter(duplicate_of__isnull=False)):
+        for document in documents.iterator(chunk_size=500):
+            content_id = shared.get(document.duplicate_of_id)
+            if content_id is None:
+                content_id = DocumentContent.objects.create(
+                    extracted_text_data=compress(document.extracted_text),
+                    summary_data=compress(document.summary),
+                    extracted_text_length=len(document.extracted_text),
+                    summary_length=len(document.summary),
+                ).id
+            if document.duplicate_of_id is None:
+                shared[document.id] = content_id
+            Document.objects.filter(id=document.id).update(content_id=content_id)
+
+
+def move_text_back(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+
+    documents = Document.objects.filter(content__isnull=False).select_related('content')
+    for document in documents.iterator(chunk_size=500):
+        content = document.content
+        if content.encrypted:
+            raise RuntimeError('Encrypted document content cannot be moved back; decrypt it first')
+        Document.objects.filter(id=document.id).update(
+            extracted_text=zlib.decompress(bytes(content.extracted_text_data)).decode('utf-8') if content.extracted_text_length else '',
+            summary=zlib.decompress(bytes(content.summary_data)).decode('utf-8') if content.summary_length else '',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_document_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('extracted_text_data', models.BinaryField(default=b'')),
+                ('summary_data', models.BinaryField(default=b'')),
+                ('encrypted', models.BooleanField(default=False)),
+                ('extracted_text_length', models.IntegerField(default=0)),
+                ('summary_length', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'document_contents',
+            },
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='content',
+            field=models.ForeignKey(blank=True, help_text='Extracted text and AI-generated summary', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documents', to='documents.documentcontent'),
+        ),
+        migrations.RunPython(move_text_to_content, move_text_back),
+        migrations.RemoveField(
+            model_name='document',
+            name='extracted_text',
+        ),
+        migrations.RemoveField(
+            model_name='document',
+            name='summary',
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            """
+            CREATE TABLE document_search (
+                document_id uuid PRIMARY KEY REFERENCES documents (id) ON DELETE CASCADE,
+                user_id bigint NOT NULL,
+                search_vector tsvector NOT NULL
+            )
+            """
+        )
+        schema_editor.execute('CREATE INDEX document_search_vector_idx ON document_search USING GIN (search_vector)')
+        schema_editor.execute('CREATE INDEX document_search_user_idx ON document_search (user_id)')
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            """
+            CREATE VIRTUAL TABLE document_search USING fts5(
+                document_id,
+                user_id,
+                title,
+                summary,
+                body,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute('DROP TABLE IF EXISTS document_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_document_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,9 +1,13 @@
 import os
 import uuid
+import zlib
 from django.db import models
 from django.conf import settings
+from django.utils.functional import cached_property
 from cryptography.fernet import Fernet
 
+from .events import publish_log
+
 
 def document_upload_path(instance, filename):
     """Generate upload path for document files"""
@@ -13,10 +17,120 @@ def document_upload_path(instance, filename):
     return os.path.join('documents', str(instance.user.id), filename)
 
 
+def get_fernet():
+    """Fernet cipher for the configured ENCRYPTION_KEY"""
+    return Fernet(settings.ENCRYPTION_KEY.encode())
+
+
+class DocumentContent(models.Model):
+    """
+    Extracted text and summary of a document, kept out of the documents table.
+
+    Text is stored zlib-compressed (and Fernet-encrypted when
+    DOCUMENT_CONTENT_ENCRYPTION is on) and only decoded when accessed.
+    Duplicate uploads point at the same row, which is deleted with the
+    last document using it (documents/signals.py).
+    """
+    
+    extracted_text_data = models.BinaryField(default=b'')
+    summary_data = models.BinaryField(default=b'')
+    encrypted = models.BooleanField(default=False)
+    
+    # Uncompressed sizes, for storage accounting
+    extracted_text_length = models.IntegerField(default=0)
+    summary_length = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'document_contents'
+    
+    def __str__(self):
+        return f"Content {self.pk} ({self.extracted_text_length} chars)"
+    
+    @classmethod
+    def encode_text(cls, text, encrypt):
+        data = zlib.compress(text.encode('utf-8'), settings.DOCUMENT_CONTENT_COMPRESSION_LEVEL)
+        if encrypt:
+            data = get_fernet().encrypt(data)
+        return data
+    
+    def decode_text(self, data):
+        data = bytes(data)
+        if not data:
+            return ''
+        if self.encrypted:
+            data = get_fernet().decrypt(data)
+        return zlib.decompress(data).decode('utf-8')
+    
+    def set_texts(self, extracted_text, summary):
+        self.encrypted = settings.DOCUMENT_CONTENT_ENCRYPTION
+        self.extracted_text_data = self.encode_text(extracted_text, self.encrypted)
+        self.summary_data = self.encode_text(summary, self.encrypted)
+        self.extracted_text_length = len(extracted_text)
+        self.summary_length = len(summary)
+        self.__dict__.pop('extracted_text', None)
+        self.__dict__.pop('summary', None)
+    
+    @classmethod
+    def unused(cls):
+        """Rows no document points at"""
+        return cls.objects.filter(documents__isnull=True)
+    
+    @cached_property
+    def extracted_text(self):
+        return self.decode_text(self.extracted_text_data)
+    
+    @cached_property
+    def summary(self):
+        return self.decode_text(self.summary_data)
+
+
+class DocumentBatch(models.Model):
+    """Bulk upload of many documents, processed with bounded parallelism"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_batches')
+    name = models.CharField(max_length=255, blank=True)
+    max_parallel = models.IntegerField(default=4, help_text='Documents of this batch processed at the same time')
+    rejected_files = models.JSONField(default=list, help_text='Files skipped at upload, with the reason')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'document_batches'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Batch {self.name or self.id} ({self.user.email})"
+    
+    def progress(self):
+        """Overall state and per-status document counts"""
+        counts = {'waiting': 0, 'processing': 0, 'processed': 0, 'error': 0}
+        keys = {'UPLOADED': 'waiting', 'PROCESSING': 'processing', 'PROCESSED': 'processed', 'ERROR': 'error'}
+        rows = self.documents.values('status').annotate(documents=models.Count('id')).order_by()
+        for row in rows:
+            key = keys.get(row['status'])
+            if key:
+                counts[key] += row['documents']
+        counts['total'] = sum(counts.values())
+        counts['rejected'] = len(self.rejected_files)
+        
+        if counts['waiting'] or counts['processing']:
+            state = 'PROCESSING'
+        elif counts['error']:
+            state = 'COMPLETED_WITH_ERRORS'
+        else:
+            state = 'COMPLETED'
+        return state, counts
+
+
 class Document(models.Model):
     """Document model for storing uploaded legal documents"""
     
     STATUS_CHOICES = [
+        ('PENDING_UPLOAD', 'Awaiting Upload'),
         ('UPLOADED', 'Uploaded'),
         ('PROCESSING', 'Processing'),
         ('PROCESSED', 'Processed'),
@@ -39,11 +153,33 @@ class Document(models.Model):
     file = models.FileField(upload_to=document_upload_path)
     file_size = models.BigIntegerField(help_text='File size in bytes')
     mime_type = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64, blank=True, help_text='SHA-256 of the file content')
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        help_text='Processed document with the same content this upload reuses'
+    )
+    batch = models.ForeignKey(
+        DocumentBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='documents'
+    )
     
     # Processing information
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='UPLOADED')
-    extracted_text = models.TextField(blank=True, help_text='Extracted text from document')
-    summary = models.TextField(blank=True, help_text='AI-generated summary in plain language')
+    content = models.ForeignKey(
+        DocumentContent,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='documents',
+        help_text='Extracted text and AI-generated summary'
+    )
     summary_tokens = models.IntegerField(default=0, help_text='Tokens used for summary generation')
     
     # Metadata
@@ -54,21 +190,41 @@ class Document(models.Model):
     class Meta:
         db_table = 'documents'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'content_hash'], name='documents_user_hash_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='documents_user_created_idx'),
+            models.Index(fields=['user', 'status'], name='documents_user_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.user.email})"
     
+    @property
+    def extracted_text(self):
+        """Extracted text, loaded from the content table on first access"""
+        return self.content.extracted_text if self.content_id else ''
+    
+    @property
+    def summary(self):
+        """AI-generated summary in plain language"""
+        return self.content.summary if self.content_id else ''
+    
+    def store_content(self, extracted_text, summary):
+        """Save new processing results; rows shared with duplicates are never modified"""
+        content = self.content if self.content_id else None
+        if content is None or content.documents.exclude(pk=self.pk).exists():
+            content = DocumentContent()
+        content.set_texts(extracted_text, summary)
+        content.save()
+        self.content = content
+    
     def encrypt_sensitive_data(self, data):
         """Encrypt sensitive data using AES-256"""
-        key = settings.ENCRYPTION_KEY.encode()
-        fernet = Fernet(key)
-        return fernet.encrypt(data.encode()).decode()
+        return get_fernet().encrypt(data.encode()).decode()
     
     def decrypt_sensitive_data(self, encrypted_data):
         """Decrypt sensitive data"""
-        key = settings.ENCRYPTION_KEY.encode()
-        fernet = Fernet(key)
-        return fernet.decrypt(encrypted_data.encode()).decode()
+        return get_fernet().decrypt(encrypted_data.encode()).decode()
     
     def get_file_extension(self):
         """Get file extension"""
@@ -99,6 +255,13 @@ class DocumentProcessingLog(models.Model):
     
     def __str__(self):
         return f"{self.document.title} - {self.step}: {self.status}"
+    
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        if created:
+            # Streamed to the owner's open event streams (documents/events.py)
+            publish_log(self)
 
 
 class DocumentShare(models.Model):
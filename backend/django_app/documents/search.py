@@ -0,0 +1,178 @@
+"""
+Full-text search over a user's documents.
+
+The index lives in the document_search table created by migration 0006:
+on PostgreSQL a weighted tsvector (Portuguese configuration) with a GIN
+index, on SQLite an FTS5 table with accent folding for development. Title
+weighs more than summary, summary more than extracted text.
+
+Documents are indexed when processing completes and removed when they
+are deleted; `manage.py rebuild_search_index` backfills existing rows.
+Because text is stored compressed (DocumentContent), highlights are built
+in Python for the returned page only.
+"""
+import html
+import re
+import unicodedata
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class PostgresSearchBackend:
+    """tsvector + GIN, ranked with ts_rank_cd"""
+
+    def index(self, cursor, document, title, summary, body):
+        cursor.execute(
+            """
+            INSERT INTO document_search (document_id, user_id, search_vector)
+            VALUES (
+                %s, %s,
+                setweight(to_tsvector('portuguese', %s), 'A') ||
+                setweight(to_tsvector('portuguese', %s), 'B') ||
+                setweight(to_tsvector('portuguese', %s), 'C')
+            )
+            ON CONFLICT (document_id) DO UPDATE
+            SET user_id = EXCLUDED.user_id, search_vector = EXCLUDED.search_vector
+            """,
+            [document.id, document.user_id, title, summary, body]
+        )
+
+    def remove(self, cursor, document_id):
+        cursor.execute('DELETE FROM document_search WHERE document_id = %s', [document_id])
+
+    def search(self, cursor, user_id, query, limit, offset):
+        cursor.execute(
+            """
+            SELECT s.document_id, ts_rank_cd(s.search_vector, q) AS rank
+            FROM document_search s, websearch_to_tsquery('portuguese', %s) q
+            WHERE s.user_id = %s AND s.search_vector @@ q
+            ORDER BY rank DESC, s.document_id
+            LIMIT %s OFFSET %s
+            """,
+            [query, user_id, limit, offset]
+        )
+        return [(document_id, rank) for document_id, rank in cursor.fetchall()]
+
+
+class SQLiteSearchBackend:
+    """
+    FTS5 with unicode61 accent folding, ranked with bm25; prefix matching stands in for stemming.
+
+    document_id (hex) and user_id are indexed tokens so deletes and the
+    per-user filter go through the full-text index instead of a scan.
+    """
+
+    def index(self, cursor, document, title, summary, body):
+        self.remove(cursor, document.id)
+        cursor.execute(
+            'INSERT INTO document_search (document_id, user_id, title, summary, body) VALUES (%s, %s, %s, %s, %s)',
+            [document.id.hex, str(document.user_id), title, summary, body]
+        )
+
+    def remove(self, cursor, document_id):
+        document_id = document_id if isinstance(document_id, uuid.UUID) else uuid.UUID(str(document_id))
+        cursor.execute(
+            'DELETE FROM document_search WHERE rowid IN '
+            '(SELECT rowid FROM document_search WHERE document_search MATCH %s)',
+            [f'document_id : "{document_id.hex}"']
+        )
+
+    def search(self, cursor, user_id, query, limit, offset):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        words = ' AND '.join(f'"{stem(term)}"*' for term in terms)
+        match = f'user_id : "{int(user_id)}" AND {{title summary body}} : ({words})'
+        # bm25 weights per column: document_id, user_id, title, summary, body; lower is better
+        cursor.execute(
+            """
+            SELECT document_id, bm25(document_search, 0, 0, 10.0, 4.0, 1.0) AS rank
+            FROM document_search
+            WHERE document_search MATCH %s
+            ORDER BY rank, document_id
+            LIMIT %s OFFSET %s
+            """,
+            [match, limit, offset]
+        )
+        return [(uuid.UUID(document_id), -rank) for document_id, rank in cursor.fetchall()]
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend():
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise NotImplementedError(f'Document search is not available on {connection.vendor}')
+
+
+def index_document(document):
+    """Add or refresh a processed document in the search index"""
+    body = document.extracted_text[:settings.DOCUMENT_SEARCH_MAX_CHARS]
+    with connection.cursor() as cursor:
+        get_backend().index(cursor, document, document.title, document.summary, body)
+
+
+def remove_document(document_id):
+    with connection.cursor() as cursor:
+        get_backend().remove(cursor, document_id)
+
+
+def search_documents(user, query, limit, offset=0):
+    """Ranked (document_id, rank) pairs for the user's documents matching the query"""
+    with connection.cursor() as cursor:
+        return get_backend().search(cursor, user.id, query, limit, offset)
+
+
+def query_terms(query):
+    return [term.lower() for term in WORD_RE.findall(query)]
+
+
+def stem(term):
+    """Crude prefix stem (contratos -> contrat) used for FTS5 prefix queries and highlighting"""
+    return term[:max(3, len(term) - 2)]
+
+
+def fold(text):
+    """Lowercase and strip accents one character at a time, keeping offsets aligned"""
+    return ''.join(unicodedata.normalize('NFKD', char.lower())[0] for char in text)
+
+
+def highlight(text, terms, length=None):
+    """
+    HTML-escaped snippet around the first match with matches wrapped in <mark>.
+
+    Matching is accent and case insensitive on word prefixes, which roughly
+    follows what the Portuguese stemmer (or FTS5 prefix query) matched.
+    Returns None when no term occurs in the text.
+    """
+    length = length or settings.DOCUMENT_SEARCH_SNIPPET_LENGTH
+    stems = {stem(fold(term)) for term in terms}
+    if not text or not stems:
+        return None
+
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(stem) for stem in sorted(stems, key=len, reverse=True)) + r')\w*')
+    folded = fold(text)
+    first = pattern.search(folded)
+    if first is None:
+        return None
+
+    start = max(0, first.start() - length // 3)
+    end = min(len(text), start + length)
+    parts = ['…' if start else '']
+    position = start
+    for match in pattern.finditer(folded, start, end):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f'<mark>{html.escape(text[match.start():match.end()])}</mark>')
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return ''.join(parts)
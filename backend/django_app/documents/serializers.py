@@ -1,5 +1,31 @@
 from rest_framework import serializers
-from .models import Document, DocumentShare, DocumentProcessingLog
+from django.conf import settings
+from .models import Document, DocumentBatch, DocumentShare, DocumentProcessingLog
+
+
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
+ALLOWED_EXTENSIONS = ['.pdf', '.doc', '.docx', '.txt']
+ALLOWED_MIME_TYPES = [
+    'application/pdf',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'text/plain',
+]
+EXTENSION_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.txt': 'text/plain',
+}
+
+
+def validate_extension(filename):
+    """Reject file names the AI service cannot parse"""
+    file_extension = filename.split('.')[-1].lower()
+    if f'.{file_extension}' not in ALLOWED_EXTENSIONS:
+        raise serializers.ValidationError(
+            f"File type not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
 
 
 class DocumentUploadSerializer(serializers.ModelSerializer):
@@ -12,25 +38,53 @@ class DocumentUploadSerializer(serializers.ModelSerializer):
     def validate_file(self, value):
         """Validate uploaded file"""
         # Check file size (max 50MB)
-        max_size = 50 * 1024 * 1024  # 50MB
-        if value.size > max_size:
+        if value.size > MAX_UPLOAD_SIZE:
             raise serializers.ValidationError("File size cannot exceed 50MB")
         
         # Check file extension
-        allowed_extensions = ['.pdf', '.doc', '.docx', '.txt']
-        file_extension = value.name.split('.')[-1].lower()
-        if f'.{file_extension}' not in allowed_extensions:
-            raise serializers.ValidationError(
-                f"File type not supported. Allowed types: {', '.join(allowed_extensions)}"
-            )
+        validate_extension(value.name)
         
         return value
 
 
+class PresignedUploadSerializer(serializers.ModelSerializer):
+    """Serializer for requesting a direct-to-storage upload URL"""
+    
+    filename = serializers.CharField(max_length=255, write_only=True)
+    content_type = serializers.ChoiceField(choices=ALLOWED_MIME_TYPES, write_only=True)
+    file_size = serializers.IntegerField(min_value=1, max_value=MAX_UPLOAD_SIZE)
+    
+    class Meta:
+        model = Document
+        fields = ('title', 'description', 'document_type', 'filename', 'content_type', 'file_size')
+    
+    def validate_filename(self, value):
+        validate_extension(value)
+        return value
+
+
+class UploadConfirmSerializer(serializers.Serializer):
+    """Serializer for confirming a direct-to-storage upload"""
+    
+    upload_token = serializers.CharField()
+
+
+class DocumentBatchUploadSerializer(serializers.Serializer):
+    """Options of a bulk upload; the files come as `files` parts or one ZIP `archive`"""
+    
+    name = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    document_type = serializers.ChoiceField(choices=Document.TYPE_CHOICES, default='OTHER')
+    max_parallel = serializers.IntegerField(min_value=1, required=False)
+    
+    def validate_max_parallel(self, value):
+        return min(value, settings.BULK_UPLOAD_MAX_PARALLEL)
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     """Serializer for document details"""
     
     file_url = serializers.SerializerMethodField()
+    summary = serializers.CharField(read_only=True)
     processing_logs = serializers.SerializerMethodField()
     
     class Meta:
@@ -38,11 +92,11 @@ class DocumentSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'title', 'description', 'document_type', 'file_url',
             'file_size', 'mime_type', 'status', 'summary', 'summary_tokens',
-            'created_at', 'updated_at', 'processed_at', 'processing_logs'
+            'duplicate_of', 'created_at', 'updated_at', 'processed_at', 'processing_logs'
         )
         read_only_fields = (
             'id', 'file_url', 'file_size', 'mime_type', 'status', 'summary',
-            'summary_tokens', 'created_at', 'updated_at', 'processed_at'
+            'summary_tokens', 'duplicate_of', 'created_at', 'updated_at', 'processed_at'
         )
     
     def get_file_url(self, obj):
@@ -69,6 +123,51 @@ class DocumentListSerializer(serializers.ModelSerializer):
         )
 
 
+class DocumentSearchResultSerializer(DocumentListSerializer):
+    """Search hit: listing fields plus relevance and highlighted snippets"""
+    
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    highlights = serializers.DictField(source='search_highlights', read_only=True)
+    
+    class Meta(DocumentListSerializer.Meta):
+        fields = DocumentListSerializer.Meta.fields + ('rank', 'highlights')
+
+
+class DocumentBatchItemSerializer(serializers.ModelSerializer):
+    """Per-file state inside a batch"""
+    
+    class Meta:
+        model = Document
+        fields = ('id', 'title', 'status', 'file_size', 'duplicate_of', 'created_at', 'processed_at')
+
+
+class DocumentBatchSerializer(serializers.ModelSerializer):
+    """Batch status with aggregate progress and per-file state"""
+    
+    status = serializers.SerializerMethodField()
+    progress = serializers.SerializerMethodField()
+    documents = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DocumentBatch
+        fields = ('id', 'name', 'status', 'progress', 'max_parallel', 'rejected_files', 'documents', 'created_at')
+    
+    def get_status(self, obj):
+        return self._progress(obj)[0]
+    
+    def get_progress(self, obj):
+        return self._progress(obj)[1]
+    
+    def get_documents(self, obj):
+        documents = obj.documents.only(*DocumentBatchItemSerializer.Meta.fields).order_by('created_at')
+        return DocumentBatchItemSerializer(documents, many=True).data
+    
+    def _progress(self, obj):
+        if not hasattr(obj, '_progress_cache'):
+            obj._progress_cache = obj.progress()
+        return obj._progress_cache
+
+
 class DocumentProcessingLogSerializer(serializers.ModelSerializer):
     """Serializer for processing logs"""
     
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Document, DocumentContent
+
+
+@receiver(post_delete, sender=Document)
+def delete_unused_content(sender, instance, **kwargs):
+    """Drop the text of a deleted document unless a duplicate still uses it"""
+    if instance.content_id:
+        DocumentContent.unused().filter(pk=instance.content_id).delete()
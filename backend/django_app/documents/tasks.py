@@ -0,0 +1,174 @@
+from contextlib import closing
+
+from django.conf import settings
+from django.utils import timezone
+from chat.context_cache import invalidate_document
+from core.ai_client import get_ai_client
+from core.multipart import stored_file_name
+from core.storage import open_stored_file
+from jobs.queue import task, enqueue
+from .dedupe import copy_processing_results, find_processed_original, hash_file
+from .models import Document, DocumentProcessingLog
+from .search import index_document
+
+
+def queue_document_processing(document):
+    """Mark a document as processing and hand it to the background workers"""
+    document.status = 'PROCESSING'
+    document.save(update_fields=['status', 'updated_at'])
+    _enqueue_processing(document.id)
+
+
+def start_batch_processing(batch):
+    """Queue the first max_parallel documents of a bulk upload"""
+    for _ in range(batch.max_parallel):
+        if not start_next_in_batch(batch.id):
+            break
+
+
+def start_next_in_batch(batch_id):
+    """Queue the next waiting document of a batch; False when none is left"""
+    while True:
+        waiting = list(
+            Document.objects.filter(batch_id=batch_id, status='UPLOADED')
+            .order_by('created_at')
+            .values_list('id', flat=True)[:5]
+        )
+        if not waiting:
+            return False
+        for document_id in waiting:
+            # Several finishing documents may race for the same waiting one
+            claimed = Document.objects.filter(id=document_id, status='UPLOADED').update(
+                status='PROCESSING',
+                updated_at=timezone.now()
+            )
+            if claimed:
+                _enqueue_processing(document_id)
+                return True
+
+
+def _enqueue_processing(document_id):
+    DocumentProcessingLog.objects.create(
+        document_id=document_id,
+        step='PROCESSING_START',
+        status='STARTED',
+        message='Document queued for processing'
+    )
+
+    enqueue('documents.process_document', document_id=str(document_id))
+
+
+def mark_processing_failed(payload, error):
+    """Dead letter handler: processing gave up after all retries"""
+    document = Document.objects.filter(id=payload['document_id']).first()
+    if document is None:
+        return
+
+    document.status = 'ERROR'
+    document.save(update_fields=['status', 'updated_at'])
+
+    DocumentProcessingLog.objects.create(
+        document=document,
+        step='PROCESSING_ERROR',
+        status='FAILED',
+        message=f'Processing failed: {error}'
+    )
+
+    if document.batch_id:
+        start_next_in_batch(document.batch_id)
+
+
+@task(
+    'documents.process_document',
+    max_attempts=3,
+    visibility_timeout=int(settings.AI_SERVICE_SUMMARIZE_TIMEOUT * 2),
+    on_dead_letter=mark_processing_failed
+)
+def process_document(document_id):
+    """Send a document to the FastAPI service and store the extracted text and summary"""
+    document = Document.objects.select_related('user').filter(id=document_id).first()
+    if document is None:
+        # Deleted while waiting in the queue
+        return
+
+    if not document.content_hash:
+        # Direct-to-storage uploads never passed through Django, hash them here
+        with closing(open_stored_file(document.file)) as f:
+            document.content_hash = hash_file(f)
+        document.save(update_fields=['content_hash', 'updated_at'])
+
+        original = None
+        if document.processed_at is None:
+            original = find_processed_original(document.user, document.content_hash, exclude_id=document.id)
+        if original is not None:
+            copy_processing_results(document, original)
+            document.save()
+            index_document(document)
+            invalidate_document(document)
+            DocumentProcessingLog.objects.create(
+                document=document,
+                step='PROCESSING_COMPLETE',
+                status='COMPLETED',
+                message=f'Duplicate of document {original.id}, reusing its processing results'
+            )
+            if document.batch_id:
+                start_next_in_batch(document.batch_id)
+            return
+
+    try:
+        # Streamed from storage (local or S3) in chunks, never read into memory as a whole
+        with closing(open_stored_file(document.file)) as f:
+            data = {
+                'document_id': str(document.id),
+                'user_id': document.user.id
+            }
+            result = get_ai_client().summarize(
+                fileobj=f,
+                filename=stored_file_name(document.file),
+                content_type=document.mime_type,
+                data=data
+            )
+    except Exception as e:
+        DocumentProcessingLog.objects.create(
+            document=document,
+            step='PROCESSING_ATTEMPT',
+            status='FAILED',
+            message=f'Processing attempt failed: {str(e)}'
+        )
+        raise
+
+    # Update document with processing results
+    document.store_content(result.get('extracted_text', ''), result.get('summary', ''))
+    document.summary_tokens = result.get('tokens_used', 0)
+    document.status = 'PROCESSED'
+    document.processed_at = timezone.now()
+    document.save()
+    index_document(document)
+    # Open chats must not keep answering from the previous text
+    invalidate_document(document)
+
+    # Update user AI token usage
+    document.user.use_ai_tokens(document.summary_tokens)
+
+    DocumentProcessingLog.objects.create(
+        document=document,
+        step='PROCESSING_COMPLETE',
+        status='COMPLETED',
+        message='Document processed successfully'
+    )
+
+    if document.batch_id:
+        start_next_in_batch(document.batch_id)
+
+
+@task('documents.expire_pending_upload', max_attempts=3)
+def expire_pending_upload(document_id):
+    """Remove a direct upload that was never confirmed"""
+    document = Document.objects.filter(id=document_id, status='PENDING_UPLOAD').first()
+    if document is None:
+        return
+
+    # Conditional delete so a confirm that lands at the same moment wins
+    deleted, _ = Document.objects.filter(id=document_id, status='PENDING_UPLOAD').delete()
+    if deleted:
+        document.file.storage.delete(document.file.name)
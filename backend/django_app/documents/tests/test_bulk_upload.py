@@ -0,0 +1,77 @@
+import hashlib
+import io
+import zipfile
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from documents.models import Document, DocumentBatch
+from documents.search import index_document, search_documents
+from jobs.models import Job
+
+pytestmark = pytest.mark.django_db
+
+BATCH_URL = '/api/documents/batches/'
+
+
+def make_archive(entries, corrupt=()):
+    """ZIP of stored (uncompressed) entries; entries named in corrupt get a flipped byte, failing their CRC"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    data = bytearray(buffer.getvalue())
+    for name in corrupt:
+        offset = data.index(entries[name])
+        data[offset] ^= 0xFF
+    return SimpleUploadedFile('documentos.zip', bytes(data), content_type='application/zip')
+
+
+def upload(api_client, archive):
+    response = api_client.post(BATCH_URL, {'archive': archive, 'document_type': 'CONTRACT'}, format='multipart')
+    assert response.status_code == 202, response.data
+    return DocumentBatch.objects.get(id=response.data['batch']['id'])
+
+
+def stored_files(settings):
+    return sorted(path.name for path in settings.MEDIA_ROOT.rglob('*') if path.is_file())
+
+
+def test_corrupt_entry_is_rejected_and_the_rest_is_processed(api_client, settings):
+    archive = make_archive({
+        'contrato.txt': b'Contrato de locacao entre as partes. ' * 20,
+        'danificado.txt': b'Procuracao com poderes gerais. ' * 20,
+        'parecer.txt': b'Parecer juridico sobre a clausula. ' * 20,
+    }, corrupt=['danificado.txt'])
+
+    batch = upload(api_client, archive)
+
+    assert sorted(batch.documents.values_list('title', flat=True)) == ['contrato', 'parecer']
+    assert [rejected['name'] for rejected in batch.rejected_files] == ['danificado.txt']
+    assert 'Bad CRC-32' in batch.rejected_files[0]['error']
+    # Processing started for the stored documents, none is left waiting forever
+    assert set(batch.documents.values_list('status', flat=True)) == {'PROCESSING'}
+    assert Job.objects.filter(task='documents.process_document').count() == 2
+    # Nothing half written is left behind for the corrupt entry
+    assert len(stored_files(settings)) == 2
+
+
+def test_duplicate_of_a_processed_document_is_searchable(api_client, user):
+    data = b'Contrato de arrendamento rural. ' * 20
+    original = Document.objects.create(
+        user=user, title='Arrendamento', document_type='CONTRACT', file_size=len(data),
+        mime_type='text/plain', status='PROCESSED', content_hash=hashlib.sha256(data).hexdigest()
+    )
+    original.file.save('arrendamento.txt', ContentFile(data), save=False)
+    original.store_content('Contrato de arrendamento rural.', 'Arrendamento de imóvel rural.')
+    original.save()
+    index_document(original)
+
+    batch = upload(api_client, make_archive({'copia.txt': data}))
+
+    duplicate = batch.documents.get()
+    assert duplicate.duplicate_of_id == original.id
+    assert duplicate.status == 'PROCESSED'
+    found = {document_id for document_id, _ in search_documents(user, 'arrendamento', 10)}
+    assert found == {original.id, duplicate.id}
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from documents.models import Document, DocumentContent
+
+pytestmark = pytest.mark.django_db
+
+
+def make_content(text='Cláusula primeira. O locatário pagará o aluguel até o dia 5.'):
+    content = DocumentContent()
+    content.set_texts(text, 'Resumo.')
+    content.save()
+    return content
+
+
+def make_document(user, content, title='Contrato de locação'):
+    return Document.objects.create(
+        user=user, title=title, document_type='CONTRACT', file='documents/contrato.pdf',
+        file_size=1000, mime_type='application/pdf', status='PROCESSED', content=content
+    )
+
+
+def test_deleting_a_document_deletes_its_content(api_client, user):
+    document = make_document(user, make_content())
+
+    response = api_client.delete(f'/api/documents/{document.id}/')
+
+    assert response.status_code == 204
+    assert not DocumentContent.objects.exists()
+
+
+def test_content_shared_by_a_duplicate_is_kept_until_the_last_document(user):
+    content = make_content()
+    original = make_document(user, content)
+    duplicate = make_document(user, content, title='Cópia')
+
+    original.delete()
+    assert DocumentContent.objects.filter(pk=content.pk).exists()
+    assert Document.objects.get(pk=duplicate.pk).extracted_text.startswith('Cláusula primeira')
+
+    duplicate.delete()
+    assert not DocumentContent.objects.filter(pk=content.pk).exists()
+
+
+def test_deleting_the_user_deletes_the_contents(user, django_user_model):
+    make_document(user, make_content('Primeiro contrato.'))
+    make_document(user, make_content('Segundo contrato.'))
+    other = django_user_model.objects.create_user(email='bruno@example.com', username='bruno', password='x')
+    kept = make_content('Contrato de outro usuário.')
+    make_document(other, kept)
+
+    user.delete()
+
+    assert list(DocumentContent.objects.values_list('pk', flat=True)) == [kept.pk]
+
+
+def test_purge_deletes_only_unused_contents(user):
+    used = make_content('Em uso.')
+    make_document(user, used)
+    for number in range(5):
+        make_content(f'Órfão {number}.')
+
+    call_command('purge_document_contents', batch_size=2, stdout=io.StringIO())
+
+    assert list(DocumentContent.objects.values_list('pk', flat=True)) == [used.pk]
@@ -0,0 +1,209 @@
+import time
+
+import boto3
+import pytest
+import requests
+from django.core import signing
+
+from documents import views
+from documents.models import Document
+from jobs.models import Job
+from users import metering
+
+pytestmark = pytest.mark.django_db
+
+PRESIGN_URL = '/api/documents/upload/presign/'
+CONFIRM_URL = '/api/documents/upload/confirm/'
+PDF = b'%PDF-1.4\n' + b'0' * 1000
+
+
+def presign(api_client, **overrides):
+    data = {
+        'title': 'Contrato de locação',
+        'document_type': 'CONTRACT',
+        'filename': 'contrato.pdf',
+        'content_type': 'application/pdf',
+        'file_size': len(PDF),
+        **overrides,
+    }
+    response = api_client.post(PRESIGN_URL, data, format='json')
+    assert response.status_code == 201, response.data
+    return response.data
+
+
+def put_object(document_id, body, content_type):
+    """Upload bytes other than what was presigned, as a misbehaving client could"""
+    document = Document.objects.get(id=document_id)
+    boto3.client('s3', region_name='us-east-1').put_object(
+        Bucket='jurchat-test', Key=document.file.name, Body=body, ContentType=content_type
+    )
+
+
+def confirm(api_client, token):
+    return api_client.post(CONFIRM_URL, {'upload_token': token}, format='json')
+
+
+def processing_jobs():
+    return Job.objects.filter(task='documents.process_document')
+
+
+def test_presign_put_confirm(api_client, user, s3_storage):
+    started = presign(api_client)
+    assert started['upload_method'] == 'PUT'
+    document = Document.objects.get(id=started['document']['id'])
+    assert document.status == 'PENDING_UPLOAD'
+    assert Job.objects.filter(task='documents.expire_pending_upload').count() == 1
+
+    uploaded = requests.put(started['upload_url'], data=PDF, headers=started['upload_headers'])
+    assert uploaded.status_code == 200
+
+    response = confirm(api_client, started['upload_token'])
+
+    assert response.status_code == 200, response.data
+    document.refresh_from_db()
+    assert document.status == 'PROCESSING'
+    assert document.file_size == len(PDF)
+    assert document.mime_type == 'application/pdf'
+    assert list(processing_jobs().values_list('payload', flat=True)) == [{'document_id': str(document.id)}]
+    assert metering.current_usage(user, metering.DOCUMENTS) == 1
+
+
+def test_double_confirm_enqueues_once(api_client, user, s3_storage):
+    started = presign(api_client)
+    requests.put(started['upload_url'], data=PDF, headers=started['upload_headers'])
+
+    assert confirm(api_client, started['upload_token']).status_code == 200
+    second = confirm(api_client, started['upload_token'])
+
+    assert second.status_code == 400
+    assert second.data['error'] == 'Upload already confirmed'
+    assert processing_jobs().count() == 1
+    assert metering.current_usage(user, metering.DOCUMENTS) == 1
+
+
+def test_concurrent_confirm_loses_without_charging(api_client, user, s3_storage, monkeypatch):
+    started = presign(api_client)
+    requests.put(started['upload_url'], data=PDF, headers=started['upload_headers'])
+    verify = views.verify_uploaded_object
+
+    def confirmed_meanwhile(document):
+        # Another confirm request wins between the status check and the update
+        Document.objects.filter(id=document.id).update(status='UPLOADED')
+        return verify(document)
+
+    monkeypatch.setattr(views, 'verify_uploaded_object', confirmed_meanwhile)
+    response = confirm(api_client, started['upload_token'])
+
+    assert response.status_code == 400
+    assert processing_jobs().count() == 0
+    assert metering.current_usage(user, metering.DOCUMENTS) == 0
+
+
+def test_malformed_token_is_rejected(api_client, s3_storage):
+    response = confirm(api_client, 'not-a-token')
+
+    assert response.status_code == 400
+    assert response.data['error'] == 'Invalid or expired upload token'
+
+
+def test_token_of_another_user_is_rejected(api_client, django_user_model, s3_storage):
+    started = presign(api_client)
+    other = django_user_model.objects.create_user(email='bruno@example.com', username='bruno', password='x')
+    api_client.force_authenticate(user=other)
+
+    response = confirm(api_client, started['upload_token'])
+
+    assert response.status_code == 400
+    assert Document.objects.get(id=started['document']['id']).status == 'PENDING_UPLOAD'
+
+
+def test_expired_token_is_rejected(api_client, settings, s3_storage, monkeypatch):
+    started = presign(api_client)
+    requests.put(started['upload_url'], data=PDF, headers=started['upload_headers'])
+    expires_at = time.time() + settings.DIRECT_UPLOAD_EXPIRES + settings.DIRECT_UPLOAD_CONFIRM_GRACE
+    monkeypatch.setattr(signing.time, 'time', lambda: expires_at + 1)
+
+    response = confirm(api_client, started['upload_token'])
+
+    assert response.status_code == 400
+    assert response.data['error'] == 'Invalid or expired upload token'
+    assert processing_jobs().count() == 0
+
+
+def test_missing_object_is_rejected(api_client, user, s3_storage):
+    started = presign(api_client)
+
+    response = confirm(api_client, started['upload_token'])
+
+    assert response.status_code == 400
+    assert response.data['error'] == 'File was not uploaded'
+    assert Document.objects.get(id=started['document']['id']).status == 'ERROR'
+    assert processing_jobs().count() == 0
+    assert metering.current_usage(user, metering.DOCUMENTS) == 0
+
+
+@pytest.mark.parametrize('body, content_type, error', [
+    (PDF, 'application/x-msdownload', 'Unsupported file type: application/x-msdownload'),
+    (b'', 'application/pdf', 'Uploaded file is empty'),
+    (PDF, 'application/pdf', 'File size cannot exceed 50MB'),
+])
+def test_object_breaking_limits_is_rejected(api_client, user, s3_storage, monkeypatch, body, content_type, error):
+    if error.startswith('File size'):
+        monkeypatch.setattr('documents.uploads.MAX_UPLOAD_SIZE', len(PDF) - 1)
+    started = presign(api_client)
+    put_object(started['document']['id'], body, content_type)
+
+    response = confirm(api_client, started['upload_token'])
+
+    assert response.status_code == 400
+    assert response.data['error'] == error
+    document = Document.objects.get(id=started['document']['id'])
+    assert document.status == 'ERROR'
+    # The rejected object is removed from the bucket
+    assert not s3_storage.exists(document.file.name)
+    assert processing_jobs().count() == 0
+    assert metering.current_usage(user, metering.DOCUMENTS) == 0
+
+
+
+def reprocess(api_client, document_id):
+    return api_client.post(f'/api/documents/{document_id}/reprocess/')
+
+
+def test_unconfirmed_upload_cannot_be_reprocessed(api_client, user, s3_storage):
+    started = presign(api_client)
+    # Even with the object in place, only confirm checks it and counts the upload
+    put_object(started['document']['id'], PDF, 'application/x-msdownload')
+
+    response = reprocess(api_client, started['document']['id'])
+
+    assert response.status_code == 400
+    assert response.data['error'] == 'Document upload has not been confirmed'
+    assert Document.objects.get(id=started['document']['id']).status == 'PENDING_UPLOAD'
+    assert processing_jobs().count() == 0
+    assert metering.current_usage(user, metering.DOCUMENTS) == 0
+
+
+@pytest.mark.parametrize('document_status, allowed', [
+    ('UPLOADED', False),
+    ('PROCESSING', False),
+    ('PROCESSED', True),
+    ('ERROR', True),
+])
+def test_only_finished_documents_are_reprocessed(api_client, user, document_status, allowed):
+    document = Document.objects.create(
+        user=user, title='Contrato', document_type='CONTRACT', file='documents/contrato.pdf',
+        file_size=len(PDF), mime_type='application/pdf', status=document_status
+    )
+
+    response = reprocess(api_client, document.id)
+
+    document.refresh_from_db()
+    if allowed:
+        assert response.status_code == 200
+        assert document.status == 'PROCESSING'
+        assert processing_jobs().count() == 1
+    else:
+        assert response.status_code == 400
+        assert document.status == document_status
+        assert processing_jobs().count() == 0
@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from documents.models import Document, DocumentProcessingLog
+
+pytestmark = [pytest.mark.django_db(transaction=True), pytest.mark.asyncio]
+
+
+@pytest.fixture(autouse=True)
+def short_streams(settings):
+    settings.DOCUMENT_EVENTS_HEARTBEAT = 1
+    settings.DOCUMENT_EVENTS_STREAM_TIMEOUT = 5
+
+
+def make_document(user, status='UPLOADED', title='Contrato de locação'):
+    return Document.objects.create(
+        user=user, title=title, document_type='CONTRACT', file='documents/contrato.pdf',
+        file_size=1000, mime_type='application/pdf', status=status
+    )
+
+
+@sync_to_async
+def change_status(document, status, step='analysis'):
+    Document.objects.filter(pk=document.pk).update(status=status)
+    log_status = 'failed' if status == 'ERROR' else 'completed' if status == 'PROCESSED' else 'started'
+    return DocumentProcessingLog.objects.create(document=document, step=step, status=log_status)
+
+
+async def open_stream(user, **params):
+    params['token'] = str(AccessToken.for_user(user))
+    return await AsyncClient().get('/api/documents/events/', params)
+
+
+async def next_event(stream):
+    """Next event as (name, data), skipping keep-alives; None when the stream ended"""
+    while True:
+        try:
+            chunk = await asyncio.wait_for(stream.__anext__(), 3)
+        except StopAsyncIteration:
+            return None
+        fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+        if 'event' in fields:
+            return fields['event'], json.loads(fields['data'])
+
+
+async def connected(response):
+    """The stream after its retry line, once it is subscribed"""
+    stream = aiter(response.streaming_content)
+    assert (await stream.__anext__()).startswith(b'retry:')
+    return stream
+
+
+async def test_status_change_is_published_to_the_owner(user):
+    document = await sync_to_async(make_document)(user)
+    response = await open_stream(user)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/event-stream'
+    stream = await connected(response)
+
+    name, snapshot = await next_event(stream)
+    assert name == 'snapshot'
+    assert [d['document_id'] for d in snapshot['documents']] == [str(document.id)]
+
+    log = await change_status(document, 'PROCESSING')
+
+    name, event = await next_event(stream)
+    assert name == 'processing'
+    assert event['id'] == log.id
+    assert event['document_id'] == str(document.id)
+    assert event['document_status'] == 'PROCESSING'
+
+
+async def test_stream_carries_only_the_owners_documents(user, django_user_model):
+    other = await sync_to_async(django_user_model.objects.create_user)(
+        email='bruno@example.com', username='bruno', password='x'
+    )
+    others_document = await sync_to_async(make_document)(other)
+    document = await sync_to_async(make_document)(user)
+    stream = await connected(await open_stream(user))
+    name, snapshot = await next_event(stream)
+    assert [d['document_id'] for d in snapshot['documents']] == [str(document.id)]
+
+    await change_status(others_document, 'PROCESSING')
+    await change_status(document, 'PROCESSING')
+
+    name, event = await next_event(stream)
+    assert event['document_id'] == str(document.id)
+
+
+async def test_stream_requires_a_valid_token(user):
+    response = await AsyncClient().get('/api/documents/events/')
+    assert response.status_code == 401
+
+    response = await AsyncClient().get('/api/documents/events/', {'token': 'not-a-token'})
+    assert response.status_code == 401
+
+
+async def test_another_users_document_cannot_be_followed(user, django_user_model):
+    other = await sync_to_async(django_user_model.objects.create_user)(
+        email='bruno@example.com', username='bruno', password='x'
+    )
+    others_document = await sync_to_async(make_document)(other)
+
+    response = await open_stream(user, document=str(others_document.id))
+    assert response.status_code == 404
+
+    response = await open_stream(user, document='not-a-uuid')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('final_status', ['PROCESSED', 'ERROR'])
+async def test_document_stream_ends_on_terminal_status(user, final_status):
+    document = await sync_to_async(make_document)(user, status='PROCESSING')
+    sibling = await sync_to_async(make_document)(user, title='Procuração')
+    stream = await connected(await open_stream(user, document=str(document.id)))
+
+    name, snapshot = await next_event(stream)
+    assert name == 'snapshot'
+    assert snapshot['documents'][0]['document_status'] == 'PROCESSING'
+
+    await change_status(sibling, 'PROCESSING')
+    await change_status(document, final_status, step='complete')
+
+    name, event = await next_event(stream)
+    assert (name, event['document_id'], event['document_status']) == (
+        'processing', str(document.id), final_status
+    )
+    assert await next_event(stream) == ('end', {'document_id': str(document.id)})
+    assert await next_event(stream) is None
+
+
+async def test_document_stream_of_a_finished_document_ends_after_the_snapshot(user):
+    document = await sync_to_async(make_document)(user, status='PROCESSED')
+    stream = await connected(await open_stream(user, document=str(document.id)))
+
+    name, snapshot = await next_event(stream)
+    assert snapshot['documents'][0]['document_status'] == 'PROCESSED'
+    assert await next_event(stream) == ('end', {'document_id': str(document.id)})
+    assert await next_event(stream) is None
+
+
+async def test_document_stream_replays_missed_events_until_the_end(user):
+    document = await sync_to_async(make_document)(user, status='PROCESSING')
+    first = await change_status(document, 'PROCESSING', step='text_extraction')
+    await change_status(document, 'PROCESSED', step='complete')
+
+    stream = await connected(await open_stream(user, document=str(document.id), last_event_id=first.id))
+
+    name, event = await next_event(stream)
+    assert (name, event['document_status']) == ('processing', 'PROCESSED')
+    assert await next_event(stream) == ('end', {'document_id': str(document.id)})
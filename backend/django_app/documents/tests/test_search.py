@@ -0,0 +1,126 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from django.core.files.base import ContentFile
+
+from documents import tasks
+from documents.models import Document
+from documents.search import PostgresSearchBackend, index_document, search_documents
+
+pytestmark = pytest.mark.django_db
+
+SEARCH_URL = '/api/documents/search/'
+
+
+def make_document(user, title, text='', summary=''):
+    document = Document.objects.create(
+        user=user, title=title, document_type='CONTRACT', file='documents/contrato.txt',
+        file_size=1000, mime_type='text/plain', status='PROCESSED'
+    )
+    document.store_content(text, summary)
+    document.save()
+    index_document(document)
+    return document
+
+
+def search(api_client, query):
+    response = api_client.get(SEARCH_URL, {'q': query})
+    assert response.status_code == 200, response.data
+    return response.data['results']
+
+
+def test_title_matches_rank_above_summary_and_text(api_client, user):
+    in_text = make_document(user, 'Contrato de prestação de serviços', text='A multa rescisória é de 10%.')
+    in_title = make_document(user, 'Multa contratual', text='Valores devidos.')
+    in_summary = make_document(user, 'Contrato de locação', summary='Prevê multa por atraso.')
+    make_document(user, 'Procuração', text='Poderes gerais.')
+
+    results = search(api_client, 'multa')
+
+    assert [result['id'] for result in results] == [str(in_title.id), str(in_summary.id), str(in_text.id)]
+    assert results[0]['rank'] > results[1]['rank'] > results[2]['rank']
+    assert results[0]['highlights']['title'] == '<mark>Multa</mark> contratual'
+
+
+def test_accents_and_plurals_match(api_client, user):
+    document = make_document(user, 'Petição inicial', text='Das obrigações contratuais do locatário.')
+
+    assert [result['id'] for result in search(api_client, 'OBRIGAÇÕES locatario')] == [str(document.id)]
+    assert [result['id'] for result in search(api_client, 'contratos')] == [str(document.id)]
+    assert search(api_client, 'locatario fiador') == []
+
+
+def test_search_only_sees_the_users_documents(api_client, user, django_user_model):
+    own = make_document(user, 'Contrato de locação', text='Cláusula de fiança.')
+    other = django_user_model.objects.create_user(email='bruno@example.com', username='bruno', password='x')
+    make_document(other, 'Contrato de fiança', text='Fiança bancária.')
+
+    assert [result['id'] for result in search(api_client, 'fiança')] == [str(own.id)]
+    assert [document_id for document_id, _ in search_documents(other, 'locação', 10)] == []
+
+
+def test_reprocessing_replaces_the_indexed_text(api_client, user, monkeypatch):
+    document = make_document(user, 'Contrato', text='Cláusula de arbitragem.')
+    document.file.save('contrato.txt', ContentFile(b'texto novo'), save=False)
+    document.content_hash = 'a' * 64
+    document.save()
+    summarize = lambda **kwargs: {'extracted_text': 'Cláusula de foro em Curitiba.', 'summary': '', 'tokens_used': 5}
+    monkeypatch.setattr(tasks, 'get_ai_client', lambda: SimpleNamespace(summarize=summarize))
+
+    tasks.process_document(document.id)
+
+    assert search(api_client, 'arbitragem') == []
+    assert [result['id'] for result in search(api_client, 'curitiba')] == [str(document.id)]
+
+
+def test_renaming_and_deleting_update_the_index(api_client, user):
+    document = make_document(user, 'Contrato', text='Texto.')
+
+    assert api_client.patch(f'/api/documents/{document.id}/', {'title': 'Distrato'}, format='json').status_code == 200
+    assert search(api_client, 'contrato') == []
+    assert [result['id'] for result in search(api_client, 'distrato')] == [str(document.id)]
+
+    assert api_client.delete(f'/api/documents/{document.id}/').status_code == 204
+    assert search(api_client, 'distrato') == []
+
+
+class RecordingCursor:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append((' '.join(sql.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_postgres_index_weights_title_summary_and_text():
+    cursor = RecordingCursor()
+    document = SimpleNamespace(id=uuid.uuid4(), user_id=7)
+
+    PostgresSearchBackend().index(cursor, document, 'Título', 'Resumo', 'Texto')
+
+    (sql, params), = cursor.executed
+    assert "setweight(to_tsvector('portuguese', %s), 'A') || " \
+           "setweight(to_tsvector('portuguese', %s), 'B') || " \
+           "setweight(to_tsvector('portuguese', %s), 'C')" in sql
+    assert 'ON CONFLICT (document_id) DO UPDATE' in sql
+    assert params == [document.id, 7, 'Título', 'Resumo', 'Texto']
+
+
+def test_postgres_search_is_scoped_to_the_user_and_ranked():
+    document_id = uuid.uuid4()
+    cursor = RecordingCursor(rows=[(document_id, 0.5)])
+
+    hits = PostgresSearchBackend().search(cursor, 7, 'multa "juros de mora"', 21, 20)
+
+    (sql, params), = cursor.executed
+    assert "websearch_to_tsquery('portuguese', %s) q" in sql
+    assert 'WHERE s.user_id = %s AND s.search_vector @@ q' in sql
+    assert 'ORDER BY rank DESC, s.document_id LIMIT %s OFFSET %s' in sql
+    # The user's query is only ever a parameter
+    assert params == ['multa "juros de mora"', 7, 21, 20]
+    assert hits == [(document_id, 0.5)]
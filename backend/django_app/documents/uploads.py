@@ -0,0 +1,71 @@
+"""
+Direct-to-storage uploads.
+
+The client asks for a presigned PUT URL, sends the file bytes straight to
+the bucket, then confirms with the signed upload token. Django never
+handles the file body; on confirm it checks the stored object's size and
+content type before queueing processing.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+
+from core.storage import head_object, is_object_storage, presigned_put_url
+from .serializers import ALLOWED_MIME_TYPES, MAX_UPLOAD_SIZE
+
+UPLOAD_TOKEN_SALT = 'documents.direct-upload'
+
+
+class UploadRejected(Exception):
+    """The uploaded object is missing or does not match the upload rules"""
+
+
+def direct_upload_supported():
+    return is_object_storage(default_storage)
+
+
+def create_upload_token(document):
+    return signing.dumps(
+        {'document_id': str(document.id), 'user_id': document.user_id},
+        salt=UPLOAD_TOKEN_SALT,
+    )
+
+
+def read_upload_token(token, user):
+    """Document id from a valid token issued to this user, or None"""
+    try:
+        data = signing.loads(
+            token,
+            salt=UPLOAD_TOKEN_SALT,
+            max_age=settings.DIRECT_UPLOAD_EXPIRES + settings.DIRECT_UPLOAD_CONFIRM_GRACE,
+        )
+    except signing.BadSignature:
+        return None
+    if data.get('user_id') != user.id:
+        return None
+    return data.get('document_id')
+
+
+def create_upload_url(document):
+    return presigned_put_url(
+        document.file.storage,
+        document.file.name,
+        document.mime_type,
+        settings.DIRECT_UPLOAD_EXPIRES,
+    )
+
+
+def verify_uploaded_object(document):
+    """Size and content type of the uploaded object; raises UploadRejected"""
+    stored = head_object(document.file.storage, document.file.name)
+    if stored is None:
+        raise UploadRejected('File was not uploaded')
+    if stored['size'] > MAX_UPLOAD_SIZE:
+        raise UploadRejected('File size cannot exceed 50MB')
+    if stored['size'] == 0:
+        raise UploadRejected('Uploaded file is empty')
+
+    content_type = stored['content_type'].split(';')[0].strip()
+    if content_type not in ALLOWED_MIME_TYPES:
+        raise UploadRejected(f'Unsupported file type: {content_type or "unknown"}')
+    return stored['size'], content_type
@@ -5,12 +5,24 @@ from .views import (
     DocumentDetailView,
     DocumentShareView,
     SharedDocumentsView,
+    presign_upload,
+    confirm_upload,
+    bulk_upload,
+    batch_status,
+    search_documents_view,
+    document_events,
     reprocess_document
 )
 
 urlpatterns = [
     path('upload/', DocumentUploadView.as_view(), name='document_upload'),
+    path('upload/presign/', presign_upload, name='document_upload_presign'),
+    path('upload/confirm/', confirm_upload, name='document_upload_confirm'),
+    path('batches/', bulk_upload, name='document_bulk_upload'),
+    path('batches/<uuid:batch_id>/', batch_status, name='document_batch_status'),
     path('', DocumentListView.as_view(), name='document_list'),
+    path('search/', search_documents_view, name='document_search'),
+    path('events/', document_events, name='document_events'),
     path('<uuid:pk>/', DocumentDetailView.as_view(), name='document_detail'),
     path('<uuid:document_id>/reprocess/', reprocess_document, name='document_reprocess'),
     path('share/', DocumentShareView.as_view(), name='document_share'),
@@ -1,16 +1,44 @@
-import os
-import requests
+import uuid
+
 from rest_framework import status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.utils.urls import replace_query_param
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from .models import Document, DocumentShare, DocumentProcessingLog
+from chat.context_cache import invalidate_document
+from core.async_db import run_db
+from core.authentication import authenticate_jwt
+from core.pagination import KeysetPagination
+from core.ratelimit import PlanRateThrottle, UploadRateThrottle
+from jobs.queue import enqueue
+from users import metering
+from .models import Document, DocumentBatch, DocumentShare, DocumentProcessingLog, document_upload_path
+from .tasks import queue_document_processing, start_batch_processing
+from .bulk import BatchRejected, collect_files, store_batch_files
+from .events import stream_events
+from .dedupe import ContentHashUploadHandler, copy_processing_results, find_processed_original
+from .search import highlight, index_document, query_terms, remove_document, search_documents
+from .uploads import (
+    UploadRejected,
+    create_upload_token,
+    create_upload_url,
+    direct_upload_supported,
+    read_upload_token,
+    verify_uploaded_object
+)
 from .serializers import (
     DocumentUploadSerializer,
+    DocumentBatchUploadSerializer,
+    DocumentBatchSerializer,
+    PresignedUploadSerializer,
+    UploadConfirmSerializer,
     DocumentSerializer,
     DocumentListSerializer,
+    DocumentSearchResultSerializer,
     DocumentShareSerializer
 )
 
@@ -21,27 +49,42 @@ class DocumentUploadView(generics.CreateAPIView):
     serializer_class = DocumentUploadSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    throttle_classes = [PlanRateThrottle, UploadRateThrottle]
     
     def create(self, request, *args, **kwargs):
-        # Check if user can upload documents
-        user = request.user
-        if not user.can_upload_document():
-            return Response({
-                'error': 'Document upload limit reached for your plan'
-            }, status=status.HTTP_403_FORBIDDEN)
+        # Hash the file while the multipart body streams in
+        hash_handler = ContentHashUploadHandler(request)
+        request.upload_handlers.insert(0, hash_handler)
         
+        user = request.user
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        content_hash = hash_handler.hashes.get('file', '')
         
-        # Create document instance
-        document = serializer.save(
-            user=user,
-            file_size=request.FILES['file'].size,
-            mime_type=request.FILES['file'].content_type
-        )
+        # Same content already processed for this user: reuse it, no plan usage
+        original = find_processed_original(user, content_hash)
+        if original is not None:
+            return self.create_duplicate(request, serializer, original)
         
-        # Increment user document count
-        user.increment_document_count()
+        # Count the upload against the plan before storing it
+        try:
+            reservation = metering.reserve(user, metering.DOCUMENTS, 1)
+        except metering.QuotaExceeded as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        # Create document instance
+        try:
+            document = serializer.save(
+                user=user,
+                file_size=request.FILES['file'].size,
+                mime_type=request.FILES['file'].content_type,
+                content_hash=content_hash
+            )
+        except Exception:
+            metering.release(reservation)
+            raise
         
         # Create processing log
         DocumentProcessingLog.objects.create(
@@ -51,80 +94,249 @@ class DocumentUploadView(generics.CreateAPIView):
             message='Document uploaded successfully'
         )
         
-        # Start processing (async)
-        self.start_document_processing(document)
+        # Processing runs in the background job workers
+        queue_document_processing(document)
         
         return Response({
             'message': 'Document uploaded successfully',
             'document': DocumentSerializer(document, context={'request': request}).data
         }, status=status.HTTP_201_CREATED)
     
-    def start_document_processing(self, document):
-        """Start document processing with FastAPI service"""
-        try:
-            # Update status to processing
-            document.status = 'PROCESSING'
-            document.save()
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                step='PROCESSING_START',
-                status='STARTED',
-                message='Starting document processing'
-            )
-            
-            # Send to FastAPI service for processing
-            fastapi_url = f"{settings.FASTAPI_SERVICE_URL}/ai/summarize"
-            
-            # In a real implementation, this should be done asynchronously
-            # using Celery or similar task queue
-            with open(document.file.path, 'rb') as f:
-                files = {'file': f}
-                data = {
-                    'document_id': str(document.id),
-                    'user_id': document.user.id
-                }
-                
-                response = requests.post(
-                    fastapi_url,
-                    files=files,
-                    data=data,
-                    timeout=300  # 5 minutes timeout
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Update document with processing results
-                    document.extracted_text = result.get('extracted_text', '')
-                    document.summary = result.get('summary', '')
-                    document.summary_tokens = result.get('tokens_used', 0)
-                    document.status = 'PROCESSED'
-                    document.processed_at = timezone.now()
-                    document.save()
-                    
-                    # Update user AI token usage
-                    document.user.use_ai_tokens(document.summary_tokens)
-                    
-                    DocumentProcessingLog.objects.create(
-                        document=document,
-                        step='PROCESSING_COMPLETE',
-                        status='COMPLETED',
-                        message='Document processed successfully'
-                    )
-                else:
-                    raise Exception(f"FastAPI service error: {response.status_code}")
-                    
-        except Exception as e:
-            document.status = 'ERROR'
-            document.save()
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                step='PROCESSING_ERROR',
-                status='FAILED',
-                message=f'Processing failed: {str(e)}'
-            )
+    def create_duplicate(self, request, serializer, original):
+        """Link a re-upload to the processed original; the stored file is shared"""
+        document = Document(
+            user=request.user,
+            title=serializer.validated_data['title'],
+            description=serializer.validated_data.get('description', ''),
+            document_type=serializer.validated_data.get('document_type', 'OTHER'),
+            file=original.file.name,
+            file_size=original.file_size,
+            mime_type=original.mime_type,
+            content_hash=original.content_hash
+        )
+        copy_processing_results(document, original)
+        document.save()
+        index_document(document)
+        
+        DocumentProcessingLog.objects.create(
+            document=document,
+            step='UPLOAD',
+            status='COMPLETED',
+            message=f'Duplicate of document {original.id}, reusing its processing results'
+        )
+        
+        return Response({
+            'message': 'Document already processed',
+            'duplicate_of': str(original.id),
+            'document': DocumentSerializer(document, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@throttle_classes([PlanRateThrottle, UploadRateThrottle])
+def presign_upload(request):
+    """Start a direct-to-storage upload: returns a presigned PUT URL and an upload token"""
+    if not direct_upload_supported():
+        return Response({
+            'error': 'Direct uploads require object storage'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    user = request.user
+    if not user.can_upload_document():
+        return Response({
+            'error': 'Document upload limit reached for your plan'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = PresignedUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    filename = serializer.validated_data.pop('filename')
+    content_type = serializer.validated_data.pop('content_type')
+    
+    # The file bytes arrive later straight in the bucket, under this name
+    document = Document(
+        user=user,
+        status='PENDING_UPLOAD',
+        mime_type=content_type,
+        **serializer.validated_data
+    )
+    document.file.name = document_upload_path(document, filename)
+    document.save()
+    
+    DocumentProcessingLog.objects.create(
+        document=document,
+        step='UPLOAD',
+        status='STARTED',
+        message='Waiting for direct upload to storage'
+    )
+    
+    # Clean up if the client never confirms
+    enqueue(
+        'documents.expire_pending_upload',
+        delay=settings.DIRECT_UPLOAD_EXPIRES + settings.DIRECT_UPLOAD_CONFIRM_GRACE,
+        document_id=str(document.id)
+    )
+    
+    return Response({
+        'upload_url': create_upload_url(document),
+        'upload_method': 'PUT',
+        'upload_headers': {'Content-Type': content_type},
+        'upload_token': create_upload_token(document),
+        'expires_in': settings.DIRECT_UPLOAD_EXPIRES,
+        'document': DocumentSerializer(document, context={'request': request}).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def confirm_upload(request):
+    """Finish a direct-to-storage upload and queue the document for processing"""
+    serializer = UploadConfirmSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    user = request.user
+    document_id = read_upload_token(serializer.validated_data['upload_token'], user)
+    if document_id is None:
+        return Response({
+            'error': 'Invalid or expired upload token'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    document = Document.objects.filter(id=document_id, user=user).first()
+    if document is None:
+        return Response({
+            'error': 'Document not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if document.status != 'PENDING_UPLOAD':
+        return Response({
+            'error': 'Upload already confirmed'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        reservation = metering.reserve(user, metering.DOCUMENTS, 1)
+    except metering.QuotaExceeded as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    # Size and type come from the stored object, not from what the client declared
+    try:
+        file_size, mime_type = verify_uploaded_object(document)
+    except UploadRejected as e:
+        metering.release(reservation)
+        document.file.delete(save=False)
+        document.status = 'ERROR'
+        document.save(update_fields=['status', 'updated_at'])
+        DocumentProcessingLog.objects.create(
+            document=document,
+            step='UPLOAD',
+            status='FAILED',
+            message=str(e)
+        )
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Only one confirm request wins
+    confirmed = Document.objects.filter(id=document.id, status='PENDING_UPLOAD').update(
+        status='UPLOADED',
+        file_size=file_size,
+        mime_type=mime_type,
+        updated_at=timezone.now()
+    )
+    if not confirmed:
+        metering.release(reservation)
+        return Response({
+            'error': 'Upload already confirmed'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    document.refresh_from_db()
+    
+    DocumentProcessingLog.objects.create(
+        document=document,
+        step='UPLOAD',
+        status='COMPLETED',
+        message='Document uploaded successfully'
+    )
+    
+    # Processing runs in the background job workers
+    queue_document_processing(document)
+    
+    return Response({
+        'message': 'Document uploaded successfully',
+        'document': DocumentSerializer(document, context={'request': request}).data
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@throttle_classes([PlanRateThrottle, UploadRateThrottle])
+@parser_classes([MultiPartParser, FormParser])
+def bulk_upload(request):
+    """Upload many files (repeated `files` parts or one ZIP `archive`) as a batch"""
+    serializer = DocumentBatchUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    uploaded_files = request.FILES.getlist('files')
+    archive = request.FILES.get('archive')
+    if not uploaded_files and archive is None:
+        return Response({
+            'error': 'No files uploaded'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        files, rejected = collect_files(uploaded_files, archive)
+    except BatchRejected as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not files:
+        return Response({
+            'error': 'No valid files in the upload',
+            'rejected_files': rejected
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # The whole batch is reserved against the plan, then settled to the documents created
+    user = request.user
+    try:
+        reservation = metering.reserve(user, metering.DOCUMENTS, len(files))
+    except metering.QuotaExceeded as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    created = 0
+    try:
+        batch = DocumentBatch.objects.create(
+            user=user,
+            name=serializer.validated_data.get('name', ''),
+            max_parallel=serializer.validated_data.get('max_parallel', settings.BULK_UPLOAD_MAX_PARALLEL),
+            rejected_files=rejected
+        )
+        created = store_batch_files(batch, files, serializer.validated_data['document_type'])
+    finally:
+        metering.settle(reservation, created)
+    
+    # Processing runs in the background job workers, max_parallel documents at a time
+    start_batch_processing(batch)
+    
+    return Response({
+        'message': f'{created} documents uploaded',
+        'batch': DocumentBatchSerializer(batch).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_status(request, batch_id):
+    """Aggregate progress and per-file state of a bulk upload"""
+    batch = DocumentBatch.objects.filter(id=batch_id, user=request.user).first()
+    if batch is None:
+        return Response({
+            'error': 'Batch not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(DocumentBatchSerializer(batch).data, status=status.HTTP_200_OK)
 
 
 class DocumentListView(generics.ListAPIView):
@@ -132,9 +344,13 @@ class DocumentListView(generics.ListAPIView):
     
     serializer_class = DocumentListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        return Document.objects.filter(user=self.request.user)
+        # Only the listed columns are selected
+        return Document.objects.filter(
+            user=self.request.user
+        ).exclude(status='PENDING_UPLOAD').only(*DocumentListSerializer.Meta.fields)
 
 
 class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -144,7 +360,122 @@ class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Document.objects.filter(user=self.request.user)
+        # The summary is shown, the full extracted text is not
+        return Document.objects.filter(user=self.request.user).select_related(
+            'content'
+        ).defer('content__extracted_text_data')
+    
+    def perform_update(self, serializer):
+        document = serializer.save()
+        if document.status == 'PROCESSED':
+            # Title is part of the search index
+            index_document(document)
+    
+    def perform_destroy(self, instance):
+        remove_document(instance.id)
+        invalidate_document(instance)
+        instance.delete()
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search_documents_view(request):
+    """Full-text search over the user's documents, ranked, with highlighted snippets"""
+    query = request.query_params.get('q', '').strip()
+    terms = query_terms(query)
+    if not terms:
+        return Response({
+            'error': 'Search query is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+        page_size = min(max(1, int(request.query_params.get('page_size', 20))), 50)
+    except ValueError:
+        return Response({
+            'error': 'Invalid page'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # One extra hit tells whether there is a next page
+    hits = search_documents(request.user, query, page_size + 1, (page - 1) * page_size)
+    has_next = len(hits) > page_size
+    hits = hits[:page_size]
+    
+    documents = Document.objects.filter(user=request.user).select_related('content').in_bulk(
+        [document_id for document_id, _ in hits]
+    )
+    results = []
+    for document_id, rank in hits:
+        document = documents.get(document_id)
+        if document is None:
+            continue
+        document.search_rank = rank
+        document.search_highlights = {
+            'title': highlight(document.title, terms),
+            'summary': highlight(document.summary, terms),
+            'extracted_text': highlight(document.extracted_text, terms),
+        }
+        results.append(document)
+    
+    next_url = None
+    if has_next:
+        next_url = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+    
+    return Response({
+        'query': query,
+        'next': next_url,
+        'results': DocumentSearchResultSerializer(results, many=True).data
+    }, status=status.HTTP_200_OK)
+
+
+async def document_events(request):
+    """
+    Server-Sent Events with processing logs and status changes of the user's documents.
+
+    EventSource cannot send headers, so the access token may also be passed
+    as ?token=. Served only under ASGI; a WSGI worker would be held for the
+    whole stream. With ?document=<id> the stream follows that one document
+    and ends once it is processed or has failed.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'error': 'Event stream requires the ASGI server (uvicorn core.asgi:application)'
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    user = await run_db(authenticate_jwt, request, allow_query_token=True)
+    if user is None:
+        return JsonResponse({
+            'error': 'Authentication credentials were not provided or are invalid'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    document_id = request.GET.get('document')
+    if document_id:
+        try:
+            document_id = uuid.UUID(document_id)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid document id'}, status=status.HTTP_400_BAD_REQUEST)
+        owned = await run_db(Document.objects.filter(id=document_id, user=user).exists)
+        if not owned:
+            return JsonResponse({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        document_id = None
+
+    response = StreamingHttpResponse(
+        stream_events(user.id, last_event_id, document_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx would otherwise buffer the stream
+    return response
 
 
 class DocumentShareView(generics.CreateAPIView):
@@ -162,13 +493,22 @@ class SharedDocumentsView(generics.ListAPIView):
     
     serializer_class = DocumentListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         shared_docs = DocumentShare.objects.filter(
             shared_with=self.request.user
-        ).values_list('document_id', flat=True)
+        ).values('document_id')
         
-        return Document.objects.filter(id__in=shared_docs)
+        return Document.objects.filter(id__in=shared_docs).only(*DocumentListSerializer.Meta.fields)
+
+
+REPROCESSABLE_STATUSES = ('PROCESSED', 'ERROR')
+NOT_REPROCESSABLE_ERRORS = {
+    'PENDING_UPLOAD': 'Document upload has not been confirmed',
+    'UPLOADED': 'Document is waiting to be processed',
+    'PROCESSING': 'Document is already being processed',
+}
 
 
 @api_view(['POST'])
@@ -182,9 +522,10 @@ def reprocess_document(request, document_id):
             'error': 'Document not found'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    if document.status == 'PROCESSING':
+    # Only finished documents; unconfirmed uploads must go through confirm_upload's checks and quota
+    if document.status not in REPROCESSABLE_STATUSES:
         return Response({
-            'error': 'Document is already being processed'
+            'error': NOT_REPROCESSABLE_ERRORS[document.status]
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # Check AI tokens limit
@@ -195,8 +536,7 @@ def reprocess_document(request, document_id):
         }, status=status.HTTP_403_FORBIDDEN)
     
     # Start reprocessing
-    upload_view = DocumentUploadView()
-    upload_view.start_document_processing(document)
+    queue_document_processing(document)
     
     return Response({
         'message': 'Document reprocessing started'
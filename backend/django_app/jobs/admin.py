@@ -0,0 +1,20 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'queue', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'queue', 'task', 'created_at']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'completed_at', 'locked_by', 'locked_until']
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        """Send dead-lettered jobs back to the queue"""
+        from django.utils import timezone
+        updated = queryset.filter(status='DEAD').update(
+            status='QUEUED', attempts=0, run_after=timezone.now(), last_error=''
+        )
+        self.message_user(request, f"{updated} jobs requeued")
+    requeue.short_description = 'Requeue dead-lettered jobs'
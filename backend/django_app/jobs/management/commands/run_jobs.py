@@ -0,0 +1,74 @@
+import logging
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.queue import claim_next_job, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOBS_WORKERS, help='Worker threads')
+        parser.add_argument('--queues', default='default', help='Comma separated queues to consume')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='Seconds to sleep when no job is available')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queues are empty')
+
+    def handle(self, *args, **options):
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write('Stopping workers after their current job...')
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        threads = []
+        for number in range(options['workers']):
+            worker_id = f"{socket.gethostname()}:{os.getpid()}:{number}"
+            thread = threading.Thread(
+                target=self.work,
+                args=(worker_id, queues, options['poll_interval'], options['burst'], stop),
+                name=f"job-worker-{number}",
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        self.stdout.write(f"Started {len(threads)} workers on queues: {', '.join(queues)}")
+
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+    def work(self, worker_id, queues, poll_interval, burst, stop):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    job = claim_next_job(worker_id, queues)
+                except Exception as e:
+                    logger.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+                    stop.wait(poll_interval)
+                    continue
+
+                if job is None:
+                    if burst:
+                        break
+                    stop.wait(poll_interval)
+                    continue
+
+                run_job(job, worker_id)
+        finally:
+            connection.close()
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:16
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('task', models.CharField(help_text='Registered task name', max_length=100)),
+                ('payload', models.JSONField(default=dict, help_text='Keyword arguments for the task')),
+                ('queue', models.CharField(default='default', max_length=50)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('DEAD', 'Dead Letter')], default='QUEUED', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Job is not picked up before this time')),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Job becomes visible again after this time', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'jobs',
+                'ordering': ['run_after', 'created_at'],
+                'indexes': [models.Index(fields=['queue', 'status', 'run_after'], name='jobs_dequeue_idx'), models.Index(fields=['status', 'locked_until'], name='jobs_visibility_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+import uuid
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Background job stored in the database and executed by `manage.py run_jobs`"""
+
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('DEAD', 'Dead Letter'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.CharField(max_length=100, help_text='Registered task name')
+    payload = models.JSONField(default=dict, help_text='Keyword arguments for the task')
+    queue = models.CharField(max_length=50, default='default')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+
+    # Retry and visibility timeout bookkeeping
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text='Job is not picked up before this time')
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text='Job becomes visible again after this time')
+    last_error = models.TextField(blank=True)
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['run_after', 'created_at']
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_after'], name='jobs_dequeue_idx'),
+            models.Index(fields=['status', 'locked_until'], name='jobs_visibility_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
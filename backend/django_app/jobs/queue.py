@@ -0,0 +1,223 @@
+"""
+Database-backed job queue.
+
+Tasks are registered with the @task decorator in an app's tasks.py and
+queued with enqueue(). Workers started by `manage.py run_jobs` claim jobs
+with claim_next_job(): on PostgreSQL through SELECT ... FOR UPDATE SKIP
+LOCKED, elsewhere (SQLite) through a compare-and-set UPDATE. A claimed
+job is invisible to other workers until its visibility timeout passes, so
+jobs held by a crashed worker are picked up again, until they run out of
+attempts: those are moved to the dead letter by dead_letter_expired_jobs().
+"""
+import logging
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TaskSpec:
+    name: str
+    func: Callable
+    max_attempts: int
+    visibility_timeout: int
+    on_dead_letter: Optional[Callable] = None
+
+
+_registry: Dict[str, TaskSpec] = {}
+
+
+def task(name, max_attempts=3, visibility_timeout=None, on_dead_letter=None):
+    """
+    Register a function as a background task.
+
+    on_dead_letter(payload, error) is called once the job exhausts its attempts.
+    """
+    def decorator(func):
+        _registry[name] = TaskSpec(
+            name=name,
+            func=func,
+            max_attempts=max_attempts,
+            visibility_timeout=visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT,
+            on_dead_letter=on_dead_letter,
+        )
+        return func
+    return decorator
+
+
+def get_task(name):
+    """Look up a registered task"""
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Unknown task: {name}")
+
+
+def enqueue(name, queue='default', delay=None, **payload):
+    """Queue a registered task with keyword arguments"""
+    spec = get_task(name)
+    run_after = timezone.now() + timedelta(seconds=delay) if delay else timezone.now()
+    return Job.objects.create(
+        task=name,
+        payload=payload,
+        queue=queue,
+        max_attempts=spec.max_attempts,
+        run_after=run_after,
+    )
+
+
+def _available_jobs(queues: Iterable[str], now):
+    """Jobs that are due, plus running jobs whose visibility timeout expired with attempts left"""
+    return Job.objects.filter(
+        Q(status='QUEUED', run_after__lte=now)
+        | Q(status='RUNNING', locked_until__lt=now, attempts__lt=F('max_attempts')),
+        queue__in=list(queues),
+    ).order_by('run_after', 'created_at')
+
+
+def dead_letter_expired_jobs(queues=('default',), now=None):
+    """
+    Move running jobs whose visibility timeout expired on their last attempt to the dead letter.
+
+    Their worker died or hung, so run_job never recorded the failure.
+    Returns the number of jobs moved.
+    """
+    now = now or timezone.now()
+    expired = Job.objects.filter(
+        status='RUNNING',
+        locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+        queue__in=list(queues),
+    )
+    moved = 0
+    for job in expired:
+        error = f'Visibility timeout expired on attempt {job.attempts} (worker {job.locked_by} died or hung)'
+        updated = Job.objects.filter(
+            pk=job.pk, status='RUNNING', locked_by=job.locked_by, attempts=job.attempts
+        ).update(
+            status='DEAD',
+            locked_by='',
+            locked_until=None,
+            last_error=error,
+            updated_at=now,
+        )
+        if updated:
+            moved += 1
+            _dead_letter(job, error)
+    return moved
+
+
+def claim_next_job(worker_id, queues=('default',)):
+    """Atomically claim the next available job, or return None"""
+    now = timezone.now()
+    dead_letter_expired_jobs(queues, now)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = _available_jobs(queues, now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status = 'RUNNING'
+            job.attempts += 1
+            job.locked_by = worker_id
+            job.locked_until = now + timedelta(seconds=_visibility_timeout(job))
+            job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_until', 'updated_at'])
+            return job
+
+    # SQLite fallback: only one writer wins the conditional UPDATE for a given row state
+    candidates = _available_jobs(queues, now).only('id', 'task', 'status', 'attempts')[:5]
+    for candidate in candidates:
+        locked_until = now + timedelta(seconds=_visibility_timeout(candidate))
+        claimed = Job.objects.filter(
+            pk=candidate.pk,
+            status=candidate.status,
+            attempts=candidate.attempts,
+        ).update(
+            status='RUNNING',
+            attempts=F('attempts') + 1,
+            locked_by=worker_id,
+            locked_until=locked_until,
+            updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate.pk)
+    return None
+
+
+def run_job(job, worker_id):
+    """Execute a claimed job and record the outcome"""
+    try:
+        spec = get_task(job.task)
+        spec.func(**job.payload)
+    except Exception as e:
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        logger.error(f"Job {job.id} ({job.task}) failed on attempt {job.attempts}: {error}")
+        _record_failure(job, worker_id, error, traceback.format_exc())
+        return False
+
+    _owned(job, worker_id).update(
+        status='COMPLETED',
+        locked_by='',
+        locked_until=None,
+        completed_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def _record_failure(job, worker_id, error, details):
+    if job.attempts >= job.max_attempts:
+        updated = _owned(job, worker_id).update(
+            status='DEAD',
+            locked_by='',
+            locked_until=None,
+            last_error=details,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            _dead_letter(job, error)
+        return
+
+    _owned(job, worker_id).update(
+        status='QUEUED',
+        locked_by='',
+        locked_until=None,
+        run_after=timezone.now() + timedelta(seconds=retry_backoff(job.attempts)),
+        last_error=details,
+        updated_at=timezone.now(),
+    )
+
+
+def _dead_letter(job, error):
+    logger.error(f"Job {job.id} ({job.task}) moved to dead letter after {job.attempts} attempts")
+    spec = _registry.get(job.task)
+    if spec and spec.on_dead_letter:
+        try:
+            spec.on_dead_letter(job.payload, error)
+        except Exception as e:
+            logger.error(f"Dead letter handler for {job.task} failed: {str(e)}")
+
+
+def retry_backoff(attempts):
+    """Exponential backoff in seconds before the next attempt"""
+    return settings.JOBS_RETRY_BACKOFF * (2 ** (attempts - 1))
+
+
+def _owned(job, worker_id):
+    # A worker that overran its visibility timeout must not overwrite the new owner's state
+    return Job.objects.filter(pk=job.pk, status='RUNNING', locked_by=worker_id, attempts=job.attempts)
+
+
+def _visibility_timeout(job):
+    spec = _registry.get(job.task)
+    return spec.visibility_timeout if spec else settings.JOBS_VISIBILITY_TIMEOUT
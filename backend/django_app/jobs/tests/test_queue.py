@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+pytestmark = pytest.mark.django_db
+
+dead_letters = []
+
+
+@queue.task('tests.noop', max_attempts=2, on_dead_letter=lambda payload, error: dead_letters.append((payload, error)))
+def noop(**payload):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def clear_dead_letters():
+    dead_letters.clear()
+
+
+def expired_running_job(attempts):
+    """A job whose worker died while running it"""
+    return Job.objects.create(
+        task='tests.noop',
+        payload={'document_id': 'abc'},
+        status='RUNNING',
+        attempts=attempts,
+        max_attempts=2,
+        locked_by='host:1:0',
+        locked_until=timezone.now() - timedelta(seconds=1),
+    )
+
+
+def test_expired_job_with_attempts_left_is_claimed_again():
+    job = expired_running_job(attempts=1)
+
+    claimed = queue.claim_next_job('host:2:0')
+
+    assert claimed.pk == job.pk
+    assert claimed.attempts == 2
+    assert claimed.locked_by == 'host:2:0'
+    assert dead_letters == []
+
+
+def test_expired_job_on_last_attempt_is_dead_lettered():
+    job = expired_running_job(attempts=2)
+
+    assert queue.claim_next_job('host:2:0') is None
+
+    job.refresh_from_db()
+    assert job.status == 'DEAD'
+    assert job.attempts == 2
+    assert job.locked_until is None
+    assert 'host:1:0' in job.last_error
+    assert len(dead_letters) == 1
+    assert dead_letters[0][0] == {'document_id': 'abc'}
+
+
+def test_dead_letter_sweep_runs_handler_once():
+    expired_running_job(attempts=2)
+
+    assert queue.dead_letter_expired_jobs() == 1
+    assert queue.dead_letter_expired_jobs() == 0
+    assert len(dead_letters) == 1
+
+
+def test_running_job_within_visibility_timeout_is_left_alone():
+    job = expired_running_job(attempts=2)
+    Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() + timedelta(minutes=5))
+
+    assert queue.claim_next_job('host:2:0') is None
+    assert queue.dead_letter_expired_jobs() == 0
+    job.refresh_from_db()
+    assert job.status == 'RUNNING'
@@ -1,13 +1,26 @@
 from django.contrib import admin
-from .models import User, UserPlanHistory
+from .models import User, UserPlanHistory, UsageRecord, UsageRollup
+
+
+class UsageRecordInline(admin.TabularInline):
+    # Usage is only changed through users.metering
+    model = UsageRecord
+    fields = ['period', 'metric', 'plan', 'amount', 'updated_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ['email', 'username', 'plan', 'documents_uploaded_this_month', 'ai_tokens_used_this_month', 'is_active']
+    list_display = ['email', 'username', 'plan', 'is_active']
     list_filter = ['plan', 'is_active', 'created_at']
     search_fields = ['email', 'username']
     readonly_fields = ['created_at', 'updated_at']
+    inlines = [UsageRecordInline]
 
 
 @admin.register(UserPlanHistory)
@@ -15,3 +28,19 @@ class UserPlanHistoryAdmin(admin.ModelAdmin):
     list_display = ['user', 'old_plan', 'new_plan', 'changed_at', 'reason']
     list_filter = ['old_plan', 'new_plan', 'changed_at']
     search_fields = ['user__email', 'reason']
+
+
+@admin.register(UsageRecord)
+class UsageRecordAdmin(admin.ModelAdmin):
+    list_display = ['user', 'period', 'metric', 'plan', 'amount', 'updated_at']
+    list_filter = ['period', 'metric', 'plan']
+    search_fields = ['user__email']
+    list_select_related = ['user']
+    readonly_fields = ['user', 'period', 'metric', 'plan', 'amount', 'updated_at']
+
+
+@admin.register(UsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'metric', 'plan', 'users', 'total', 'computed_at']
+    list_filter = ['period', 'metric', 'plan']
+    readonly_fields = ['period', 'metric', 'plan', 'users', 'total', 'computed_at']
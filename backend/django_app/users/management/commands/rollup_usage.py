@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from users.metering import current_period
+from users.models import UsageRecord, UsageRollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Total the usage ledger per month, metric and plan into UsageRollup. '
+        'Defaults to the current and previous month; meant to run from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', action='append', default=[], help='Month to roll up (YYYY-MM), repeatable')
+        parser.add_argument('--all', action='store_true', help='Roll up every month in the ledger')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            periods = list(UsageRecord.objects.order_by('period').values_list('period', flat=True).distinct())
+        elif options['period']:
+            periods = [self.parse_period(value) for value in options['period']]
+        else:
+            this_month = current_period()
+            last_month = date(this_month.year - (this_month.month == 1), (this_month.month - 2) % 12 + 1, 1)
+            periods = [last_month, this_month]
+
+        for period in periods:
+            totals = (
+                UsageRecord.objects.filter(period=period)
+                .values('metric', 'plan')
+                .annotate(users=Count('user', distinct=True), total=Sum('amount'))
+                .order_by()
+            )
+            with transaction.atomic():
+                # Rows of metrics or plans no longer present are dropped with the rest
+                UsageRollup.objects.filter(period=period).delete()
+                UsageRollup.objects.bulk_create([UsageRollup(period=period, **row) for row in totals])
+            self.stdout.write(f'{period:%Y-%m}: {len(totals)} rollups')
+
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {len(periods)} months'))
+
+    def parse_period(self, value):
+        try:
+            year, month = (int(part) for part in value.split('-'))
+            return date(year, month, 1)
+        except ValueError:
+            raise CommandError(f'Invalid period {value!r}, expected YYYY-MM')
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from users import metering
+from users.models import UsageRecord, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Send many parallel reservations against one FREE user and check that no usage is lost and '
+        'the document limit holds. The user has no usage rows for this month yet, so the senders also '
+        'race on creating them. --legacy runs read-modify-write updates of the same rows for comparison.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Parallel senders')
+        parser.add_argument('--requests', type=int, default=50, help='Messages per sender')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--legacy', action='store_true', help='Also run read-modify-write updates')
+
+    def handle(self, *args, **options):
+        failures = self.run('metering', self.metered_send, options)
+        if options['legacy']:
+            self.run('legacy', self.legacy_send, options)
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('No usage lost and limits held'))
+
+    def run(self, label, send, options):
+        suffix = uuid.uuid4().hex[:12]
+        user = User.objects.create(
+            email=f'metering-stress-{suffix}@jurchat.local', username=f'metering-stress-{suffix}', plan='FREE'
+        )
+        # Last month's usage must be left alone
+        last_period = (metering.current_period() - timedelta(days=1)).replace(day=1)
+        for quota, amount in ((metering.DOCUMENTS, 7), (metering.AI_TOKENS, 9000)):
+            UsageRecord.objects.create(user=user, period=last_period, metric=quota.metric, plan='FREE', amount=amount)
+
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        results = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+
+        def sender(number):
+            rng = random.Random(seed + number)
+            try:
+                sender_user = User.objects.get(pk=user.pk)
+                barrier.wait()
+                for _ in range(options['requests']):
+                    outcome = send(sender_user, rng)
+                    with lock:
+                        results.append(outcome)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=sender, args=(number,)) for number in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        usage = {
+            (record.period, record.metric): record.amount
+            for record in UsageRecord.objects.filter(user=user)
+        }
+        User.objects.filter(pk=user.pk).delete()
+        period = metering.current_period()
+        recorded_tokens = usage.get((period, metering.AI_TOKENS.metric), 0)
+        recorded_documents = usage.get((period, metering.DOCUMENTS.metric), 0)
+
+        limits = settings.PLAN_LIMITS['FREE']
+        tokens = sum(outcome['tokens'] for outcome in results)
+        documents = sum(outcome['documents'] for outcome in results)
+        self.stdout.write(
+            f'{label}: {len(results)} messages from {options["threads"]} threads in {elapsed:.2f}s (seed {seed})\n'
+            f'  tokens    recorded {recorded_tokens:6}, granted {tokens:6}, '
+            f'rejected {sum(outcome["rejected_tokens"] for outcome in results)}\n'
+            f'  documents recorded {recorded_documents:6}, granted {documents:6}, '
+            f'limit {limits["documents_per_month"]}'
+        )
+
+        failures = []
+        if recorded_tokens != tokens:
+            failures.append(f'{label}: {tokens - recorded_tokens} tokens lost')
+        if recorded_documents != documents:
+            failures.append(f'{label}: {documents - recorded_documents} documents lost')
+        if (usage.get((last_period, metering.DOCUMENTS.metric)), usage.get((last_period, metering.AI_TOKENS.metric))) != (7, 9000):
+            failures.append(f'{label}: last month\'s usage changed')
+        if documents > limits['documents_per_month']:
+            failures.append(f'{label}: {documents} documents granted over a limit of {limits["documents_per_month"]}')
+        for failure in failures:
+            self.stdout.write(self.style.WARNING(f'  {failure}'))
+        return failures
+
+    def metered_send(self, user, rng):
+        """One chat message and one upload through users.metering"""
+        outcome = {'tokens': 0, 'rejected_tokens': 0, 'documents': 0}
+
+        estimate = rng.randint(20, 60)
+        try:
+            reservation = metering.reserve(user, metering.AI_TOKENS, estimate)
+        except metering.QuotaExceeded:
+            outcome['rejected_tokens'] = 1
+        else:
+            if rng.random() < 0.2:
+                # AI service error: nothing was used
+                metering.release(reservation)
+            else:
+                used = rng.randint(estimate // 2, estimate * 2)
+                metering.settle(reservation, used)
+                outcome['tokens'] = used
+
+        try:
+            metering.reserve(user, metering.DOCUMENTS, 1)
+        except metering.QuotaExceeded:
+            pass
+        else:
+            outcome['documents'] = 1
+        return outcome
+
+    def legacy_send(self, user, rng):
+        """The same by reading the usage rows, checking, then saving them"""
+        outcome = {'tokens': 0, 'rejected_tokens': 0, 'documents': 0}
+        limits = settings.PLAN_LIMITS['FREE']
+        period = metering.current_period()
+
+        tokens, _ = UsageRecord.objects.get_or_create(
+            user=user, period=period, metric=metering.AI_TOKENS.metric, defaults={'plan': user.plan}
+        )
+        estimate = rng.randint(20, 60)
+        if tokens.amount + estimate > limits['ai_tokens_per_month']:
+            outcome['rejected_tokens'] = 1
+        elif rng.random() >= 0.2:
+            used = rng.randint(estimate // 2, estimate * 2)
+            tokens.amount += used
+            tokens.save()
+            outcome['tokens'] = used
+
+        documents, _ = UsageRecord.objects.get_or_create(
+            user=user, period=period, metric=metering.DOCUMENTS.metric, defaults={'plan': user.plan}
+        )
+        if documents.amount + 1 <= limits['documents_per_month']:
+            documents.amount += 1
+            documents.save()
+            outcome['documents'] = 1
+        return outcome
@@ -0,0 +1,138 @@
+"""
+Monthly plan usage: documents uploaded and AI tokens.
+
+Usage is kept in UsageRecord, one row per user, calendar month (in
+TIME_ZONE) and metric, so past months stay available for reports and
+UsageRollup can total them without touching documents or messages.
+A new month simply starts new rows; nothing is ever reset.
+
+Rows are only changed here, by single UPDATE statements with F()
+expressions, so concurrent requests never overwrite each other's
+increments. reserve() is check-and-increment in one statement: the row
+is updated only while it stays within the plan limit, so parallel
+callers cannot all pass a check made against the same old value. What
+was reserved is then adjusted to what was actually used with settle(),
+or given back with release(). charge() records usage that already
+happened (a document's summary tokens) without a limit.
+
+Read-only checks are a single lookup on the (user, period, metric)
+unique index.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import UsageRecord
+
+
+class Quota(NamedTuple):
+    metric: str
+    limit_key: str
+    error: str
+
+
+DOCUMENTS = Quota('DOCUMENTS', 'documents_per_month', 'Document upload limit reached for your plan')
+AI_TOKENS = Quota('AI_TOKENS', 'ai_tokens_per_month', 'AI token limit reached for your plan')
+
+
+class QuotaExceeded(Exception):
+    """The plan's monthly limit does not allow the reservation"""
+
+
+@dataclass
+class Reservation:
+    user_id: int
+    quota: Quota
+    amount: int
+    period: date
+
+
+def current_period():
+    """First day of the current month"""
+    return timezone.localdate().replace(day=1)
+
+
+def plan_limit(user, quota):
+    """Monthly limit of the user's plan, -1 when unlimited"""
+    return settings.PLAN_LIMITS[user.plan][quota.limit_key]
+
+
+def _records(user_id, quota, period):
+    return UsageRecord.objects.filter(user_id=user_id, period=period, metric=quota.metric)
+
+
+def _records_of_period(user_id, period):
+    return UsageRecord.objects.filter(user_id=user_id, period=period)
+
+
+def current_usage(user, quota):
+    return _records(user.pk, quota, current_period()).values_list('amount', flat=True).first() or 0
+
+
+def current_usage_by_metric(user):
+    """Current month's usage of every metric, in one query"""
+    return dict(_records_of_period(user.pk, current_period()).values_list('metric', 'amount'))
+
+
+def has_quota(user, quota, amount=1):
+    """Read-only check; use reserve() when the check must hold until the usage is recorded"""
+    limit = plan_limit(user, quota)
+    return limit == -1 or current_usage(user, quota) + amount <= limit
+
+
+def _increment(records, amount):
+    return records.update(amount=F('amount') + amount, updated_at=timezone.now())
+
+
+def _open_record(user, quota, period):
+    # Concurrent first uses of a period are settled by the unique constraint
+    UsageRecord.objects.get_or_create(
+        user_id=user.pk, period=period, metric=quota.metric, defaults={'plan': user.plan}
+    )
+
+
+def reserve(user, quota, amount):
+    """Count amount against the user's limit now; raises QuotaExceeded when it does not fit"""
+    period = current_period()
+    records = _records(user.pk, quota, period)
+    limit = plan_limit(user, quota)
+    if limit != -1:
+        records = records.filter(amount__lte=limit - amount)
+    if not _increment(records, amount):
+        if _records(user.pk, quota, period).exists():
+            raise QuotaExceeded(quota.error)
+        # First use in this period
+        _open_record(user, quota, period)
+        if not _increment(records, amount):
+            raise QuotaExceeded(quota.error)
+    return Reservation(user.pk, quota, amount, period)
+
+
+def settle(reservation, used):
+    """Replace the reserved amount with what was actually used, in the period it was reserved in"""
+    delta = used - reservation.amount
+    if delta:
+        _records(reservation.user_id, reservation.quota, reservation.period).update(
+            amount=Greatest(F('amount') + delta, 0), updated_at=timezone.now()
+        )
+
+
+def release(reservation):
+    """Give back a reservation that was not used"""
+    settle(reservation, 0)
+
+
+def charge(user, quota, amount):
+    """Record usage that already happened, whatever the limit"""
+    if not amount:
+        return
+    period = current_period()
+    records = _records(user.pk, quota, period)
+    if not _increment(records, amount):
+        _open_record(user, quota, period)
+        _increment(records, amount)
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+METRIC_FIELDS = {
+    'DOCUMENTS': 'documents_uploaded_this_month',
+    'AI_TOKENS': 'ai_tokens_used_this_month',
+}
+
+
+def move_counters_to_ledger(apps, schema_editor):
+    """Counters belong to the month of plan_started_at, which the old reset kept current"""
+    User = apps.get_model('users', 'User')
+    UsageRecord = apps.get_model('users', 'UsageRecord')
+    records = []
+    for user in User.objects.iterator():
+        period = timezone.localtime(user.plan_started_at).date().replace(day=1)
+        for metric, field in METRIC_FIELDS.items():
+            if getattr(user, field):
+                records.append(UsageRecord(
+                    user_id=user.id, period=period, metric=metric, plan=user.plan, amount=getattr(user, field)
+                ))
+    UsageRecord.objects.bulk_create(records, batch_size=1000)
+
+
+def move_ledger_to_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UsageRecord = apps.get_model('users', 'UsageRecord')
+    period = timezone.localdate().replace(day=1)
+    for user in User.objects.iterator():
+        usage = dict(UsageRecord.objects.filter(user_id=user.id, period=period).values_list('metric', 'amount'))
+        for metric, field in METRIC_FIELDS.items():
+            setattr(user, field, usage.get(metric, 0))
+        user.plan_started_at = max(user.plan_started_at, timezone.now().replace(day=1))
+        user.save(update_fields=['plan_started_at', *METRIC_FIELDS.values()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('metric', models.CharField(choices=[('DOCUMENTS', 'Documents uploaded'), ('AI_TOKENS', 'AI tokens')], max_length=20)),
+                ('plan', models.CharField(choices=[('FREE', 'Free'), ('PREMIUM', 'Premium')], help_text='Plan when the period started', max_length=10)),
+                ('amount', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'usage_records',
+                'ordering': ['-period', 'metric'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('metric', models.CharField(choices=[('DOCUMENTS', 'Documents uploaded'), ('AI_TOKENS', 'AI tokens')], max_length=20)),
+                ('plan', models.CharField(choices=[('FREE', 'Free'), ('PREMIUM', 'Premium')], max_length=10)),
+                ('users', models.IntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'usage_rollups',
+                'ordering': ['-period', 'metric', 'plan'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usagerollup',
+            constraint=models.UniqueConstraint(fields=('period', 'metric', 'plan'), name='usage_rollup_unique'),
+        ),
+        migrations.AddField(
+            model_name='usagerecord',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_records', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='usagerecord',
+            index=models.Index(fields=['period', 'metric', 'plan'], name='usage_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usagerecord',
+            constraint=models.UniqueConstraint(fields=('user', 'period', 'metric'), name='usage_record_unique'),
+        ),
+        migrations.RunPython(move_counters_to_ledger, move_ledger_to_counters),
+        migrations.RemoveField(
+            model_name='user',
+            name='ai_tokens_used_this_month',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='documents_uploaded_this_month',
+        ),
+    ]
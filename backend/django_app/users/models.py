@@ -15,8 +15,6 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     plan = models.CharField(max_length=10, choices=PLAN_CHOICES, default='FREE')
     plan_started_at = models.DateTimeField(default=timezone.now)
-    documents_uploaded_this_month = models.IntegerField(default=0)
-    ai_tokens_used_this_month = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -29,46 +27,56 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
     
-    def reset_monthly_counters_if_needed(self):
-        """Reset monthly counters if a new month has started"""
-        now = timezone.now()
-        if self.plan_started_at.month != now.month or self.plan_started_at.year != now.year:
-            self.documents_uploaded_this_month = 0
-            self.ai_tokens_used_this_month = 0
-            self.plan_started_at = now
-            self.save()
-    
-    def can_upload_document(self):
-        """Check if user can upload a new document based on plan limits"""
-        from django.conf import settings
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Authenticated requests read users from the cache (users/user_cache.py)
+        from .user_cache import invalidate_user
         
-        self.reset_monthly_counters_if_needed()
+        invalidate_user(self.pk)
+    
+    def delete(self, *args, **kwargs):
+        from .user_cache import invalidate_user
+        
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_user(user_id)
+        return result
+    
+    @property
+    def documents_uploaded_this_month(self):
+        from .metering import DOCUMENTS, current_usage
+        
+        return current_usage(self, DOCUMENTS)
+    
+    @property
+    def ai_tokens_used_this_month(self):
+        from .metering import AI_TOKENS, current_usage
+        
+        return current_usage(self, AI_TOKENS)
+    
+    def can_upload_document(self, count=1):
+        """Check if user can upload new documents based on plan limits"""
+        from .metering import DOCUMENTS, has_quota
         
-        limit = settings.PLAN_LIMITS[self.plan]['documents_per_month']
-        if limit == -1:  # Unlimited
-            return True
-        return self.documents_uploaded_this_month < limit
+        return has_quota(self, DOCUMENTS, count)
     
     def can_use_ai_tokens(self, tokens_needed):
         """Check if user can use AI tokens based on plan limits"""
-        from django.conf import settings
+        from .metering import AI_TOKENS, has_quota
         
-        self.reset_monthly_counters_if_needed()
-        
-        limit = settings.PLAN_LIMITS[self.plan]['ai_tokens_per_month']
-        if limit == -1:  # Unlimited
-            return True
-        return (self.ai_tokens_used_this_month + tokens_needed) <= limit
+        return has_quota(self, AI_TOKENS, tokens_needed)
     
     def use_ai_tokens(self, tokens_used):
         """Increment AI tokens usage"""
-        self.ai_tokens_used_this_month += tokens_used
-        self.save()
+        from .metering import AI_TOKENS, charge
+        
+        charge(self, AI_TOKENS, tokens_used)
     
-    def increment_document_count(self):
+    def increment_document_count(self, count=1):
         """Increment document upload count"""
-        self.documents_uploaded_this_month += 1
-        self.save()
+        from .metering import DOCUMENTS, charge
+        
+        charge(self, DOCUMENTS, count)
 
 
 class UserPlanHistory(models.Model):
@@ -86,3 +94,54 @@ class UserPlanHistory(models.Model):
     
     def __str__(self):
         return f"{self.user.email}: {self.old_plan} -> {self.new_plan}"
+
+
+class UsageRecord(models.Model):
+    """Usage of one metric by one user in one monthly period (see users.metering)"""
+    
+    METRIC_CHOICES = [
+        ('DOCUMENTS', 'Documents uploaded'),
+        ('AI_TOKENS', 'AI tokens'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='usage_records')
+    period = models.DateField(help_text='First day of the month')
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    plan = models.CharField(max_length=10, choices=User.PLAN_CHOICES, help_text='Plan when the period started')
+    amount = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'usage_records'
+        ordering = ['-period', 'metric']
+        constraints = [
+            # Also the index behind plan limit checks
+            models.UniqueConstraint(fields=['user', 'period', 'metric'], name='usage_record_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'metric', 'plan'], name='usage_period_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.period:%Y-%m} {self.metric}: {self.amount}"
+
+
+class UsageRollup(models.Model):
+    """Usage of all users of a plan in one monthly period, built by the rollup_usage command"""
+    
+    period = models.DateField()
+    metric = models.CharField(max_length=20, choices=UsageRecord.METRIC_CHOICES)
+    plan = models.CharField(max_length=10, choices=User.PLAN_CHOICES)
+    users = models.IntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'usage_rollups'
+        ordering = ['-period', 'metric', 'plan']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'metric', 'plan'], name='usage_rollup_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.metric} {self.plan}: {self.total}"
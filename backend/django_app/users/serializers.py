@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from .models import User
+from . import metering
+from .models import User, UsageRecord
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -54,7 +55,24 @@ class UserLoginSerializer(serializers.Serializer):
             raise serializers.ValidationError('Must include email and password')
 
 
-class UserSerializer(serializers.ModelSerializer):
+class MonthlyUsageMixin(serializers.Serializer):
+    """Reads the current month's usage once per user instead of once per field"""
+    
+    documents_uploaded_this_month = serializers.SerializerMethodField()
+    ai_tokens_used_this_month = serializers.SerializerMethodField()
+    
+    def to_representation(self, instance):
+        self._usage = metering.current_usage_by_metric(instance)
+        return super().to_representation(instance)
+    
+    def get_documents_uploaded_this_month(self, obj):
+        return self._usage.get(metering.DOCUMENTS.metric, 0)
+    
+    def get_ai_tokens_used_this_month(self, obj):
+        return self._usage.get(metering.AI_TOKENS.metric, 0)
+
+
+class UserSerializer(MonthlyUsageMixin, serializers.ModelSerializer):
     """Serializer for user profile"""
     
     class Meta:
@@ -70,7 +88,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
 
-class UserPlanSerializer(serializers.ModelSerializer):
+class UserPlanSerializer(MonthlyUsageMixin, serializers.ModelSerializer):
     """Serializer for user plan information"""
     
     can_upload_document = serializers.SerializerMethodField()
@@ -84,8 +102,18 @@ class UserPlanSerializer(serializers.ModelSerializer):
         )
     
     def get_can_upload_document(self, obj):
-        return obj.can_upload_document()
+        limit = metering.plan_limit(obj, metering.DOCUMENTS)
+        return limit == -1 or self._usage.get(metering.DOCUMENTS.metric, 0) + 1 <= limit
     
     def get_monthly_limits(self, obj):
         from django.conf import settings
         return settings.PLAN_LIMITS[obj.plan]
+
+
+class UsageRecordSerializer(serializers.ModelSerializer):
+    """Serializer for a month of usage"""
+    
+    class Meta:
+        model = UsageRecord
+        fields = ('period', 'metric', 'plan', 'amount', 'updated_at')
+        read_only_fields = fields
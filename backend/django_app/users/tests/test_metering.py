@@ -0,0 +1,105 @@
+import itertools
+import threading
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+
+from users import metering
+from users.models import UsageRecord
+
+THREADS = 16
+
+
+def race(user, send, rounds=1):
+    """Run send(user) rounds times in each of THREADS threads released at once; returns every result"""
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def sender():
+        try:
+            sender_user = type(user).objects.get(pk=user.pk)
+            barrier.wait()
+            for _ in range(rounds):
+                outcome = send(sender_user)
+                with lock:
+                    results.append(outcome)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=sender) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == THREADS * rounds, 'a sender failed'
+    return results
+
+
+def reserve_or_zero(user, quota, amount):
+    try:
+        metering.reserve(user, quota, amount)
+    except metering.QuotaExceeded:
+        return 0
+    return amount
+
+
+def usage(user, period=None):
+    period = period or metering.current_period()
+    return dict(UsageRecord.objects.filter(user=user, period=period).values_list('metric', 'amount'))
+
+
+@pytest.fixture
+def last_period(user):
+    """Last month's usage, which the races must leave alone"""
+    period = (metering.current_period() - timedelta(days=1)).replace(day=1)
+    UsageRecord.objects.create(user=user, period=period, metric='DOCUMENTS', plan='FREE', amount=7)
+    UsageRecord.objects.create(user=user, period=period, metric='AI_TOKENS', plan='FREE', amount=9000)
+    return period
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_reservations_never_exceed_the_limit(settings, user, last_period):
+    # FREE: 10 documents and 10000 tokens; the month has no usage rows yet, so senders also race on creating them
+    limits = settings.PLAN_LIMITS['FREE']
+
+    def send(sender_user):
+        return (
+            reserve_or_zero(sender_user, metering.DOCUMENTS, 1),
+            reserve_or_zero(sender_user, metering.AI_TOKENS, 1000),
+        )
+
+    results = race(user, send, rounds=2)
+
+    documents = sum(outcome[0] for outcome in results)
+    tokens = sum(outcome[1] for outcome in results)
+    assert documents == limits['documents_per_month']
+    assert tokens == limits['ai_tokens_per_month']
+    assert usage(user) == {'DOCUMENTS': documents, 'AI_TOKENS': tokens}
+    assert usage(user, last_period) == {'DOCUMENTS': 7, 'AI_TOKENS': 9000}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_settled_and_released_reservations_are_not_lost(settings, user, last_period):
+    limit = settings.PLAN_LIMITS['FREE']['ai_tokens_per_month']
+    sends = itertools.count()
+
+    def send(sender_user):
+        try:
+            reservation = metering.reserve(sender_user, metering.AI_TOKENS, 40)
+        except metering.QuotaExceeded:
+            return None
+        if next(sends) % 5 == 0:
+            # AI service error: nothing was used
+            metering.release(reservation)
+            return 0
+        metering.settle(reservation, 25)
+        return 25
+
+    results = race(user, send, rounds=30)
+
+    granted = [outcome for outcome in results if outcome is not None]
+    assert granted
+    assert usage(user)['AI_TOKENS'] == sum(granted) <= limit
+    assert usage(user, last_period) == {'DOCUMENTS': 7, 'AI_TOKENS': 9000}
@@ -0,0 +1,38 @@
+import pickle
+
+import pytest
+from django.core.cache import cache
+
+from users import user_cache
+
+
+def cached_entry(user):
+    return cache.get(user_cache.user_key(user.pk, user_cache._current_version(user.pk)))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cache_leaves_out_the_password_hash(user, django_assert_num_queries):
+    user_cache.get_user(user.pk)
+
+    entry = cached_entry(user)
+    assert 'password' not in entry
+    assert user.password.encode() not in pickle.dumps(entry)
+
+    with django_assert_num_queries(0):
+        cached = user_cache.get_user(user.pk)
+        assert (cached.pk, cached.email, cached.plan, cached.is_active) == (user.pk, user.email, 'FREE', True)
+    with django_assert_num_queries(1):
+        assert cached.check_password('s3cret-pass')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_saving_a_cached_user_keeps_the_password_and_invalidates(user):
+    user_cache.get_user(user.pk)
+    cached = user_cache.get_user(user.pk)  # rebuilt from the cache, password deferred
+    cached.plan = 'PREMIUM'
+    cached.save()
+
+    user.refresh_from_db()
+    assert user.plan == 'PREMIUM'
+    assert user.check_password('s3cret-pass')
+    assert user_cache.get_user(user.pk).plan == 'PREMIUM'
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, PlanView, upgrade_plan
+from .views import RegisterView, LoginView, ProfileView, PlanView, UsageHistoryView, upgrade_plan
 
 urlpatterns = [
     # Authentication endpoints
@@ -10,4 +10,5 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('plan/', PlanView.as_view(), name='plan'),
     path('plan/upgrade/', upgrade_plan, name='upgrade_plan'),
+    path('usage/', UsageHistoryView.as_view(), name='usage_history'),
 ]
@@ -0,0 +1,77 @@
+"""
+Cached users for authenticated requests.
+
+Every API request resolves the user of its access token. The user row is
+kept in the default cache for USER_CACHE_TTL under a key that includes
+the user's current version:
+
+- users:version:<user id>: a random token replaced whenever the user is
+  saved or deleted, kept without expiry;
+- users:user:<user id>:<version>: the user's field values at that
+  version, without the password hash. get_user() rebuilds a User from
+  them with password deferred; reading user.password loads it from the
+  database, and save() only writes the fields that were loaded.
+
+Changing the version (User.save and User.delete, once committed) makes
+every process miss and reload the row, so plan changes and deactivation
+apply to the next request. A load that raced with a save is stored under
+the old version and never read again. Usage counts are not cached: they
+live in UsageRecord and are read by users.metering.
+
+QuerySet.update() on users bypasses save(); call invalidate_user() after
+it. With the locmem cache (no REDIS_URL) each process has its own
+versions, so another process can serve the old row until USER_CACHE_TTL
+expires.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+DEFERRED_FIELDS = ('password',)
+
+
+def version_key(user_id):
+    return f'users:version:{user_id}'
+
+
+def user_key(user_id, version):
+    return f'users:user:{user_id}:{version}'
+
+
+def _current_version(user_id):
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # First use, or evicted: start a version no entry was stored under
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _cached_fields(model):
+    # Concrete fields only; the password hash never goes to the cache
+    return [field.attname for field in model._meta.concrete_fields if field.name not in DEFERRED_FIELDS]
+
+
+def get_user(user_id):
+    """User with this primary key, from the cache when current; None when there is no such user"""
+    model = get_user_model()
+    version = _current_version(user_id)
+    key = user_key(user_id, version)
+    values = cache.get(key)
+    if values is None:
+        user = model.objects.filter(pk=user_id).defer(*DEFERRED_FIELDS).first()
+        if user is None:
+            return None
+        values = {name: getattr(user, name) for name in _cached_fields(model)}
+        cache.set(key, values, settings.USER_CACHE_TTL)
+        return user
+    return model.from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+
+
+def invalidate_user(user_id):
+    """Make the next request reload the user, once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(version_key(user_id), uuid.uuid4().hex, None))
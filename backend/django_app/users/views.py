@@ -3,12 +3,13 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from .models import User
+from .models import User, UsageRecord
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
     UserSerializer,
-    UserPlanSerializer
+    UserPlanSerializer,
+    UsageRecordSerializer
 )
 
 
@@ -77,9 +78,17 @@ class PlanView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        user = self.request.user
-        user.reset_monthly_counters_if_needed()
-        return user
+        return self.request.user
+
+
+class UsageHistoryView(generics.ListAPIView):
+    """Monthly usage of the user, newest month first"""
+    
+    serializer_class = UsageRecordSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return UsageRecord.objects.filter(user=self.request.user).order_by('-period', 'metric')
 
 
 @api_view(['POST'])
@@ -96,7 +105,7 @@ def upgrade_plan(request):
     # In a real app, you would integrate with payment processor here
     old_plan = user.plan
     user.plan = 'PREMIUM'
-    user.save()
+    user.save(update_fields=['plan', 'updated_at'])
     
     # Create plan history record
     from .models import UserPlanHistory
@@ -0,0 +1,228 @@
+"""
+Startup benchmark for the AI service.
+
+Reports the `python -X importtime` breakdown of `import main`, then spawns
+uvicorn and times two things: until --path (a cheap endpoint) first answers,
+and until the first /ai/summarize of a small document completes. The
+summarize request goes through the lazily loaded parser backend and OpenAI
+client, against a local stub of the OpenAI API, so it includes the import
+cost deferred from startup. Pass the --max-* thresholds in CI to fail when
+cold start regresses.
+
+Usage:
+    python bench_startup.py --runs 5 --max-import-ms 1500 --max-first-request-ms 3000
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DOCUMENT_TEXT = "Cláusula primeira. O contratante pagará multa de 10% em caso de atraso.\n" * 20
+
+CONTENT_TYPES = {
+    "txt": "text/plain",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def measure_import(top: int):
+    """Run `import main` under -X importtime and aggregate by top-level package"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "WARMUP_ON_STARTUP": "False"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr}")
+
+    packages = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:]
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        # Lines without extra indentation are imported directly by `import main`
+        if not name.startswith(" "):
+            total_us += int(cumulative_us)
+
+    breakdown = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total_us / 1000, [(package, us / 1000) for package, us in breakdown]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions immediately, so only the service's own cost is timed"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "bench",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Resumo de teste."},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_openai() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_document(kind: str) -> bytes:
+    if kind == "txt":
+        return DOCUMENT_TEXT.encode("utf-8")
+    import docx
+
+    document = docx.Document()
+    for line in DOCUMENT_TEXT.splitlines():
+        document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def summarize_request(url: str, document: bytes, content_type: str) -> urllib.request.Request:
+    """multipart/form-data POST as Django sends it"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in (("document_id", "bench"), ("user_id", "1")):
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bench"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n".encode() + document + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return urllib.request.Request(
+        url,
+        data=b"".join(parts),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        method="POST"
+    )
+
+
+def measure_first_request(path: str, kind: str, stub_url: str, timeout: float):
+    """Spawn uvicorn; ms until `path` answers, and until the first summarize completes"""
+    port = free_port()
+    document = build_document(kind)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={
+            **os.environ,
+            "WARMUP_ON_STARTUP": "False",
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": stub_url,
+        }
+    )
+    try:
+        ready_ms = None
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving a request")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    response.read()
+                ready_ms = (time.perf_counter() - start) * 1000
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        if ready_ms is None:
+            raise RuntimeError(f"No response from {path} within {timeout}s")
+
+        request = summarize_request(f"http://127.0.0.1:{port}/ai/summarize", document, CONTENT_TYPES[kind])
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        return ready_ms, (time.perf_counter() - start) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure AI service cold start")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Packages to show in the import breakdown")
+    parser.add_argument("--path", default="/ai/models", help="Cheap endpoint polled until the server answers")
+    parser.add_argument("--document", choices=sorted(CONTENT_TYPES), default="docx",
+                        help="Document sent to /ai/summarize as the first real request")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-request-ms", type=float)
+    args = parser.parse_args()
+
+    import_times = []
+    breakdown = []
+    for _ in range(args.runs):
+        total_ms, breakdown = measure_import(args.top)
+        import_times.append(total_ms)
+
+    stub = start_stub_openai()
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    try:
+        timings = [measure_first_request(args.path, args.document, stub_url, args.timeout) for _ in range(args.runs)]
+    finally:
+        stub.shutdown()
+
+    import_ms = statistics.median(import_times)
+    ready_ms = statistics.median(ready for ready, _ in timings)
+    first_request_ms = statistics.median(first for _, first in timings)
+
+    print(f"import main: {import_ms:.1f} ms (median of {args.runs})")
+    print("Self import time by package (last run):")
+    for package, ms in breakdown:
+        print(f"  {package:<30} {ms:8.1f} ms")
+    print(f"time to first response ({args.path}): {ready_ms:.1f} ms (median of {args.runs})")
+    print(f"time to first summarize ({args.document}): {first_request_ms:.1f} ms (median of {args.runs})")
+
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"FAIL: import time {import_ms:.1f} ms exceeds {args.max_import_ms} ms")
+        failed = True
+    if args.max_first_request_ms is not None and first_request_ms > args.max_first_request_ms:
+        print(f"FAIL: time to first summarize {first_request_ms:.1f} ms exceeds {args.max_first_request_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,32 @@ class Settings:
         "application/pdf,application/msword,application/vnd.openxmlformats-officedocument.wordprocessingml.document,text/plain"
     ).split(",")
     
+    # Import parser backends and the AI client at startup instead of on first request
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "False").lower() == "true"
+    
+    # Deadlines (callers send X-Request-Timeout-Ms, these apply when it is missing or too large)
+    DEFAULT_REQUEST_TIMEOUT: float = float(os.getenv("DEFAULT_REQUEST_TIMEOUT", "300"))
+    MAX_REQUEST_TIMEOUT: float = float(os.getenv("MAX_REQUEST_TIMEOUT", "600"))
+    
+    # Summarization job queue
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+    JOBS_SPOOL_DIR: str = os.getenv("JOBS_SPOOL_DIR", "job_spool")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+    JOB_RESULT_TTL: int = int(os.getenv("JOB_RESULT_TTL", "3600"))  # 1 hour
+    JOB_STALE_AFTER: int = int(os.getenv("JOB_STALE_AFTER", "120"))  # seconds without heartbeat before another process takes a running job
+    
+    # Admission control (initial concurrency per endpoint stage, AIMD adapts it up to the max)
+    SUMMARIZE_PARSE_CONCURRENCY: int = int(os.getenv("SUMMARIZE_PARSE_CONCURRENCY", "4"))
+    SUMMARIZE_LLM_CONCURRENCY: int = int(os.getenv("SUMMARIZE_LLM_CONCURRENCY", "8"))
+    CHAT_LLM_CONCURRENCY: int = int(os.getenv("CHAT_LLM_CONCURRENCY", "16"))
+    ANALYZE_LLM_CONCURRENCY: int = int(os.getenv("ANALYZE_LLM_CONCURRENCY", "8"))
+    ADMISSION_MAX_CONCURRENCY_FACTOR: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY_FACTOR", "4"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    PARSE_LATENCY_TARGET: float = float(os.getenv("PARSE_LATENCY_TARGET", "5"))
+    LLM_LATENCY_TARGET: float = float(os.getenv("LLM_LATENCY_TARGET", "30"))
+    
     # CORS Configuration
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://127.0.0.1:8000"]
 
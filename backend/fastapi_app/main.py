@@ -1,12 +1,20 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+import threading
+import time
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Optional
-import uvicorn
+from functools import lru_cache
+from typing import Any, Callable, List, Dict, Optional
 import os
 from dotenv import load_dotenv
 from services.parser import DocumentParser
 from services.ai import AIService
+from services.jobs import JobManager, JobQueueFull, JOB_COMPLETED, FINISHED_STATUSES
+from services.metrics import registry, observe_stage, REQUEST_DURATION
+from services.admission import AdaptiveLimiter, AdmissionController, AdmissionRejected
+from services.deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded, RequestAborted, run_with_deadline
 from config import settings
 
 # Load environment variables
@@ -28,9 +36,149 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-document_parser = DocumentParser()
-ai_service = AIService()
+
+def build_limiter(name: str, initial_limit: int, latency_target: float) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        name=name,
+        initial_limit=initial_limit,
+        max_limit=initial_limit * settings.ADMISSION_MAX_CONCURRENCY_FACTOR,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+        latency_target=latency_target
+    )
+
+
+admission = AdmissionController({
+    "summarize.parse": build_limiter("summarize.parse", settings.SUMMARIZE_PARSE_CONCURRENCY, settings.PARSE_LATENCY_TARGET),
+    "summarize.llm": build_limiter("summarize.llm", settings.SUMMARIZE_LLM_CONCURRENCY, settings.LLM_LATENCY_TARGET),
+    "chat.llm": build_limiter("chat.llm", settings.CHAT_LLM_CONCURRENCY, settings.LLM_LATENCY_TARGET),
+    "analyze.llm": build_limiter("analyze.llm", settings.ANALYZE_LLM_CONCURRENCY, settings.LLM_LATENCY_TARGET),
+})
+
+# First limiter each endpoint hits, checked before the request body is read
+ADMISSION_ENTRYPOINTS = {
+    "/ai/summarize": "summarize.parse",
+    "/ai/chat": "chat.llm",
+    "/ai/analyze": "analyze.llm",
+}
+
+
+def admission_rejected_response(exc: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Service overloaded, retry in {exc.retry_after}s", "limiter": exc.limiter},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(AdmissionRejected)
+async def handle_admission_rejected(request: Request, exc: AdmissionRejected):
+    return admission_rejected_response(exc)
+
+
+@app.exception_handler(RequestAborted)
+async def handle_request_aborted(request: Request, exc: RequestAborted):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
+@app.middleware("http")
+async def attach_deadline(request: Request, call_next):
+    """Start the deadline clock on arrival so upload time counts against it"""
+    request.state.deadline = Deadline.from_header(
+        request.headers.get(DEADLINE_HEADER),
+        default_timeout=settings.DEFAULT_REQUEST_TIMEOUT,
+        max_timeout=settings.MAX_REQUEST_TIMEOUT
+    )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def reject_when_saturated(request: Request, call_next):
+    """Shed load before uploads are buffered when the endpoint queue is already full"""
+    limiter_name = ADMISSION_ENTRYPOINTS.get(request.url.path)
+    if limiter_name and request.method == "POST":
+        try:
+            admission[limiter_name].check_capacity()
+        except AdmissionRejected as exc:
+            return admission_rejected_response(exc)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record per-endpoint latency, labelled by route template"""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint,
+            method=request.method,
+            status=status_code
+        )
+
+
+# Services are built on first use so worker boot stays cheap
+@lru_cache(maxsize=None)
+def get_document_parser() -> DocumentParser:
+    return DocumentParser()
+
+
+@lru_cache(maxsize=None)
+def get_ai_service() -> AIService:
+    return AIService()
+
+
+def warm_up():
+    """Load parser backends and the AI client ahead of the first request"""
+    get_document_parser().load_backends()
+    get_ai_service().client
+
+
+async def run_summarize_job(job: Dict[str, Any], file_content: bytes, report_progress: Callable[..., None]) -> Dict[str, Any]:
+    """Job runner used by the summarization worker pool"""
+    return await summarize_content(
+        file_content=file_content,
+        content_type=job["content_type"],
+        document_id=job["document_id"],
+        progress_callback=report_progress,
+        endpoint="job",
+        wait_for_slot=True
+    )
+
+
+# The job table is opened by start_job_manager, not on import
+job_manager = JobManager(
+    db_path=settings.JOBS_DB_PATH,
+    runner=run_summarize_job,
+    spool_dir=settings.JOBS_SPOOL_DIR,
+    workers=settings.JOB_WORKERS,
+    queue_size=settings.JOB_QUEUE_SIZE,
+    result_ttl=settings.JOB_RESULT_TTL,
+    stale_after=settings.JOB_STALE_AFTER
+)
+
+
+@app.on_event("startup")
+async def start_job_manager():
+    await job_manager.start()
+
+
+@app.on_event("startup")
+async def warm_up_services():
+    if settings.WARMUP_ON_STARTUP:
+        await run_in_threadpool(warm_up)
+
+
+@app.on_event("shutdown")
+async def stop_job_manager():
+    await job_manager.stop()
 
 
 # Pydantic models
@@ -56,10 +204,30 @@ class ChatResponse(BaseModel):
     metadata: Dict = {}
 
 
+class JobSubmittedResponse(BaseModel):
+    job_id: str
+    document_id: str
+    status: str
+    status_url: str
+    result_url: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    document_id: str
+    status: str
+    progress: Dict[str, Any] = {}
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    expires_at: Optional[float] = None
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
     services: Dict[str, str]
+    admission: Dict[str, Dict[str, Any]] = {}
 
 
 @app.get("/", response_model=HealthResponse)
@@ -70,13 +238,102 @@ async def health_check():
         version="1.0.0",
         services={
             "parser": "active",
-            "ai": "active"
-        }
+            "ai": "active",
+            "jobs": f"active ({job_manager.queue_depth()} queued)"
+        },
+        admission=admission.snapshot()
     )
 
 
+def validate_content_type(content_type: str):
+    """Reject files the parser cannot handle"""
+    if content_type not in settings.ALLOWED_FILE_TYPES:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported file type: {content_type}. Allowed types: {', '.join(settings.ALLOWED_FILE_TYPES)}"
+        )
+
+
+async def summarize_content(
+    file_content: bytes,
+    content_type: str,
+    document_id: str,
+    progress_callback: Optional[Callable[..., None]] = None,
+    endpoint: str = "/ai/summarize",
+    wait_for_slot: bool = False,
+    deadline: Optional[Deadline] = None,
+    request: Optional[Request] = None
+) -> Dict[str, Any]:
+    """
+    Extract text from file content and generate the AI summary.
+    wait_for_slot=True queues without bound instead of being rejected (job workers).
+    Work stops once the deadline passes or the client behind request disconnects.
+    """
+    deadline = deadline or Deadline()
+    abort_parse = threading.Event()
+    
+    def on_parse_progress(**values):
+        # Runs in the parser thread, stops extraction at the next page
+        if abort_parse.is_set() or deadline.expired():
+            raise DeadlineExceeded("parse")
+        if progress_callback:
+            progress_callback(**values)
+    
+    async with admission["summarize.parse"].slot(block=wait_for_slot):
+        # Parsing is CPU bound, keep it off the event loop
+        with observe_stage(endpoint, "parse"):
+            try:
+                raw_text = await run_with_deadline(
+                    run_in_threadpool(
+                        get_document_parser().extract_raw_text, file_content, content_type, on_parse_progress
+                    ),
+                    deadline,
+                    request=request,
+                    endpoint=endpoint,
+                    stage="parse",
+                    on_abort=abort_parse.set
+                )
+            except RequestAborted:
+                raise
+            except Exception:
+                deadline.check(endpoint, "parse")
+                raise
+        
+        with observe_stage(endpoint, "clean"):
+            extracted_text = get_document_parser().clean_text(raw_text)
+    
+    if not extracted_text.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Could not extract text from document"
+        )
+    
+    async with admission["summarize.llm"].slot(block=wait_for_slot):
+        with observe_stage(endpoint, "llm"):
+            summary_result = await run_with_deadline(
+                get_ai_service().generate_summary(
+                    text=extracted_text,
+                    document_type="legal",
+                    progress_callback=progress_callback
+                ),
+                deadline,
+                request=request,
+                endpoint=endpoint,
+                stage="llm"
+            )
+    
+    return {
+        "document_id": document_id,
+        "extracted_text": extracted_text,
+        "summary": summary_result["summary"],
+        "tokens_used": summary_result["tokens_used"],
+        "processing_time": summary_result["processing_time"]
+    }
+
+
 @app.post("/ai/summarize", response_model=SummarizeResponse)
 async def summarize_document(
+    request: Request,
     file: UploadFile = File(...),
     document_id: str = Form(...),
     user_id: int = Form(...)
@@ -86,55 +343,118 @@ async def summarize_document(
     """
     try:
         # Validate file type
-        if file.content_type not in settings.ALLOWED_FILE_TYPES:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file type: {file.content_type}. Allowed types: {', '.join(settings.ALLOWED_FILE_TYPES)}"
-            )
+        validate_content_type(file.content_type)
         
         # Read file content
-        file_content = await file.read()
-        
-        # Extract text from document
-        extracted_text = document_parser.extract_text(file_content, file.content_type)
+        with observe_stage("/ai/summarize", "upload_read"):
+            file_content = await file.read()
         
-        if not extracted_text.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Could not extract text from document"
-            )
-        
-        # Generate AI summary
-        summary_result = await ai_service.generate_summary(
-            text=extracted_text,
-            document_type="legal"
+        result = await summarize_content(
+            file_content,
+            file.content_type,
+            document_id,
+            deadline=request.state.deadline,
+            request=request
         )
         
-        return SummarizeResponse(
-            document_id=document_id,
-            extracted_text=extracted_text,
-            summary=summary_result["summary"],
-            tokens_used=summary_result["tokens_used"],
-            processing_time=summary_result["processing_time"]
-        )
+        with observe_stage("/ai/summarize", "serialize"):
+            body = SummarizeResponse(**result).model_dump_json()
         
+        return Response(content=body, media_type="application/json")
+        
+    except (AdmissionRejected, RequestAborted):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
 
+@app.post("/ai/jobs/summarize", response_model=JobSubmittedResponse, status_code=202)
+async def submit_summarize_job(
+    file: UploadFile = File(...),
+    document_id: str = Form(...),
+    user_id: int = Form(...)
+):
+    """
+    Queue a document for summarization and return a job id right away
+    """
+    validate_content_type(file.content_type)
+    
+    file_content = await file.read()
+    
+    try:
+        job = await job_manager.submit(file_content, file.content_type, document_id, user_id)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Summarization queue is full, try again later")
+    
+    return JobSubmittedResponse(
+        job_id=job["id"],
+        document_id=document_id,
+        status=job["status"],
+        status_url=f"/ai/jobs/{job['id']}",
+        result_url=f"/ai/jobs/{job['id']}/result"
+    )
+
+
+@app.get("/ai/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """
+    Get status and progress of a summarization job
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        document_id=job["document_id"],
+        status=job["status"],
+        progress=job["progress"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        expires_at=job["expires_at"]
+    )
+
+
+@app.get("/ai/jobs/{job_id}/result", response_model=SummarizeResponse)
+async def get_job_result(job_id: str):
+    """
+    Get the result of a completed summarization job
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    if job["status"] not in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}")
+    
+    if job["status"] != JOB_COMPLETED:
+        raise HTTPException(status_code=422, detail=f"Job failed: {job['error']}")
+    
+    return SummarizeResponse(**job["result"])
+
+
 @app.post("/ai/chat", response_model=ChatResponse)
-async def chat_with_document(request: ChatRequest):
+async def chat_with_document(request: ChatRequest, http_request: Request):
     """
     Process chat message with document context
     """
     try:
         # Generate AI response
-        chat_result = await ai_service.generate_chat_response(
-            user_message=request.message,
-            document_content=request.document_content,
-            document_summary=request.document_summary,
-            conversation_history=request.conversation_history
-        )
+        async with admission["chat.llm"].slot():
+            with observe_stage("/ai/chat", "llm"):
+                chat_result = await run_with_deadline(
+                    get_ai_service().generate_chat_response(
+                        user_message=request.message,
+                        document_content=request.document_content,
+                        document_summary=request.document_summary,
+                        conversation_history=request.conversation_history
+                    ),
+                    http_request.state.deadline,
+                    request=http_request,
+                    endpoint="/ai/chat",
+                    stage="llm"
+                )
         
         return ChatResponse(
             response=chat_result["response"],
@@ -142,12 +462,15 @@ async def chat_with_document(request: ChatRequest):
             metadata=chat_result.get("metadata", {})
         )
         
+    except (AdmissionRejected, RequestAborted):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
 @app.post("/ai/analyze")
 async def analyze_document_specific(
+    request: Request,
     document_type: str,
     analysis_type: str,
     document_content: str
@@ -156,30 +479,49 @@ async def analyze_document_specific(
     Perform specific analysis on document
     """
     try:
-        analysis_result = await ai_service.analyze_document(
-            document_content=document_content,
-            document_type=document_type,
-            analysis_type=analysis_type
-        )
+        async with admission["analyze.llm"].slot():
+            analysis_result = await run_with_deadline(
+                get_ai_service().analyze_document(
+                    document_content=document_content,
+                    document_type=document_type,
+                    analysis_type=analysis_type
+                ),
+                request.state.deadline,
+                request=request,
+                endpoint="/ai/analyze",
+                stage="llm"
+            )
         
         return analysis_result
         
+    except (AdmissionRejected, RequestAborted):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics, rendered only when scraped
+    """
+    return Response(content=registry.render(), media_type=registry.CONTENT_TYPE)
+
+
 @app.get("/ai/models")
 async def list_available_models():
     """
     List available AI models
     """
     return {
-        "models": ai_service.get_available_models(),
-        "current_model": ai_service.get_current_model()
+        "models": get_ai_service().get_available_models(),
+        "current_model": get_ai_service().get_current_model()
     }
 
 
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
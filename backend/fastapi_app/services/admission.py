@@ -0,0 +1,227 @@
+import asyncio
+import math
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from services.metrics import registry
+
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "jurchat_ai_admission_in_flight",
+    "Requests currently holding an admission slot",
+    ("limiter",)
+)
+ADMISSION_QUEUED = registry.gauge(
+    "jurchat_ai_admission_queued",
+    "Requests waiting for an admission slot",
+    ("limiter",)
+)
+ADMISSION_LIMIT = registry.gauge(
+    "jurchat_ai_admission_limit",
+    "Current adaptive concurrency limit",
+    ("limiter",)
+)
+ADMISSION_REJECTED = registry.counter(
+    "jurchat_ai_admission_rejected_total",
+    "Requests rejected by admission control",
+    ("limiter", "reason")
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to 503 with Retry-After"""
+
+    def __init__(self, limiter: str, reason: str, retry_after: int):
+        super().__init__(f"{limiter} is overloaded ({reason})")
+        self.limiter = limiter
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+OVERLOAD_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """
+    True for failures that mean the work behind a limiter is saturated:
+    timeouts (including DeadlineExceeded, a 504) and 429/5xx answers from
+    upstream. Bad input and client disconnects say nothing about capacity.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # openai is only imported once the AI client is built; before that none of its errors can occur
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(exc, openai.APIConnectionError):
+        # Includes APITimeoutError
+        return True
+    return getattr(exc, "status_code", None) in OVERLOAD_STATUS_CODES
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue.
+
+    The limit follows AIMD: each request finishing under the latency target
+    adds 1/limit (about +1 per window of requests), a request over the target
+    or failing with an overload error (is_overload_error) multiplies the limit
+    by decrease_factor, at most once per target interval. Other failures leave
+    the limit alone.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        max_limit: int,
+        min_limit: int = 1,
+        queue_size: int = 50,
+        queue_timeout: float = 10.0,
+        latency_target: float = 5.0,
+        decrease_factor: float = 0.7
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self._avg_latency = latency_target / 2
+
+        self._publish()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def is_saturated(self) -> bool:
+        """True when a new request would be rejected right away"""
+        return self.in_flight >= self.current_limit and len(self._waiters) >= self.queue_size
+
+    def check_capacity(self):
+        """Raise AdmissionRejected right away if the wait queue is already full"""
+        if self.is_saturated():
+            self._reject("queue_full")
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up"""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_latency * backlog / self.current_limit))
+
+    async def acquire(self, block: bool = False):
+        """
+        Take a slot, waiting in the queue if needed.
+        block=True waits without queue bound or timeout, for internal workers.
+        """
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            return
+
+        if not block and len(self._waiters) >= self.queue_size:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), None if block else self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up, pass it on
+                self.release(None)
+            else:
+                waiter.cancel()
+                self._remove_waiter(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+
+    def release(self, latency: float = None, overloaded: bool = False):
+        """Return a slot and feed the observed latency, or an overload failure, into the AIMD limit"""
+        self.in_flight -= 1
+        if latency is not None:
+            self._adjust(latency, overloaded)
+
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self, block: bool = False) -> AsyncIterator[None]:
+        await self.acquire(block=block)
+        start = time.monotonic()
+        latency = None
+        overloaded = False
+        try:
+            yield
+            latency = time.monotonic() - start
+        except Exception as e:
+            if is_overload_error(e):
+                latency = time.monotonic() - start
+                overloaded = True
+            raise
+        finally:
+            self.release(latency, overloaded)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+            "avg_latency": round(self._avg_latency, 3)
+        }
+
+    def _adjust(self, latency: float, overloaded: bool = False):
+        self._avg_latency = 0.8 * self._avg_latency + 0.2 * latency
+        now = time.monotonic()
+        if overloaded or latency > self.latency_target:
+            if now - self._last_decrease >= self.latency_target:
+                self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                self._last_decrease = now
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        ADMISSION_REJECTED.inc(limiter=self.name, reason=reason)
+        raise AdmissionRejected(self.name, reason, self.retry_after())
+
+    def _remove_waiter(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._publish()
+
+    def _publish(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight, limiter=self.name)
+        ADMISSION_QUEUED.set(len(self._waiters), limiter=self.name)
+        ADMISSION_LIMIT.set(self.current_limit, limiter=self.name)
+
+
+class AdmissionController:
+    """Named limiters for each endpoint stage"""
+
+    def __init__(self, limiters: Dict[str, AdaptiveLimiter]):
+        self.limiters = limiters
+
+    def __getitem__(self, name: str) -> AdaptiveLimiter:
+        return self.limiters[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
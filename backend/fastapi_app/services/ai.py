@@ -1,10 +1,11 @@
-import openai
 import os
 import time
 import asyncio
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List, Optional
 import logging
 from config import settings
+from services.metrics import TOKENS_USED, UPSTREAM_ERRORS
+from services.deadline import current_deadline
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +14,8 @@ class AIService:
     """Service for AI-powered document analysis and chat"""
     
     def __init__(self):
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(
-            api_key=settings.OPENAI_API_KEY
-        )
+        # OpenAI client is created on first use, see the client property
+        self._client = None
         self.model = settings.OPENAI_MODEL
         self.max_tokens = settings.MAX_TOKENS
         
@@ -44,13 +43,36 @@ Diretrizes:
 5. Seja útil e educativo em suas respostas"""
         }
     
-    async def generate_summary(self, text: str, document_type: str = "legal") -> Dict[str, Any]:
+    @property
+    def client(self):
         """
-        Generate AI summary of document text
+        Async OpenAI client, imported and built lazily to keep worker boot fast.
+        Being async, cancelling the calling task aborts the upstream request.
+        """
+        if self._client is None:
+            import openai
+            
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY
+            )
+        return self._client
+    
+    async def generate_summary(
+        self,
+        text: str,
+        document_type: str = "legal",
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate AI summary of document text.
+        progress_callback, when given, receives chunks_total/chunks_summarized updates.
         """
         start_time = time.time()
         
         try:
+            if progress_callback:
+                progress_callback(chunks_total=1, chunks_summarized=0)
+            
             # Prepare prompt
             user_prompt = f"""
 Documento para análise:
@@ -70,6 +92,10 @@ Por favor, forneça um resumo abrangente deste documento jurídico.
             )
             
             processing_time = time.time() - start_time
+            TOKENS_USED.inc(response['tokens_used'], model=self.model, operation="summary")
+            
+            if progress_callback:
+                progress_callback(chunks_summarized=1)
             
             return {
                 "summary": response['content'],
@@ -127,6 +153,7 @@ Texto completo (primeiros 6000 caracteres):
                 messages=messages,
                 max_tokens=1500
             )
+            TOKENS_USED.inc(response['tokens_used'], model=self.model, operation="chat")
             
             return {
                 "response": response['content'],
@@ -180,6 +207,7 @@ Texto completo (primeiros 6000 caracteres):
                 messages=messages,
                 max_tokens=1500
             )
+            TOKENS_USED.inc(response['tokens_used'], model=self.model, operation=f"analysis_{analysis_type}")
             
             return {
                 "analysis_type": analysis_type,
@@ -204,12 +232,20 @@ Texto completo (primeiros 6000 caracteres):
             
             # Mock response - replace with actual OpenAI call
             if os.getenv('OPENAI_API_KEY') and os.getenv('OPENAI_API_KEY') != 'your-openai-api-key':
+                options = {}
+                
+                # Never wait upstream longer than the caller is willing to wait
+                deadline = current_deadline.get()
+                if deadline and deadline.remaining() is not None:
+                    options["timeout"] = deadline.remaining()
+                
                 # Real API call
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     max_tokens=max_tokens or self.max_tokens,
-                    temperature=0.7
+                    temperature=0.7,
+                    **options
                 )
                 
                 return {
@@ -223,7 +259,10 @@ Texto completo (primeiros 6000 caracteres):
                     "tokens_used": 150
                 }
                 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
+            UPSTREAM_ERRORS.inc(operation="chat_completion", error_type=type(e).__name__)
             logger.error(f"OpenAI API error: {str(e)}")
             raise
     
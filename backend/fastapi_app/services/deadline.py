@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from services.metrics import registry
+
+# Remaining time budget in milliseconds, sent by the caller (gRPC-style relative deadline)
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+# How often a running stage checks whether the client is still connected
+DISCONNECT_POLL_INTERVAL = 0.25
+
+CANCELLED_WORK = registry.counter(
+    "jurchat_ai_cancelled_total",
+    "Work abandoned because the deadline passed or the client disconnected",
+    ("endpoint", "stage", "reason")
+)
+
+current_deadline: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar("current_deadline", default=None)
+
+
+class RequestAborted(Exception):
+    """Base class for work stopped before completion"""
+
+    status_code = 500
+    reason = "aborted"
+    message = "Request aborted"
+
+    def __init__(self, stage: str):
+        super().__init__(f"{self.message} during {stage}")
+        self.stage = stage
+
+
+class DeadlineExceeded(RequestAborted):
+    """The caller's deadline passed"""
+
+    status_code = 504
+    reason = "deadline"
+    message = "Deadline exceeded"
+
+
+class ClientDisconnected(RequestAborted):
+    """The caller went away; nginx's 499 status is used for the log line"""
+
+    status_code = 499
+    reason = "client_disconnect"
+    message = "Client disconnected"
+
+
+class Deadline:
+    """Absolute point in monotonic time after which work is useless"""
+
+    def __init__(self, expires_at: Optional[float] = None):
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_timeout(cls, timeout: Optional[float]) -> "Deadline":
+        return cls(time.monotonic() + timeout if timeout is not None else None)
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default_timeout: float, max_timeout: float) -> "Deadline":
+        """Build a deadline from the header value, capped to max_timeout"""
+        timeout = default_timeout
+        if value:
+            try:
+                timeout = min(float(value) / 1000, max_timeout)
+            except ValueError:
+                pass
+        return cls.from_timeout(max(timeout, 0))
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, endpoint: str, stage: str):
+        """Raise DeadlineExceeded if the deadline already passed"""
+        if self.expired():
+            CANCELLED_WORK.inc(endpoint=endpoint, stage=stage, reason=DeadlineExceeded.reason)
+            raise DeadlineExceeded(stage)
+
+
+async def run_with_deadline(
+    awaitable: Awaitable[Any],
+    deadline: Deadline,
+    request=None,
+    endpoint: str = "",
+    stage: str = "",
+    on_abort: Optional[Callable[[], None]] = None
+) -> Any:
+    """
+    Await `awaitable` as a task, cancelling it once the deadline passes or the
+    client disconnects. The deadline is exposed through current_deadline so
+    upstream calls can pass the remaining budget as their own timeout.
+    on_abort lets work that cannot be cancelled (threads) stop cooperatively.
+    """
+    try:
+        deadline.check(endpoint, stage)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    current_deadline.set(deadline)
+    task = asyncio.ensure_future(awaitable)
+
+    try:
+        while True:
+            wait_for = DISCONNECT_POLL_INTERVAL if request is not None else None
+            remaining = deadline.remaining()
+            if remaining is not None:
+                wait_for = remaining if wait_for is None else min(wait_for, remaining)
+
+            done, _ = await asyncio.wait({task}, timeout=wait_for)
+            if task in done:
+                return task.result()
+
+            if deadline.expired():
+                CANCELLED_WORK.inc(endpoint=endpoint, stage=stage, reason=DeadlineExceeded.reason)
+                raise DeadlineExceeded(stage)
+
+            if request is not None and await request.is_disconnected():
+                CANCELLED_WORK.inc(endpoint=endpoint, stage=stage, reason=ClientDisconnected.reason)
+                raise ClientDisconnected(stage)
+    finally:
+        if not task.done():
+            if on_abort:
+                on_abort()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
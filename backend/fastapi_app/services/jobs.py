@@ -0,0 +1,384 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+
+class JobStore:
+    """SQLite-backed job table so queued and finished jobs survive restarts"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                spool_path TEXT,
+                progress TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+        """)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column in ("owner TEXT", "heartbeat_at REAL"):
+            # Tables created before jobs were claimed per process
+            if column.split()[0] not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires_idx ON jobs (expires_at)")
+        self._conn.commit()
+
+    def create(self, job: Dict[str, Any]):
+        """Insert a new job row"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, document_id, user_id, content_type, spool_path, "
+                "progress, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["id"], job["status"], job["document_id"], job["user_id"],
+                    job["content_type"], job["spool_path"], json.dumps(job["progress"]),
+                    job["created_at"], job["updated_at"]
+                )
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields):
+        """Update columns of a job row"""
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a job by id"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self, job_id: str, owner: str, stale_before: float) -> bool:
+        """
+        Mark a job as running for owner, unless another process already did.
+
+        Queued jobs and running jobs whose owner stopped sending heartbeats
+        before stale_before can be claimed; every worker process shares the
+        table, so only the one whose update matched runs the job.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, heartbeat_at = ?, updated_at = ? "
+                "WHERE id = ? AND (status = ? OR (status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)))",
+                (JOB_RUNNING, owner, now, now, job_id, JOB_QUEUED, JOB_RUNNING, stale_before)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def heartbeat(self, owner: str):
+        """Show that the owner's running jobs are still being worked on"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?",
+                (time.time(), owner, JOB_RUNNING)
+            )
+            self._conn.commit()
+
+    def release(self, owner: str):
+        """Put the owner's running jobs back in the queue for another process"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, heartbeat_at = NULL, updated_at = ? "
+                "WHERE owner = ? AND status = ?",
+                (JOB_QUEUED, time.time(), owner, JOB_RUNNING)
+            )
+            self._conn.commit()
+
+    def list_claimable(self, stale_before: float) -> List[Dict[str, Any]]:
+        """Queued jobs, and running jobs whose owner stopped sending heartbeats"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)) "
+                "ORDER BY created_at",
+                (JOB_QUEUED, JOB_RUNNING, stale_before)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def delete_expired(self, now: float) -> List[Dict[str, Any]]:
+        """Remove finished jobs whose result has expired"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+            self._conn.commit()
+        return [self._to_dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+JobRunner = Callable[[Dict[str, Any], bytes, Callable[..., None]], Awaitable[Dict[str, Any]]]
+
+
+class JobManager:
+    """
+    In-process worker pool that drains a bounded queue of summarization jobs.
+
+    Every uvicorn worker process runs its own manager over the shared job
+    table. A job runs only in the process that claims it (JobStore.claim);
+    running jobs carry their owner's heartbeat, so jobs of a process that
+    died are claimed again by the others once stale_after has passed.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        runner: JobRunner,
+        spool_dir: str,
+        workers: int = 2,
+        queue_size: int = 100,
+        result_ttl: int = 3600,
+        sweep_interval: int = 60,
+        stale_after: int = 120
+    ):
+        self.db_path = db_path
+        self.runner = runner
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self.sweep_interval = sweep_interval
+        self.stale_after = stale_after
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self.store: Optional[JobStore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued_ids = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Open the job table, start workers and enqueue jobs left over by stopped processes"""
+        self.store = await run_in_threadpool(self._open_store)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+
+        await self._enqueue_claimable()
+
+        for worker_num in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(worker_num)))
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """Cancel workers and hand their running jobs back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.release(self.owner)
+            self.store.close()
+            self.store = None
+
+    def _open_store(self) -> JobStore:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return JobStore(self.db_path)
+
+    async def submit(self, file_content: bytes, content_type: str, document_id: str, user_id: int) -> Dict[str, Any]:
+        """Persist a new job and put it on the queue"""
+        if self._queue is None:
+            raise RuntimeError("Job manager is not running")
+        if self._queue.full():
+            raise JobQueueFull("Job queue is full")
+
+        job = await run_in_threadpool(self._create_job, file_content, content_type, document_id, user_id)
+        if not self._put(job["id"]):
+            # Filled up while the job was being written; it is claimed later from the table
+            logger.warning(f"Job queue full, job {job['id']} left for recovery")
+        return job
+
+    def _create_job(self, file_content: bytes, content_type: str, document_id: str, user_id: int) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+        spool_path = os.path.join(self.spool_dir, job_id)
+        with open(spool_path, "wb") as spool_file:
+            spool_file.write(file_content)
+
+        now = time.time()
+        job = {
+            "id": job_id,
+            "status": JOB_QUEUED,
+            "document_id": document_id,
+            "user_id": user_id,
+            "content_type": content_type,
+            "spool_path": spool_path,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": None
+        }
+        self.store.create(job)
+        return job
+
+    def _put(self, job_id: str) -> bool:
+        if job_id in self._queued_ids:
+            return True
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        self._queued_ids.add(job_id)
+        return True
+
+    async def _enqueue_claimable(self):
+        """Queue jobs no live process is working on, up to the free queue space"""
+        stale_before = time.time() - self.stale_after
+        for job in await run_in_threadpool(self.store.list_claimable, stale_before):
+            if not self._put(job["id"]):
+                break
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job unless its result has expired"""
+        if self.store is None:
+            raise RuntimeError("Job manager is not running")
+        job = self.store.get(job_id)
+        if job and job["expires_at"] is not None and job["expires_at"] <= time.time():
+            return None
+        return job
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, worker_num: int):
+        while True:
+            job_id = await self._queue.get()
+            self._queued_ids.discard(job_id)
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job worker {worker_num} failed on {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        stale_before = time.time() - self.stale_after
+        if not await run_in_threadpool(self.store.claim, job_id, self.owner, stale_before):
+            # Finished, or running in another process
+            return
+        job = self.store.get(job_id)
+
+        if not job["spool_path"] or not os.path.exists(job["spool_path"]):
+            self._finish(job_id, JOB_FAILED, error="Job input lost during restart")
+            return
+
+        progress = dict(job["progress"])
+
+        def report_progress(**values):
+            progress.update(values)
+            self.store.update(job_id, progress=progress)
+
+        try:
+            with open(job["spool_path"], "rb") as spool_file:
+                file_content = spool_file.read()
+            result = await self.runner(job, file_content, report_progress)
+            self._finish(job_id, JOB_COMPLETED, result=result)
+        except asyncio.CancelledError:
+            # stop() hands the job back to the queue
+            raise
+        except HTTPException as e:
+            # Rejections such as unreadable documents keep their message, as on the sync endpoint
+            logger.warning(f"Job {job_id} rejected: {e.detail}")
+            self._finish(job_id, JOB_FAILED, error=str(e.detail))
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._finish(job_id, JOB_FAILED, error=str(e))
+
+        self._remove_spool(job["spool_path"])
+
+    def _finish(self, job_id: str, status: str, result: Dict[str, Any] = None, error: str = None):
+        self.store.update(
+            job_id,
+            status=status,
+            result=result,
+            error=error,
+            expires_at=time.time() + self.result_ttl
+        )
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                for job in await run_in_threadpool(self.store.delete_expired, time.time()):
+                    self._remove_spool(job["spool_path"])
+            except Exception as e:
+                logger.warning(f"Could not purge expired jobs: {str(e)}")
+            try:
+                # Jobs of processes that died, or left out when the queue was full
+                await self._enqueue_claimable()
+            except Exception as e:
+                logger.warning(f"Could not recover unclaimed jobs: {str(e)}")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.stale_after / 4)
+            try:
+                await run_in_threadpool(self.store.heartbeat, self.owner)
+            except Exception as e:
+                logger.warning(f"Could not record job heartbeat: {str(e)}")
+
+    def _remove_spool(self, spool_path: Optional[str]):
+        if spool_path and os.path.exists(spool_path):
+            try:
+                os.remove(spool_path)
+            except OSError as e:
+                logger.warning(f"Could not remove job spool file {spool_path}: {str(e)}")
@@ -1,7 +1,5 @@
 import io
-import PyPDF2
-import docx
-from typing import Union
+from typing import Callable, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,41 +16,74 @@ class DocumentParser:
             'text/plain': self._extract_from_txt
         }
     
-    def extract_text(self, file_content: bytes, content_type: str) -> str:
+    def load_backends(self):
+        """Import the PDF and DOCX libraries ahead of the first request"""
+        import PyPDF2  # noqa: F401
+        import docx  # noqa: F401
+    
+    def extract_text(
+        self,
+        file_content: bytes,
+        content_type: str,
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> str:
+        """
+        Extract text from document based on content type.
+        progress_callback, when given, receives pages_total/pages_extracted updates.
         """
-        Extract text from document based on content type
+        text = self.extract_raw_text(file_content, content_type, progress_callback)
+        return self.clean_text(text)
+    
+    def extract_raw_text(
+        self,
+        file_content: bytes,
+        content_type: str,
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> str:
+        """
+        Extract text without normalization, so callers can time cleaning separately
         """
         if content_type not in self.supported_types:
             raise ValueError(f"Unsupported content type: {content_type}")
         
         try:
             extractor = self.supported_types[content_type]
-            text = extractor(file_content)
-            return self._clean_text(text)
+            return extractor(file_content, progress_callback)
         except Exception as e:
             logger.error(f"Error extracting text from {content_type}: {str(e)}")
             raise
     
-    def _extract_from_pdf(self, file_content: bytes) -> str:
+    def _extract_from_pdf(self, file_content: bytes, progress_callback=None) -> str:
         """Extract text from PDF"""
         text = ""
         try:
+            import PyPDF2
+            
             pdf_file = io.BytesIO(file_content)
             pdf_reader = PyPDF2.PdfReader(pdf_file)
+            page_count = len(pdf_reader.pages)
             
-            for page_num in range(len(pdf_reader.pages)):
+            if progress_callback:
+                progress_callback(pages_total=page_count, pages_extracted=0)
+            
+            for page_num in range(page_count):
                 page = pdf_reader.pages[page_num]
                 text += page.extract_text() + "\n"
                 
+                if progress_callback:
+                    progress_callback(pages_extracted=page_num + 1)
+                
         except Exception as e:
             logger.error(f"Error reading PDF: {str(e)}")
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
         
         return text
     
-    def _extract_from_docx(self, file_content: bytes) -> str:
+    def _extract_from_docx(self, file_content: bytes, progress_callback=None) -> str:
         """Extract text from DOCX"""
         try:
+            import docx
+            
             doc_file = io.BytesIO(file_content)
             doc = docx.Document(doc_file)
             
@@ -73,13 +104,13 @@ class DocumentParser:
         
         return text
     
-    def _extract_from_doc(self, file_content: bytes) -> str:
+    def _extract_from_doc(self, file_content: bytes, progress_callback=None) -> str:
         """Extract text from DOC (legacy Word format)"""
         # For DOC files, we might need to use python-docx2txt or antiword
         # For now, we'll return an error message
         raise ValueError("DOC format not fully supported. Please convert to DOCX or PDF.")
     
-    def _extract_from_txt(self, file_content: bytes) -> str:
+    def _extract_from_txt(self, file_content: bytes, progress_callback=None) -> str:
         """Extract text from plain text file"""
         try:
             # Try UTF-8 first, then fallback to latin-1
@@ -93,7 +124,7 @@ class DocumentParser:
             logger.error(f"Error reading text file: {str(e)}")
             raise ValueError(f"Failed to extract text from text file: {str(e)}")
     
-    def _clean_text(self, text: str) -> str:
+    def clean_text(self, text: str) -> str:
         """Clean and normalize extracted text"""
         if not text:
             return ""
@@ -132,6 +163,8 @@ class DocumentParser:
             metadata['char_count'] = len(text)
             
             if content_type == 'application/pdf':
+                import PyPDF2
+                
                 pdf_file = io.BytesIO(file_content)
                 pdf_reader = PyPDF2.PdfReader(pdf_file)
                 metadata['page_count'] = len(pdf_reader.pages)
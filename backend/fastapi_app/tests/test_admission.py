@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from services.admission import AdaptiveLimiter, AdmissionRejected, is_overload_error
+from services.deadline import ClientDisconnected, DeadlineExceeded
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'upstream answered {status_code}')
+        self.status_code = status_code
+
+
+def make_limiter(**options):
+    values = {'initial_limit': 4, 'max_limit': 10, 'queue_size': 2, 'queue_timeout': 0.1, 'latency_target': 1.0}
+    values.update(options)
+    return AdaptiveLimiter('test', **values)
+
+
+async def fail_in_slot(limiter, exc):
+    with pytest.raises(type(exc)):
+        async with limiter.slot():
+            raise exc
+
+
+@pytest.mark.asyncio
+async def test_fast_requests_raise_the_limit_up_to_the_maximum():
+    limiter = make_limiter(initial_limit=2, max_limit=3)
+
+    for _ in range(2):
+        async with limiter.slot():
+            pass
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+    for _ in range(20):
+        async with limiter.slot():
+            pass
+    assert limiter.current_limit == 3
+    assert limiter.in_flight == 0
+
+
+def test_slow_request_decreases_the_limit_once_per_target_interval():
+    limiter = make_limiter(initial_limit=10)
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(latency=2.0)
+
+    assert limiter.limit == pytest.approx(7)
+
+
+def test_limit_never_goes_below_the_minimum():
+    limiter = make_limiter(initial_limit=1, latency_target=0)
+    for _ in range(5):
+        limiter.in_flight += 1
+        limiter.release(latency=1.0)
+
+    assert limiter.limit == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('exc', [
+    asyncio.TimeoutError(),
+    DeadlineExceeded('llm'),
+    UpstreamError(429),
+    UpstreamError(503),
+])
+async def test_overload_failures_decrease_the_limit(exc):
+    limiter = make_limiter(initial_limit=10)
+
+    await fail_in_slot(limiter, exc)
+
+    assert limiter.limit == pytest.approx(7)
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('exc', [
+    HTTPException(status_code=400, detail='Could not extract text from document'),
+    ClientDisconnected('llm'),
+    ValueError('Unsupported analysis type'),
+])
+async def test_other_failures_leave_the_limit_alone(exc):
+    limiter = make_limiter(initial_limit=10)
+
+    await fail_in_slot(limiter, exc)
+
+    assert limiter.limit == 10
+    assert limiter.in_flight == 0
+
+
+def test_openai_timeouts_are_overload_errors():
+    openai = pytest.importorskip('openai')
+    import httpx
+
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    assert is_overload_error(openai.APITimeoutError(request=request))
+    assert is_overload_error(openai.APIConnectionError(request=request))
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_right_away():
+    limiter = make_limiter(initial_limit=1, queue_size=1, queue_timeout=5)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    assert limiter.is_saturated()
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check_capacity()
+    assert rejected.value.reason == 'queue_full'
+    assert rejected.value.retry_after >= 1
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()
+
+    # The queued request gets the slot once it is released
+    limiter.release(latency=0.01)
+    await waiting
+    assert limiter.in_flight == 1
+    assert limiter.rejected == 2
+
+
+@pytest.mark.asyncio
+async def test_queued_request_is_rejected_after_the_queue_timeout():
+    limiter = make_limiter(initial_limit=1, queue_timeout=0.05)
+    await limiter.acquire()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await limiter.acquire()
+
+    assert rejected.value.reason == 'queue_timeout'
+    assert limiter.snapshot()['queued'] == 0
+
+
+@pytest.mark.asyncio
+async def test_blocking_acquire_waits_past_the_queue_bound():
+    limiter = make_limiter(initial_limit=1, queue_size=0, queue_timeout=0.01)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire(block=True))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    limiter.release(latency=0.01)
+    await waiting
+    assert limiter.in_flight == 1
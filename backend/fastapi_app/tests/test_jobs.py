@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from services.jobs import JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobManager, JobStore
+
+
+def new_job(store, job_id='job-1', spool_path=None):
+    now = time.time()
+    store.create({
+        'id': job_id, 'status': JOB_QUEUED, 'document_id': 'doc-1', 'user_id': 1,
+        'content_type': 'text/plain', 'spool_path': spool_path, 'progress': {},
+        'created_at': now, 'updated_at': now
+    })
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+@pytest.fixture
+def stores(db_path):
+    """Opens JobStores on one table, as separate worker processes do"""
+    opened = []
+
+    def open_store():
+        store = JobStore(db_path)
+        opened.append(store)
+        return store
+
+    yield open_store
+    for store in opened:
+        store.close()
+
+
+def test_only_one_process_claims_a_queued_job(stores):
+    new_job(stores())
+    contenders = [stores() for _ in range(8)]
+    barrier = threading.Barrier(len(contenders))
+    won = []
+
+    def claim(number, store):
+        barrier.wait()
+        if store.claim('job-1', f'owner-{number}', time.time() - 60):
+            won.append(f'owner-{number}')
+
+    threads = [threading.Thread(target=claim, args=item) for item in enumerate(contenders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(won) == 1
+    job = contenders[0].get('job-1')
+    assert (job['status'], job['owner']) == (JOB_RUNNING, won[0])
+
+
+def test_running_job_with_a_live_heartbeat_is_not_reclaimed(stores):
+    first, second = stores(), stores()
+    new_job(first)
+    assert first.claim('job-1', 'first', time.time() - 60)
+
+    first.heartbeat('first')
+
+    assert not second.claim('job-1', 'second', time.time() - 60)
+    assert second.list_claimable(time.time() - 60) == []
+
+
+def test_running_job_with_an_expired_heartbeat_is_reclaimed(stores):
+    first, second = stores(), stores()
+    new_job(first)
+    assert first.claim('job-1', 'first', time.time() - 60)
+    # The first process died: nothing refreshes its heartbeat
+    first.update('job-1', heartbeat_at=time.time() - 120)
+
+    stale_before = time.time() - 60
+    assert [job['id'] for job in second.list_claimable(stale_before)] == ['job-1']
+    assert second.claim('job-1', 'second', stale_before)
+    assert second.get('job-1')['owner'] == 'second'
+    assert not first.claim('job-1', 'first', stale_before)
+
+
+def test_finished_job_is_never_claimed(stores):
+    store = stores()
+    new_job(store)
+    store.update('job-1', status=JOB_COMPLETED, heartbeat_at=None)
+
+    assert not store.claim('job-1', 'late', time.time() + 60)
+
+
+async def wait_finished(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in (JOB_COMPLETED, JOB_FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f'Job {job_id} did not finish')
+
+
+@pytest.fixture
+def make_manager(db_path, tmp_path):
+    """JobManagers on one table; each test starts and stops its own"""
+    def make(runner, **options):
+        return JobManager(db_path=db_path, runner=runner, spool_dir=str(tmp_path / 'spool'), **options)
+    return make
+
+
+@pytest.mark.asyncio
+async def test_managers_sharing_the_table_run_each_job_once(make_manager):
+    runs = []
+
+    async def runner(job, file_content, report_progress):
+        runs.append(job['id'])
+        await asyncio.sleep(0.05)
+        return {'summary': file_content.decode()}
+
+    managers = [make_manager(runner, workers=2) for _ in range(3)]
+    for manager in managers:
+        await manager.start()
+    try:
+        jobs = [await managers[0].submit(f'text {n}'.encode(), 'text/plain', f'doc-{n}', 1) for n in range(6)]
+        # Every manager also tries to run every job, as after a restart
+        for manager in managers[1:]:
+            for job in jobs:
+                manager._put(job['id'])
+        finished = [await wait_finished(managers[0], job['id']) for job in jobs]
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+    assert sorted(runs) == sorted(job['id'] for job in jobs)
+    assert [job['result'] for job in finished] == [{'summary': f'text {n}'} for n in range(6)]
+
+
+@pytest.mark.asyncio
+async def test_job_of_a_dead_process_is_recovered(make_manager, stores, tmp_path):
+    spool = tmp_path / 'spool-job'
+    spool.write_bytes(b'contrato')
+    store = stores()
+    new_job(store, spool_path=str(spool))
+    assert store.claim('job-1', 'dead-process', time.time())
+    store.update('job-1', heartbeat_at=time.time() - 600)
+
+    async def runner(job, file_content, report_progress):
+        return {'summary': file_content.decode()}
+
+    manager = make_manager(runner, stale_after=60)
+    await manager.start()
+    try:
+        job = await wait_finished(manager, 'job-1')
+    finally:
+        await manager.stop()
+
+    assert job['status'] == JOB_COMPLETED
+    assert job['owner'] == manager.owner
+    assert job['result'] == {'summary': 'contrato'}
+
+
+@pytest.mark.asyncio
+async def test_rejected_document_keeps_the_error_detail(make_manager):
+    async def runner(job, file_content, report_progress):
+        raise HTTPException(status_code=400, detail='Could not extract text from document')
+
+    manager = make_manager(runner)
+    await manager.start()
+    try:
+        job = await manager.submit(b'\x00\x01', 'application/pdf', 'doc-1', 1)
+        job = await wait_finished(manager, job['id'])
+    finally:
+        await manager.stop()
+
+    assert job['status'] == JOB_FAILED
+    assert job['error'] == 'Could not extract text from document'